@@ -0,0 +1,103 @@
+"""
+Startup time of the package and its command line interface.
+
+Every scenario runs in a fresh interpreter, so nothing is cached in
+sys.modules. Also lists which heavy dependencies got imported and fails
+if a scenario imports one of its FORBIDDEN modules. Run from
+the repository root:
+
+    python -m benchmarks.bench_import [--repeat N] [--limit SECONDS]
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Mapping, Sequence
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+HEAVY = ("requests", "lxml", "sqlalchemy", "numpy", "pandas", "pyarrow", "scipy")
+
+# name -> python code run in a fresh interpreter
+SCENARIOS = {
+    "baseline": "pass",
+    "package": "import falchooser.malscraper",
+    "read_titles": "from falchooser.malscraper.titles import read_titles; read_titles(2017, 2)",
+    "forecast": "import falchooser.malscraper.forecast",
+    "cli --help": "import sys; sys.argv = ['anime2db', '--help']\n"
+                  "from falchooser.malscraper.cli import cmd_stats_insert\n"
+                  "try:\n    cmd_stats_insert()\nexcept SystemExit:\n    pass",
+}
+
+# name -> heavy modules the scenario must not import
+FORBIDDEN = {
+    "forecast": ("requests", "lxml", "sqlalchemy"),
+}
+
+_REPORT = ("\nimport json, sys\n"
+           "print(json.dumps(sorted(m for m in {!r} if m in sys.modules)))")
+
+
+def run_scenario(code: str, env: Mapping[str, str]=None) -> Sequence[str]:
+    """
+    :param code: Python code run in a fresh interpreter.
+    :param env: Environment of the interpreter; the current one if None.
+    :return: Heavy modules imported by the code.
+    """
+    result = subprocess.run([sys.executable, "-c", code + _REPORT.format(HEAVY)],
+                            cwd=ROOT, env=env, stdout=subprocess.PIPE, check=True)
+    return json.loads(result.stdout.decode().splitlines()[-1])
+
+
+def run(repeat: int) -> Mapping[str, Mapping]:
+    """
+    :param repeat: How often every scenario is started; the fastest run counts.
+    :return: Seconds and imported heavy modules for each scenario.
+    """
+    results = dict()
+    for name, code in SCENARIOS.items():
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            modules = run_scenario(code)
+            best = min(best, time.perf_counter() - start)
+        results[name] = {"seconds": best, "heavy": modules}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark import time of falchooser.")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="How often every scenario is started (default: 5).")
+    parser.add_argument("--limit", type=float,
+                        help="Exit with an error if a scenario takes SECONDS longer "
+                             "than the bare interpreter.")
+    args = parser.parse_args()
+    results = run(args.repeat)
+    baseline = results["baseline"]["seconds"]
+    slow, forbidden = [], []
+    for name, result in results.items():
+        overhead = result["seconds"] - baseline
+        print("{:12} {:8.1f} ms  (+{:6.1f} ms)  {}".format(
+            name, 1000 * result["seconds"], 1000 * overhead, ", ".join(result["heavy"]) or "-"))
+        if args.limit is not None and overhead > args.limit:
+            slow.append(name)
+        forbidden.extend("{} imports {}".format(name, module) for module in result["heavy"]
+                         if module in FORBIDDEN.get(name, ()))
+    if forbidden:
+        sys.exit("Forbidden imports: {}".format(", ".join(forbidden)))
+    if slow:
+        sys.exit("Slower than {} s: {}".format(args.limit, ", ".join(slow)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Microbenchmark for parsing Mal's /stats pages.
+
+Compares parse_stats_page against the previous parser, which built the
+whole tree, compiled its css selectors on every call and mutated the
+tree while extracting values. Run from the repository root:
+
+    python -m benchmarks.bench_parser [--repeat N] [fixtures ...]
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import argparse
+import glob
+import os
+import time
+from typing import Callable, Mapping, Sequence
+
+import lxml.html
+
+from falchooser.malscraper.scraper import ReType, RE_NA, parse_stats_page
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                        "tests", "malscraper_test", "fixtures")
+
+
+def legacy_parse_stats_page(content: bytes) -> Mapping[str, float]:
+    """
+    The parser of MalEntry.parse_stats before it got replaced.
+    """
+    stats = dict()
+    root = lxml.html.fromstring(content)
+    lborder = root.cssselect("div.js-scrollfix-bottom")[0]
+    divs = [child for child in lborder if child.tag == "div"]
+    cbody = root.cssselect("div.js-scrollfix-bottom-rel")[0]
+    divs.extend(cbody.cssselect("div.spaceit_pad"))
+    for div in divs:
+        mapping = _legacy_parse_mapping(div)
+        if mapping:
+            stats.update(mapping)
+    return stats
+
+
+def _legacy_parse_mapping(div_element):
+    children = div_element.getchildren()
+    if len(children) > 0:
+        key = children[0].text
+    else:
+        return None
+    mapping = dict()
+    if key == "Score:":
+        mapping["score"] = _legacy_match_and_convert(div_element, ReType.DOT)
+        mapping["users"] = _legacy_match_and_convert(div_element, ReType.USERS)
+    elif key == "Ranked:":
+        mapping["ranked"] = _legacy_match_and_convert(div_element, ReType.HASH)
+    elif key == "Popularity:":
+        mapping["popularity"] = _legacy_match_and_convert(div_element, ReType.HASH)
+    elif key == "Members:":
+        mapping["members"] = _legacy_match_and_convert(div_element, ReType.COMMA)
+    elif key == "Favorites:":
+        mapping["favorites"] = _legacy_match_and_convert(div_element, ReType.COMMA)
+    elif key == "Watching:":
+        mapping["watching"] = _legacy_match_and_convert(div_element, ReType.COMMA)
+    elif key == "Completed:":
+        mapping["completed"] = _legacy_match_and_convert(div_element, ReType.COMMA)
+    elif key == "On-Hold:":
+        mapping["onhold"] = _legacy_match_and_convert(div_element, ReType.COMMA)
+    elif key == "Dropped:":
+        mapping["dropped"] = _legacy_match_and_convert(div_element, ReType.COMMA)
+    elif key == "Plan to Watch:":
+        mapping["plantowatch"] = _legacy_match_and_convert(div_element, ReType.COMMA)
+    else:
+        return None
+    return mapping
+
+
+def _legacy_match_and_convert(div_element, re_type):
+    sups = div_element.findall("sup")
+    for sup in sups:
+        div_element.remove(sup)
+    value = div_element.text_content()
+    if re_type.name != "USERS" and RE_NA.search(value):
+        return None
+    value = re_type.value.search(value).group()
+    if re_type.name == "DOT":
+        return float(value)
+    elif re_type.name == "COMMA" or "USERS":
+        value = value.replace(",", "")
+    return int(value)
+
+
+def default_paths() -> Sequence[str]:
+    return sorted(glob.glob(os.path.join(FIXTURES, "*-stats.html")))
+
+
+def pages_per_second(parse: Callable[[bytes], Mapping], pages: Sequence[bytes],
+                     repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            parse(page)
+    return repeat * len(pages) / (time.perf_counter() - start)
+
+
+def run(paths: Sequence[str], repeat: int) -> Mapping[str, float]:
+    """
+    Check that both parsers agree and measure their throughput.
+    :param paths: Html files of /stats pages.
+    :param repeat: How often every page gets parsed.
+    :return: Pages per second for each parser.
+    """
+    pages = []
+    for path in paths:
+        with open(path, "rb") as fd:
+            pages.append(fd.read())
+    for path, page in zip(paths, pages):
+        assert parse_stats_page(page) == legacy_parse_stats_page(page), \
+            "Parsers disagree on {}".format(path)
+    legacy = pages_per_second(legacy_parse_stats_page, pages, repeat)
+    fast = pages_per_second(parse_stats_page, pages, repeat)
+    return {"pages": len(pages), "legacy": legacy, "fast": fast, "speedup": fast / legacy}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark parsing of /stats pages.")
+    parser.add_argument("paths", nargs="*", help="Html files of /stats pages.")
+    parser.add_argument("--repeat", type=int, default=200,
+                        help="How often every page gets parsed (default: 200).")
+    args = parser.parse_args()
+    paths = args.paths or default_paths()
+    result = run(paths, args.repeat)
+    print("Parsed {} pages {} times.".format(result["pages"], args.repeat))
+    print("legacy: {:10.1f} pages/s".format(result["legacy"]))
+    print("fast:   {:10.1f} pages/s ({:.1f}x)".format(result["fast"], result["speedup"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Local stand-in for Mal serving recorded pages.
+
+Answers the same paths as myanimelist.net with the fixtures from
+tests/malscraper_test/fixtures. Latency, rate limiting (429) and
+server errors can be injected to exercise retries and backoff.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Mapping, Tuple
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                        "tests", "malscraper_test", "fixtures")
+
+STATS_FIXTURES = ("33089-stats.html", "34561-stats.html", "35062-stats.html")
+STATS_SLUGS = {"33089-stats.html": b"/anime/33089/Kemono_Friends",
+               "34561-stats.html": b"/anime/34561/Re_Creators",
+               "35062-stats.html": b"/anime/35062/Mahoutsukai_no_Yome"}
+PAGE_FIXTURE = "33089.html"
+PAGE_SLUG = b"/anime/33089/Kemono_Friends"
+SEARCH_FIXTURE = "search.xml"
+
+re_path = re.compile(r"""^/anime/(\d+)(?:/([^/?]+))?(/stats)?/?$""")
+
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), "rb") as fd:
+        return fd.read()
+
+
+class MalStandIn:
+    """
+    Threaded HTTP server imitating Mal. Use as context manager:
+
+        with MalStandIn(latency=0.05) as mal:
+            Mal.URL = mal.url
+    """
+    def __init__(self, latency: float=0.0, rate_429: float=0.0,
+                 failure_rate: float=0.0, seed: int=0):
+        """
+        Constructor
+        :param latency: Seconds every response is delayed.
+        :param rate_429: Probability of answering with 429 Too Many Requests.
+        :param failure_rate: Probability of answering with 500 Internal Server Error.
+        :param seed: Seed for the injected errors.
+        """
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.failure_rate = failure_rate
+        self.requests = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.url = None
+        self._stats = [(read_fixture(name), STATS_SLUGS[name]) for name in STATS_FIXTURES]
+        self._page = read_fixture(PAGE_FIXTURE)
+        self._search = read_fixture(SEARCH_FIXTURE)
+
+    def __enter__(self) -> "MalStandIn":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                status, headers, body = stand_in.respond(self.path)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}".format(self._server.server_port)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def respond(self, path: str) -> Tuple[int, Mapping[str, str], bytes]:
+        """
+        Build a response for a requested path.
+        :return: Tuple of status code, headers and body.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.rate_429:
+            self._count("429")
+            return 429, {"Retry-After": "0"}, b"Too Many Requests"
+        if draw < self.rate_429 + self.failure_rate:
+            self._count("500")
+            return 500, dict(), b"Internal Server Error"
+        html = {"Content-Type": "text/html; charset=UTF-8"}
+        if path.startswith("/api/anime/search.xml"):
+            self._count("search")
+            return 200, {"Content-Type": "application/xml"}, self._search
+        match = re_path.match(path)
+        if not match:
+            self._count("404")
+            return 404, dict(), b"Not Found"
+        id = int(match.group(1))
+        slug = "/anime/{}/{}".format(id, match.group(2) or "Anime_{}".format(id)).encode("utf-8")
+        if match.group(3):
+            self._count("stats")
+            page, fixture_slug = self._stats[id % len(self._stats)]
+        else:
+            self._count("page")
+            page, fixture_slug = self._page, PAGE_SLUG
+        page = page.replace(fixture_slug, slug)
+        return 200, html, page.replace(b"https://myanimelist.net", self.url.encode("utf-8"))
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.requests[key] += 1
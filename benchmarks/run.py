@@ -0,0 +1,145 @@
+"""
+Offline benchmark suite for the scraper and the database layer.
+
+Every network benchmark talks to a local MalStandIn instead of
+myanimelist.net and every database benchmark uses SQLite, so the
+suite runs without credentials or internet access. Results are
+written as JSON to track regressions between releases:
+
+    python -m benchmarks.run [--output results.json] [--anime 60] [--latency 0.02]
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Mapping
+
+from falchooser.malscraper import cache
+from falchooser.malscraper.connection import CLIENT, STATS
+from falchooser.malscraper.dbaccess import Database, Anime, Statistics
+from falchooser.malscraper.helpers import scrape, db_insert, create_stats_object, \
+    create_anime_object
+from falchooser.malscraper.scraper import Mal
+from falchooser.malscraper.titleindex import TitleIndex
+from falchooser.malscraper.throttle import LIMITER
+
+from benchmarks import bench_parser
+from benchmarks.malserver import MalStandIn
+
+
+def bench_search(mal_url: str, n: int) -> Mapping[str, Any]:
+    Mal.URL = mal_url
+    mal = Mal(TitleIndex(None))
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        mal.search("Full Metal")
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {"calls": n,
+            "mean_ms": 1000 * statistics.mean(latencies),
+            "p50_ms": 1000 * latencies[len(latencies) // 2],
+            "p95_ms": 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]}
+
+
+def bench_end_to_end(mal_url: str, n_anime: int, workers: int) -> Mapping[str, Any]:
+    """
+    Scrape titles and statistics of n_anime entries and insert them,
+    like insert_anime and insert_statistics do.
+    """
+    db = Database("sqlite://")
+    db.create_tables()
+    urls = ["{}/anime/{}/Anime_{}".format(mal_url, 30000 + i, 30000 + i) for i in range(n_anime)]
+    result = dict()
+    for name, create in (("insert_anime", create_anime_object),
+                         ("insert_statistics", create_stats_object)):
+        STATS.reset()
+        start = time.perf_counter()
+        rows = scrape(urls, create, workers)
+        db_insert(rows, True, db)
+        elapsed = time.perf_counter() - start
+        result[name] = {"anime": n_anime, "workers": workers, "rows": len(rows),
+                        "seconds": elapsed, "anime_per_second": n_anime / elapsed,
+                        "http": STATS.snapshot()}
+    return result
+
+
+def bench_db_insert(n_anime: int, n_days: int) -> Mapping[str, Any]:
+    db = Database("sqlite://")
+    db.create_tables()
+    db.upsert([Anime(id=i, title="Anime {}".format(i), url="https://myanimelist.net/anime/{}/".format(i))
+               for i in range(n_anime)])
+    accessed = datetime.datetime.now(datetime.timezone.utc)
+    rows = [Statistics(anime=anime, day=day, score=7.5, users=1000 + day, ranked=100, popularity=200,
+                       members=5000 + day, favorites=10, watching=3000 + day, completed=day,
+                       onhold=20, dropped=30, plantowatch=1500, accessed=accessed)
+            for day in range(n_days) for anime in range(n_anime)]
+    start = time.perf_counter()
+    db.upsert(rows)
+    insert = time.perf_counter() - start
+    start = time.perf_counter()
+    db.upsert(rows)
+    upsert = time.perf_counter() - start
+    return {"rows": len(rows),
+            "insert_rows_per_second": len(rows) / insert,
+            "upsert_rows_per_second": len(rows) / upsert}
+
+
+def run(n_anime: int=60, workers: int=8, latency: float=0.02, rate_429: float=0.0,
+        failure_rate: float=0.0, parse_repeat: int=100) -> Mapping[str, Any]:
+    """
+    Run all benchmarks.
+    :return: Dictionary with metadata and the results of each benchmark.
+    """
+    cache.set_cache(None)
+    LIMITER.set_limit("127.0.0.1", 10000, 1000)
+    CLIENT.configure(backoff=0.01, pool_size=max(workers, 1))
+    results = {"meta": {"timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                        "python": sys.version.split()[0],
+                        "platform": platform.platform(),
+                        "latency": latency, "rate_429": rate_429, "failure_rate": failure_rate}}
+    results["parse"] = bench_parser.run(bench_parser.default_paths(), parse_repeat)
+    with MalStandIn(latency=latency, rate_429=rate_429, failure_rate=failure_rate) as mal:
+        results["search"] = bench_search(mal.url, 20)
+        results["serial"] = bench_end_to_end(mal.url, n_anime, 1)
+        results["concurrent"] = bench_end_to_end(mal.url, n_anime, workers)
+        results["stand_in_requests"] = dict(mal.requests)
+    results["db_insert"] = bench_db_insert(n_anime, 30)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout.")
+    parser.add_argument("--anime", type=int, default=60, help="Number of anime to scrape (default: 60).")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent requests (default: 8).")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Seconds the stand-in delays every response (default: 0.02).")
+    parser.add_argument("--rate-429", type=float, default=0.0,
+                        help="Probability of a 429 response (default: 0).")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Probability of a 500 response (default: 0).")
+    args = parser.parse_args()
+    # Progress output of the scraper must not end up in the JSON.
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args.anime, args.workers, args.latency, args.rate_429, args.failure_rate)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as fd:
+            fd.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
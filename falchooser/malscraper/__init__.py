@@ -1 +1,6 @@
-from .helpers import cmd_stats_insert
\ No newline at end of file
+# Submodules are imported on first use, importing the package stays cheap.
+def __getattr__(name: str):
+    if name == "cmd_stats_insert":
+        from .cli import cmd_stats_insert
+        return cmd_stats_insert
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,142 @@
+"""
+Precomputed deltas of the statistics time series.
+
+The statistics_delta table holds for every anime, day and metric the
+difference to the day before and to the same day one week earlier.
+It is updated for the affected days whenever statistics are written
+and can be rebuilt from scratch with a few INSERT ... SELECT statements.
+In the "delta" storage mode the statistics are decoded and the
+differences computed in Python instead.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+from typing import Iterable, Sequence, Tuple
+
+from sqlalchemy import select, literal, and_
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import aliased
+
+from .dbaccess import Database, Statistics, StatisticsDelta, METRICS, CHUNK_SIZE
+from .encoding import read_statistics
+
+
+WEEK = 7
+
+
+def _delta_select(metric: str, days: Sequence[int]=None, anime_ids: Sequence[int]=None):
+    current = aliased(Statistics)
+    previous = aliased(Statistics)
+    week = aliased(Statistics)
+    value = getattr(current, metric)
+    query = select(current.anime, current.day, literal(metric),
+                   value - getattr(previous, metric), value - getattr(week, metric))
+    query = query.select_from(current).outerjoin(
+        previous, and_(previous.anime == current.anime, previous.day == current.day - 1))
+    query = query.outerjoin(
+        week, and_(week.anime == current.anime, week.day == current.day - WEEK))
+    if days is not None:
+        query = query.where(current.day.in_(days))
+    if anime_ids is not None:
+        query = query.where(current.anime.in_(anime_ids))
+    return query
+
+
+def _decoded_deltas(conn: Connection, days: Sequence[int]=None,
+                    anime_ids: Sequence[int]=None) -> Sequence[dict]:
+    first_day = min(days) - WEEK if days else 0
+    last_day = max(days) if days else None
+    values = {(anime, day): rest for anime, day, *rest in
+              read_statistics(conn, METRICS, first_day, last_day, anime_ids)}
+    days = set(days) if days is not None else None
+    rows = []
+    for (anime, day), current in values.items():
+        if days is not None and day not in days:
+            continue
+        previous = values.get((anime, day - 1))
+        week = values.get((anime, day - WEEK))
+        for i, metric in enumerate(METRICS):
+            rows.append({"anime": anime, "day": day, "metric": metric,
+                         "daily": _difference(current, previous, i),
+                         "weekly": _difference(current, week, i)})
+    return rows
+
+
+def _difference(current: Sequence, other: Sequence, i: int):
+    if other is None or current[i] is None or other[i] is None:
+        return None
+    return current[i] - other[i]
+
+
+def _write_deltas(conn: Connection, days: Sequence[int]=None,
+                  anime_ids: Sequence[int]=None, storage: str="full") -> None:
+    table = StatisticsDelta.__table__
+    delete = table.delete()
+    if days is not None:
+        delete = delete.where(table.c.day.in_(days))
+    if anime_ids is not None:
+        delete = delete.where(table.c.anime.in_(anime_ids))
+    conn.execute(delete)
+    if storage == "delta":
+        rows = _decoded_deltas(conn, days, anime_ids)
+        for i in range(0, len(rows), CHUNK_SIZE):
+            conn.execute(table.insert(), rows[i:i + CHUNK_SIZE])
+        return
+    columns = ["anime", "day", "metric", "daily", "weekly"]
+    for metric in METRICS:
+        conn.execute(table.insert().from_select(columns, _delta_select(metric, days, anime_ids)))
+
+
+def update_deltas(conn: Connection, days: Iterable[int], anime_ids: Iterable[int]=None,
+                  storage: str="full") -> None:
+    """
+    Recompute the deltas affected by statistics written for the given days.
+    These are the days themselves and the days one day and one week later.
+    :param conn: Connection with an open transaction.
+    :param days: Days which got new statistics.
+    :param anime_ids: Restrict the update to these anime.
+    :param storage: Storage mode of the statistics, see Database.
+    """
+    affected = sorted({day + offset for day in days for offset in (0, 1, WEEK)})
+    if anime_ids is not None:
+        anime_ids = sorted(set(anime_ids))
+    _write_deltas(conn, affected, anime_ids, storage)
+
+
+def rebuild_deltas(db: Database=None) -> None:
+    """
+    Drop all deltas and compute them again from the statistics table.
+    :param db: Database to use. Connects to the default one if None.
+    """
+    if db is None:
+        db = Database()
+    with db.engine.begin() as conn:
+        _write_deltas(conn, storage=db.storage)
+
+
+def read_deltas(metric: str, first_day: int=0, last_day: int=None,
+                anime_ids: Iterable[int]=None,
+                db: Database=None) -> Sequence[Tuple[int, int, float, float]]:
+    """
+    Read precomputed deltas of one metric.
+    :param metric: Name of a statistics metric, e.g. watching.
+    :param first_day: First day (inclusive).
+    :param last_day: Last day (inclusive) or None for all.
+    :param anime_ids: Only these anime or None for all.
+    :param db: Database to query. Connects to the default one if None.
+    :return: Tuples of (anime, day, daily delta, weekly delta) ordered by anime and day.
+    """
+    if db is None:
+        db = Database()
+    table = StatisticsDelta.__table__
+    query = select(table.c.anime, table.c.day, table.c.daily, table.c.weekly).where(
+        table.c.metric == metric, table.c.day >= first_day)
+    if last_day is not None:
+        query = query.where(table.c.day <= last_day)
+    if anime_ids is not None:
+        query = query.where(table.c.anime.in_(sorted(set(anime_ids))))
+    with db.engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(query.order_by(table.c.anime, table.c.day))]
@@ -0,0 +1,269 @@
+"""
+Compressed, append-only archive of fetched pages.
+
+Every page is compressed on its own (zstd if the zstandard package is
+installed, gzip otherwise) and appended to the current segment file.
+The index file holds one fixed-size record per page with its key
+(anime id, day, page type), position and time of access; a page
+archived twice on the same day is found through its last record.
+Pages are never rewritten, so a crash can at most lose the page being
+written. Segments are closed at SEGMENT_SIZE bytes.
+
+Enable it for all fetches with set_archive; backfill re-parses archived
+/stats pages and writes the statistics again.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import datetime
+import gzip
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .days import collection_day
+from .titles import RE_ANIME_ID
+
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "falchooser", "archive")
+
+# Page types which get archived, see cache.DEFAULT_TTLS.
+KINDS = ("stats", "page")
+
+SEGMENT_SIZE = 64 * 1024 ** 2
+
+INDEX_FILE = "index.bin"
+
+# Also matches urls without title like .../anime/1.
+RE_ID = re.compile(RE_ANIME_ID.pattern.replace("(?=/)", "(?=/|$)"))
+
+# anime, day, kind, segment, offset, length, crc32 of the page, accessed (unix time)
+_RECORD = struct.Struct("<iiBIQIId")
+
+Record = namedtuple("Record", ["anime", "day", "kind", "segment", "offset", "length", "crc",
+                               "accessed"])
+
+
+def _codec(segment_path: str) -> str:
+    return "zst" if segment_path.endswith(".zst") else "gz"
+
+
+def _segment_number(name: str) -> int:
+    return int(name.split("-")[1].split(".")[0])
+
+
+def _segment_path(directory: str, number: int) -> str:
+    for codec in ("zst", "gz"):
+        path = os.path.join(directory, "segment-{:06d}.{}".format(number, codec))
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError("Segment {} is missing in {}.".format(number, directory))
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zst":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zst":
+        if zstandard is None:
+            raise RuntimeError("Reading .zst segments needs the zstandard package.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class PageArchive:
+    """
+    Append-only store of raw pages keyed by (anime id, day, page type).
+    Thread-safe; several processes may append to the same directory.
+    """
+    def __init__(self, directory: str=DEFAULT_DIRECTORY, codec: str=None):
+        """
+        Constructor
+        :param directory: Where to put segments and index.
+        :param codec: "zst" or "gz" for new segments. If None, zst when the
+                      zstandard package is installed, gz otherwise.
+        """
+        self.directory = directory
+        self.codec = codec or ("zst" if zstandard is not None else "gz")
+        self._records = dict()
+        self._index_size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        self._refresh()
+        return len(self._records)
+
+    def __contains__(self, key) -> bool:
+        self._refresh()
+        return key in self._records
+
+    def _refresh(self) -> None:
+        """
+        Read records appended since the last call, also by other processes.
+        """
+        path = os.path.join(self.directory, INDEX_FILE)
+        with self._lock:
+            try:
+                with open(path, "rb") as fd:
+                    fd.seek(self._index_size)
+                    data = fd.read()
+            except FileNotFoundError:
+                return
+            # An incomplete last record is still being written.
+            data = data[:len(data) - len(data) % _RECORD.size]
+            for fields in _RECORD.iter_unpack(data):
+                record = Record(*fields)
+                self._records[(record.anime, record.day, KINDS[record.kind])] = record
+            self._index_size += len(data)
+
+    def _segments(self):
+        return sorted(name for name in os.listdir(self.directory) if name.startswith("segment-"))
+
+    def add(self, anime: int, day: int, kind: str, content: bytes,
+            accessed: float=None) -> bool:
+        """
+        Archive a page. Nothing is written if the same page is already archived for this day.
+        :param anime: Mal id of the anime.
+        :param day: Collection day.
+        :param kind: Page type, one of KINDS.
+        :param content: Raw page.
+        :param accessed: Unix time of the request; now if None.
+        :return: Whether the page got written.
+        """
+        crc = zlib.crc32(content)
+        key = (anime, day, kind)
+        self._refresh()
+        old = self._records.get(key)
+        if old is not None and old.crc == crc and self.read(old) == content:
+            return False
+        if accessed is None:
+            accessed = time.time()
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.path.join(self.directory, INDEX_FILE), "ab") as index:
+            if fcntl is not None:
+                fcntl.flock(index, fcntl.LOCK_EX)
+            try:
+                segments = self._segments()
+                if not segments or os.path.getsize(
+                        os.path.join(self.directory, segments[-1])) >= SEGMENT_SIZE:
+                    number = _segment_number(segments[-1]) + 1 if segments else 0
+                    segments.append("segment-{:06d}.{}".format(number, self.codec))
+                name = segments[-1]
+                data = compress(content, _codec(name))
+                with open(os.path.join(self.directory, name), "ab") as segment:
+                    offset = segment.seek(0, os.SEEK_END)
+                    segment.write(data)
+                    segment.flush()
+                    os.fsync(segment.fileno())
+                # Drop what a crashed writer left of its record.
+                size = index.seek(0, os.SEEK_END)
+                index.truncate(size - size % _RECORD.size)
+                index.write(_RECORD.pack(anime, day, KINDS.index(kind), _segment_number(name),
+                                         offset, len(data), crc, accessed))
+                index.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(index, fcntl.LOCK_UN)
+        return True
+
+    def read(self, record: Record) -> bytes:
+        """
+        :param record: Index record of a page.
+        :return: Raw page.
+        """
+        return read_record(self.directory, record)
+
+    def get(self, anime: int, day: int, kind: str="stats") -> Optional[bytes]:
+        """
+        :return: Raw page archived last for this key or None.
+        """
+        self._refresh()
+        record = self._records.get((anime, day, kind))
+        return self.read(record) if record is not None else None
+
+    def records(self, kind: str=None, first_day: int=0,
+                last_day: int=None) -> Iterator[Record]:
+        """
+        :param kind: Only pages of this type or None for all.
+        :param first_day: First day (inclusive).
+        :param last_day: Last day (inclusive) or None for all.
+        :return: Latest record of every key, ordered by position in the archive.
+        """
+        self._refresh()
+        with self._lock:
+            records = list(self._records.values())
+        for record in sorted(records, key=lambda record: (record.segment, record.offset)):
+            if kind is not None and KINDS[record.kind] != kind:
+                continue
+            if record.day < first_day or (last_day is not None and record.day > last_day):
+                continue
+            yield record
+
+
+def read_record(directory: str, record: Record) -> bytes:
+    """
+    Read a page without a PageArchive, e.g. in worker processes.
+    :param directory: Directory of the archive.
+    :param record: Index record of the page.
+    :return: Raw page.
+    """
+    path = _segment_path(directory, record.segment)
+    with open(path, "rb") as fd:
+        fd.seek(record.offset)
+        data = decompress(fd.read(record.length), _codec(path))
+    if zlib.crc32(data) != record.crc:
+        raise ValueError("Page of anime {} on day {} is corrupt.".format(record.anime, record.day))
+    return data
+
+
+ARCHIVE = None
+
+
+def set_archive(archive: Optional[PageArchive]) -> None:
+    """
+    Replace the shared archive. None disables archiving (the default).
+    """
+    global ARCHIVE
+    ARCHIVE = archive
+
+
+def archive_response(url: str, kind: str, content: bytes) -> None:
+    """
+    Archive a fetched page in the shared archive if it is enabled.
+    :param url: Requested url.
+    :param kind: Endpoint type; only KINDS get archived.
+    :param content: Raw page.
+    """
+    if ARCHIVE is None or kind not in KINDS:
+        return
+    match = RE_ID.search(url)
+    if match is None:
+        return
+    ARCHIVE.add(int(match.group()), collection_day(), kind, content)
+
+
+def accessed_time(record: Record) -> datetime.datetime:
+    """
+    :return: Time of the request of an archived page (UTC).
+    """
+    return datetime.datetime.fromtimestamp(record.accessed, datetime.timezone.utc)
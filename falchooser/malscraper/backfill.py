@@ -0,0 +1,122 @@
+"""
+Regenerate statistics from archived /stats pages.
+
+Useful after fixing the parser or when rows got lost: the archived pages
+are read and parsed again in a process pool, one task per run of records
+in the same segment, and the resulting rows are upserted in batches.
+Pages of anime which are not in the database are skipped.
+
+    anime2db-backfill ARCHIVE_DIRECTORY [--first-day N] [--last-day N] [-p PROCESSES]
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Mapping, Sequence, Tuple
+
+from sqlalchemy import select
+
+from .archive import PageArchive, Record, read_record, accessed_time
+from .config import BATCH_SIZE
+from .dbaccess import Anime, Database, Statistics
+from .helpers import db_insert, chunked
+from .instrumentation import RECORDER
+from .scraper import parse_stats_page, STATS_KEYS
+
+# Records parsed by one task of the pool.
+TASK_SIZE = 64
+
+
+def _parse_records(directory: str, records: Sequence[Record],
+                   parse: Callable[[bytes], Mapping]) -> Sequence[Tuple[Record, object]]:
+    """
+    Worker of the pool; reads and parses a list of records.
+    :return: (record, statistics) pairs; the exception instead of the statistics on failure.
+    """
+    results = []
+    for record in records:
+        try:
+            stats = parse(read_record(directory, record))
+            if len(stats) != len(STATS_KEYS):
+                raise ValueError("Found {} of {} statistics.".format(len(stats), len(STATS_KEYS)))
+            results.append((record, stats))
+        except Exception as e:
+            results.append((record, e))
+    return results
+
+
+def _tasks(records: Iterable[Record], size: int) -> Iterator[Sequence[Record]]:
+    """
+    Group records of the same segment, so a task reads from one file only.
+    """
+    task = []
+    for record in records:
+        if task and (len(task) >= size or task[-1].segment != record.segment):
+            yield task
+            task = []
+        task.append(record)
+    if task:
+        yield task
+
+
+def create_row(record: Record, stats: Mapping) -> Statistics:
+    """
+    :param record: Archive record of the parsed page.
+    :param stats: Statistics parsed from the page.
+    :return: Statistics object from SQLAlchemy's ORM.
+    """
+    return Statistics(anime=record.anime, day=record.day, accessed=accessed_time(record), **stats)
+
+
+def backfill(archive: PageArchive, db: Database=None, first_day: int=0, last_day: int=None,
+             processes: int=None, batch_size: int=BATCH_SIZE,
+             parse: Callable[[bytes], Mapping]=parse_stats_page) -> Tuple[int, Sequence]:
+    """
+    Parse archived /stats pages again and upsert the statistics.
+    :param archive: Archive to read from.
+    :param db: Database to write to. Connects to the default one if None.
+    :param first_day: First day (inclusive).
+    :param last_day: Last day (inclusive) or None for all.
+    :param processes: Size of the process pool; the number of cores if None,
+                      0 parses in the main process.
+    :param batch_size: Number of rows committed at once.
+    :param parse: Parser of the pages, must be picklable.
+    :return: Number of written rows and (record, exception) of every failed page.
+    """
+    if db is None:
+        db = Database()
+    if processes is None:
+        processes = os.cpu_count() or 1
+    with db.engine.connect() as conn:
+        known = set(conn.execute(select(Anime.id)).scalars())
+    records = (record for record in archive.records("stats", first_day, last_day)
+               if record.anime in known)
+    work = functools.partial(_parse_records, archive.directory, parse=parse)
+    executor = ProcessPoolExecutor(processes) if processes > 0 else None
+    try:
+        # Results come in archive order, the rows of a batch mostly share a day.
+        results = (executor.map(work, _tasks(records, TASK_SIZE)) if executor is not None
+                   else map(work, _tasks(records, TASK_SIZE)))
+        count, failed = 0, []
+
+        def rows() -> Iterator[Statistics]:
+            for result in results:
+                for record, stats in result:
+                    if isinstance(stats, Exception):
+                        RECORDER.count("pages_failed")
+                        failed.append((record, stats))
+                    else:
+                        RECORDER.count("pages_parsed")
+                        yield create_row(record, stats)
+
+        for batch in chunked(rows(), batch_size):
+            count += db_insert(batch, True, db)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return count, failed
@@ -0,0 +1,252 @@
+"""
+On-disk HTTP response cache using conditional requests.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Mapping, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .connection import safe_requests_get
+from .archive import archive_response
+
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# Seconds a cached response is used without asking the server.
+DEFAULT_TTLS = {
+    "page": 30 * DAY,     # Anime pages, only used for titles and urls.
+    "search": 7 * DAY,    # Results of search.xml.
+    "stats": 6 * HOUR,    # Statistics change daily.
+}
+
+# Entries of these types also expire at midnight UTC, when the collection
+# day changes, so a page of yesterday is never stored as today's statistics.
+DAILY = ("stats",)
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "falchooser", "http")
+
+
+class ResponseCache:
+    """
+    Cache responses on disk, keyed by url and query parameters.
+    Stale entries are revalidated with If-None-Match/If-Modified-Since
+    so an unchanged page does not need to be downloaded again. Entries
+    of the DAILY types are stale from the next UTC day on.
+    Least recently used entries are evicted if the cache exceeds max_bytes.
+    """
+    def __init__(self, directory: str=DEFAULT_DIRECTORY, max_bytes: int=256 * 1024 ** 2,
+                 ttls: Mapping[str, float]=None):
+        """
+        Constructor
+        :param directory: Where to put the cached responses.
+        :param max_bytes: Maximum size of all cached bodies.
+        :param ttls: Mapping of endpoint type to time to live in seconds.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    def get(self, url: str, kind: str, **kwargs) -> requests.Response:
+        """
+        Get a response from cache or from Mal.
+        :param url: Absolute url to request.
+        :param kind: Endpoint type used for looking up the time to live.
+        :param kwargs: These are passed to safe_requests_get.
+        :return: A response object with status code 200; its from_cache is True
+                 if the body was read from the cache (also after revalidation).
+        """
+        key = self._key(url, kwargs.get("params"))
+        meta = self._read_meta(key)
+        if meta and self._fresh(meta, kind, time.time()):
+            body = self._read_body(key)
+            if body is not None:
+                self._count("hits")
+                return self._response(url, meta, body)
+        extra_headers = kwargs.pop("headers", None) or dict()
+        headers = dict(extra_headers)
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        r = safe_requests_get(url, headers=headers, **kwargs)
+        if r.status_code == 304 and meta:
+            body = self._read_body(key)
+            if body is not None:
+                self._count("revalidated")
+                meta["stored"] = time.time()
+                self._write_meta(key, meta)
+                return self._response(url, meta, body)
+            # Body got evicted in the meantime; download it again.
+            r = safe_requests_get(url, headers=extra_headers, **kwargs)
+        self._count("misses")
+        self._store(key, r)
+        return r
+
+    def _fresh(self, meta: dict, kind: str, now: float) -> bool:
+        if now - meta["stored"] >= self.ttls[kind]:
+            return False
+        return kind not in DAILY or meta["stored"] // DAY == now // DAY
+
+    def clear(self) -> None:
+        with self._lock:
+            for name in self._files():
+                os.remove(os.path.join(self.directory, name))
+            self._size = 0
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _key(url: str, params: Optional[Mapping[str, str]]) -> str:
+        if params:
+            url += "?" + "&".join("{}={}".format(k, params[k]) for k in sorted(params))
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, key + ext)
+
+    def _files(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [name for name in os.listdir(self.directory)
+                if name.endswith(".body") or name.endswith(".json")]
+
+    def _read_meta(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key, ".json")) as fd:
+                return json.load(fd)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key: str, meta: dict) -> None:
+        self._write(self._path(key, ".json"), json.dumps(meta).encode("utf-8"))
+
+    def _read_body(self, key: str) -> Optional[bytes]:
+        path = self._path(key, ".body")
+        try:
+            with open(path, "rb") as fd:
+                body = fd.read()
+            os.utime(path)  # Modification time marks the last access.
+            return body
+        except OSError:
+            return None
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        tmp = "{}.{}.tmp".format(path, threading.get_ident())
+        with open(tmp, "wb") as fd:
+            fd.write(data)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _response(url: str, meta: dict, body: bytes) -> requests.Response:
+        r = requests.Response()
+        r.status_code = 200
+        r.url = meta.get("url", url)
+        r.headers = CaseInsensitiveDict(meta.get("headers", dict()))
+        r.encoding = meta.get("encoding")
+        r._content = body
+        r.from_cache = True
+        return r
+
+    def _store(self, key: str, r: requests.Response) -> None:
+        if "no-store" in r.headers.get("Cache-Control", ""):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        body_path = self._path(key, ".body")
+        old_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+        self._write(body_path, r.content)
+        headers = {k: r.headers[k] for k in ("Content-Type",) if k in r.headers}
+        meta = {"url": r.url,
+                "stored": time.time(),
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "encoding": r.encoding,
+                "headers": headers}
+        self._write_meta(key, meta)
+        with self._lock:
+            if self._size is None:
+                self._size = sum(os.path.getsize(os.path.join(self.directory, name))
+                                 for name in self._files() if name.endswith(".body"))
+            else:
+                self._size += len(r.content) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """
+        Remove least recently used entries until the cache is at
+        most 3/4 of max_bytes. Needs to be called with lock held.
+        """
+        bodies = []
+        for name in self._files():
+            if name.endswith(".body"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                bodies.append((stat.st_mtime, stat.st_size, name[:-5]))
+        bodies.sort()
+        self._size = sum(size for _, size, _ in bodies)
+        for _, size, key in bodies:
+            if self._size <= self.max_bytes * 3 // 4:
+                break
+            for ext in (".body", ".json"):
+                try:
+                    os.remove(self._path(key, ext))
+                except OSError:
+                    pass
+            self._size -= size
+
+
+CACHE = ResponseCache()
+
+
+def set_cache(cache: Optional[ResponseCache]) -> None:
+    """
+    Replace the shared cache. None disables caching.
+    """
+    global CACHE
+    CACHE = cache
+
+
+def cached_get(url: str, kind: str, **kwargs) -> requests.Response:
+    """
+    Request url through the shared cache if it is enabled.
+    Anime pages downloaded from Mal are also put into the shared archive
+    if it is enabled; pages served by the cache were archived when they
+    were downloaded.
+    :param url: Absolute url to request.
+    :param kind: Endpoint type, one of the keys of DEFAULT_TTLS.
+    :param kwargs: These are passed to safe_requests_get.
+    :return: A response object with status code 200.
+    """
+    if CACHE is None:
+        r = safe_requests_get(url, **kwargs)
+    else:
+        r = CACHE.get(url, kind, **kwargs)
+    if not getattr(r, "from_cache", False):
+        archive_response(url, kind, r.content)
+    return r
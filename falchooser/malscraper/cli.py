@@ -0,0 +1,253 @@
+"""
+Command line interfaces.
+
+Argument parsing only needs the standard library; the scraper, database
+and export modules are imported after the arguments are parsed, so
+--help and argument errors return immediately.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import argparse
+import datetime
+import glob
+import os
+
+from .config import BATCH_SIZE
+from .throttle import LIMITER
+from .titles import get_titles_file, get_titles_path
+
+
+def _add_archive_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--archive", metavar="DIRECTORY",
+                        help="Archive every fetched anime page compressed in DIRECTORY, "
+                             "see anime2db-backfill.")
+
+
+def _enable_archive(directory: str) -> None:
+    if directory:
+        from .archive import PageArchive, set_archive
+        set_archive(PageArchive(directory))
+
+
+def _add_metrics_arguments(parser: argparse.ArgumentParser, every_run: bool=False) -> None:
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="{}rite timings and counters as JSON to PATH "
+                             "and in Prometheus text format next to it (.prom).".format(
+                                 "After every run w" if every_run else "W"))
+
+
+def stats_insert_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Scrape anime statistics from MAL and insert them into database.")
+    parser.add_argument("year", type=int, nargs="?", help="Year of broadcast.")
+    parser.add_argument("quarter", type=int, nargs="?", help="Quarter of broadcast.",
+                        choices=[1, 2, 3, 4])
+    parser.add_argument("--season", action="append", default=[], metavar="YEAR-QUARTER",
+                        help="Also insert this season (e.g. 2017-2). Can be repeated.")
+    parser.add_argument("--glob", action="append", default=[], metavar="PATTERN",
+                        help="Also insert anime from url files matching this pattern, "
+                             "relative to the titles folder (e.g. '2017-*-urls.txt').")
+    parser.add_argument("-y", action="store_true", help="Omit confirmation dialog.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of concurrent requests (default: 1).")
+    parser.add_argument("--rate", type=float, default=LIMITER.rate,
+                        help="Maximum requests per second for each host (default: {}).".format(
+                            LIMITER.rate))
+    parser.add_argument("--timeout", type=float, default=30.0,
+                        help="Seconds to wait for a response (default: 30).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not use the on-disk response cache.")
+    _add_archive_argument(parser)
+    parser.add_argument("-p", "--processes", type=int, default=0,
+                        help="Number of processes parsing pages (default: 0, parse in "
+                             "the main process).")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Number of rows committed at once (default: {}).".format(BATCH_SIZE))
+    _add_metrics_arguments(parser)
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Write a cProfile dump of the run to PATH.")
+    return parser
+
+
+def cmd_stats_insert() -> None:
+    """
+    Automatically scrape statistics and insert them into database.
+    Control via command line arguments.
+    """
+    parser = stats_insert_parser()
+    args = parser.parse_args()
+    seasons = [tuple(int(part) for part in season.split("-")) for season in args.season]
+    if args.year is not None:
+        if args.quarter is None:
+            parser.error("quarter is required together with year")
+        seasons.insert(0, (args.year, args.quarter))
+    paths = [get_titles_file(year, quarter, ignored, True)
+             for year, quarter in seasons for ignored in (False, True)]
+    for pattern in args.glob:
+        paths.extend(sorted(glob.glob(os.path.join(get_titles_path(), pattern))))
+    if not paths:
+        parser.error("no season given")
+    from . import cache
+    from .connection import CLIENT, STATS
+    from .helpers import insert_statistics_batch
+    from .instrumentation import RECORDER, profiled
+    LIMITER.rate = args.rate
+    CLIENT.configure(timeout=args.timeout, pool_size=max(args.jobs, 1))
+    if args.no_cache:
+        cache.set_cache(None)
+    _enable_archive(args.archive)
+    RECORDER.reset()
+    profiled(insert_statistics_batch, args.profile, paths, args.y, args.jobs,
+             processes=args.processes, batch_size=args.batch_size)
+    print("HTTP: {requests} requests, {retries} retries, "
+          "{connections} connections opened, {reused} reused.".format(**STATS.snapshot()))
+    if args.metrics:
+        RECORDER.write(args.metrics)
+    print("Done.")
+
+
+def daemon_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Scrape anime statistics from MAL once a day and insert them into database.")
+    parser.add_argument("--season", action="append", default=[], metavar="YEAR-QUARTER",
+                        help="Track anime of this season (e.g. 2017-2). Can be repeated. "
+                             "Default: all anime in the database.")
+    parser.add_argument("--at", default="00:30", help="Time of the daily run in UTC (default: 00:30).")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of concurrent requests (default: 1).")
+    parser.add_argument("--rate", type=float, default=LIMITER.rate,
+                        help="Maximum requests per second for each host (default: {}).".format(
+                            LIMITER.rate))
+    parser.add_argument("--once", action="store_true",
+                        help="Only fetch what is missing for today and exit.")
+    _add_archive_argument(parser)
+    _add_metrics_arguments(parser, every_run=True)
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Write a cProfile dump to PATH (only with --once).")
+    return parser
+
+
+def cmd_daemon() -> None:
+    """
+    Run the scraper as daemon. Control via command line arguments.
+    """
+    args = daemon_parser().parse_args()
+    seasons = [tuple(int(part) for part in season.split("-")) for season in args.season]
+    hour, minute = (int(part) for part in args.at.split(":"))
+    from .connection import CLIENT
+    from .daemon import ScrapeDaemon
+    from .instrumentation import RECORDER, profiled
+    LIMITER.rate = args.rate
+    CLIENT.configure(pool_size=max(args.jobs, 1))
+    _enable_archive(args.archive)
+    daemon = ScrapeDaemon(seasons=seasons, at=datetime.time(hour, minute), workers=args.jobs,
+                          metrics=args.metrics)
+    if args.once:
+        profiled(daemon.run_once, args.profile)
+        if args.metrics:
+            RECORDER.write(args.metrics)
+    else:
+        daemon.run_forever()
+
+
+def export_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Export anime statistics to a Parquet dataset partitioned by season and day.")
+    parser.add_argument("directory", help="Root directory of the dataset.")
+    parser.add_argument("--full", action="store_true",
+                        help="Export all days instead of only the new ones.")
+    return parser
+
+
+def cmd_export() -> None:
+    """
+    Export statistics to Parquet. Control via command line arguments.
+    """
+    args = export_parser().parse_args()
+    from .export import export_parquet
+    days = export_parquet(args.directory, full=args.full)
+    if days:
+        print("Exported days {} to {}.".format(
+            "{}..{}".format(days[0], days[-1]) if len(days) > 1 else days[0], args.directory))
+    else:
+        print("Nothing to export.")
+
+
+def migrate_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Migrate the database to the current schema.")
+    parser.add_argument("--partition", choices=("season", "days"),
+                        help="Partition the statistics table by ranges of days, one per "
+                             "season or of fixed length (PostgreSQL only).")
+    parser.add_argument("--days", type=int, default=92,
+                        help="Days per partition of the 'days' scheme (default: 92).")
+    return parser
+
+
+def cmd_migrate() -> None:
+    """
+    Migrate the database. Control via command line arguments.
+    """
+    args = migrate_parser().parse_args()
+    from .migrations import migrate
+    migrate(partition=args.partition, days=args.days)
+
+
+def compact_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Re-encode statistics of the 'delta' storage mode.")
+    parser.add_argument("--old-after", type=int, metavar="DAYS",
+                        help="Keyframes of data older than DAYS days are placed further apart.")
+    parser.add_argument("--import", dest="import_rows", action="store_true",
+                        help="First encode all rows of the statistics table, e.g. "
+                             "before switching to the 'delta' storage mode.")
+    return parser
+
+
+def cmd_compact() -> None:
+    """
+    Compact delta encoded statistics. Control via command line arguments.
+    """
+    args = compact_parser().parse_args()
+    from .dbaccess import Database
+    from .encoding import compact, import_statistics
+    from .days import collection_day
+    db = Database(storage="delta")
+    if args.import_rows:
+        print("Encoded {} rows.".format(import_statistics(db)))
+    before_day = collection_day() - args.old_after if args.old_after is not None else None
+    before, after = compact(db, before_day)
+    print("Compacted {} rows to {}.".format(before, after))
+
+
+def backfill_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Parse archived /stats pages again and write their statistics to database.")
+    parser.add_argument("directory", help="Directory of the archive.")
+    parser.add_argument("--first-day", type=int, default=0,
+                        help="First collection day to backfill (default: 0).")
+    parser.add_argument("--last-day", type=int,
+                        help="Last collection day to backfill (default: all).")
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count() or 1,
+                        help="Number of processes parsing pages (default: number of cores).")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Number of rows committed at once (default: {}).".format(BATCH_SIZE))
+    return parser
+
+
+def cmd_backfill() -> None:
+    """
+    Regenerate statistics from the page archive. Control via command line arguments.
+    """
+    args = backfill_parser().parse_args()
+    from .archive import PageArchive
+    from .backfill import backfill
+    count, failed = backfill(PageArchive(args.directory), first_day=args.first_day,
+                             last_day=args.last_day, processes=args.processes,
+                             batch_size=args.batch_size)
+    for record, e in failed:
+        print("Anime {} on day {}: {}".format(record.anime, record.day, e))
+    print("Wrote {} rows, {} pages failed.".format(count, len(failed)))
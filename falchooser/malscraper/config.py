@@ -0,0 +1,126 @@
+"""
+Lazily resolved configuration.
+
+Settings are looked up in this order: explicit overrides, environment
+variables (FALCHOOSER_USERNAME, FALCHOOSER_PASSWORD, FALCHOOSER_DBENGINE,
+FALCHOOSER_STORAGE) and the DEFAULT section of ~/.falchooser.ini (or the file named by
+FALCHOOSER_CONFIG). The file is only read when a setting is needed, so
+importing modules never requires credentials.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import os
+import threading
+from configparser import ConfigParser
+from typing import Optional
+
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".falchooser.ini")
+
+# Setting name -> key in the ini file.
+KEYS = {
+    "username": "Username",
+    "password": "Password",
+    "dbengine": "DBEngine",
+    "storage": "Storage",
+}
+
+# Number of rows committed at once when streaming.
+BATCH_SIZE = 50
+
+
+class ConfigError(KeyError):
+    """
+    A required setting is missing.
+    """
+    def __str__(self):
+        return self.args[0] if self.args else ""
+
+
+class Config:
+    """
+    Settings from overrides, environment and ini file.
+    """
+    def __init__(self, path: str=None, **overrides: str):
+        """
+        Constructor
+        :param path: Ini file; FALCHOOSER_CONFIG or ~/.falchooser.ini if None.
+        :param overrides: Settings taking precedence over everything else.
+        """
+        self.path = path
+        self._overrides = dict()
+        self._file = None
+        self._lock = threading.Lock()
+        self.override(**overrides)
+
+    def override(self, **overrides: Optional[str]) -> None:
+        """
+        Set settings explicitly. None removes an override.
+        """
+        for name, value in overrides.items():
+            if name not in KEYS:
+                raise TypeError("Unknown setting: {}".format(name))
+            if value is None:
+                self._overrides.pop(name, None)
+            else:
+                self._overrides[name] = value
+
+    def reload(self) -> None:
+        """
+        Read the ini file again on next access.
+        """
+        with self._lock:
+            self._file = None
+
+    def _read_file(self):
+        with self._lock:
+            if self._file is None:
+                path = self.path or os.environ.get("FALCHOOSER_CONFIG", DEFAULT_PATH)
+                parser = ConfigParser()
+                parser.read(path)
+                self._file = (path, parser["DEFAULT"])
+            return self._file
+
+    def get(self, name: str, default: Optional[str]=None) -> Optional[str]:
+        """
+        :param name: Name of the setting, key of KEYS.
+        :param default: Returned if the setting is nowhere defined.
+        """
+        if name in self._overrides:
+            return self._overrides[name]
+        env = os.environ.get("FALCHOOSER_" + name.upper())
+        if env is not None:
+            return env
+        _, section = self._read_file()
+        return section.get(KEYS[name], default)
+
+    def require(self, name: str) -> str:
+        """
+        :param name: Name of the setting, key of KEYS.
+        :raises ConfigError: If the setting is nowhere defined.
+        """
+        value = self.get(name)
+        if value is None:
+            path, _ = self._read_file()
+            raise ConfigError("Setting {} is missing. Add it to {} or set FALCHOOSER_{}.".format(
+                KEYS[name], path, name.upper()))
+        return value
+
+    @property
+    def username(self) -> str:
+        return self.require("username")
+
+    @property
+    def password(self) -> str:
+        return self.require("password")
+
+    @property
+    def dbengine(self) -> str:
+        return self.require("dbengine")
+
+
+CONFIG = Config()
@@ -0,0 +1,215 @@
+"""
+Shared HTTP connection pool with retries and backoff.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import datetime
+import email.utils
+import random
+import threading
+from collections import Counter
+from time import sleep
+from typing import Mapping, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+from .throttle import LIMITER
+from .instrumentation import RECORDER
+
+
+RETRY_AFTER_STATUS = frozenset((429, 503))
+RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
+
+
+class HttpStats:
+    """
+    Thread safe counters for requests, retries and connections.
+    """
+    def __init__(self):
+        self._counter = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, key: str, n: int=1) -> None:
+        with self._lock:
+            self._counter[key] += n
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counter.clear()
+
+    def snapshot(self) -> Mapping[str, int]:
+        """
+        :return: Copy of all counters. "reused" is the number of
+                 requests which did not need a new connection.
+        """
+        with self._lock:
+            snapshot = dict(self._counter)
+        for key in ("requests", "retries", "connections"):
+            snapshot.setdefault(key, 0)
+        snapshot["reused"] = max(0, snapshot["requests"] - snapshot["connections"])
+        return snapshot
+
+
+STATS = HttpStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        STATS.count("connections")
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        STATS.count("connections")
+        return super()._new_conn()
+
+
+class _CountingAdapter(HTTPAdapter):
+    """
+    Transport adapter counting every newly opened connection.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _CountingHTTPConnectionPool,
+                                                   "https": _CountingHTTPSConnectionPool}
+
+
+class HttpClient:
+    """
+    Keep-alive session which is shared by all requests to Mal.
+    Failed requests are retried with exponential backoff and jitter.
+    """
+    def __init__(self, timeout: Union[float, Tuple[float, float]]=(10.0, 30.0),
+                 max_retries: int=3, backoff: float=1.0, max_backoff: float=60.0,
+                 pool_size: int=10):
+        """
+        Constructor
+        :param timeout: Seconds for connecting and reading or a (connect, read) tuple.
+        :param max_retries: How often a failed request is retried.
+        :param backoff: Base delay in seconds; doubled for every retry.
+        :param max_backoff: Upper limit for a single computed delay in seconds;
+                            a server's Retry-After is honoured as given.
+        :param pool_size: Number of connections kept alive per host.
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = _CountingAdapter(pool_connections=self.pool_size,
+                                           pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def configure(self, **kwargs) -> None:
+        """
+        Change settings of the client. Takes the same arguments as
+        the constructor. The session is recreated on next use.
+        """
+        for key, value in kwargs.items():
+            if not hasattr(self, key) or key.startswith("_"):
+                raise TypeError("Unknown setting: {}".format(key))
+            setattr(self, key, value)
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def get(self, url: str, *args, **kwargs) -> requests.Response:
+        """
+        Make a safe request with error handling and retries.
+        Every attempt waits for the rate limit of the url's host.
+        :param url: Absolute url to request.
+        :param *args: These are passed to the requests.Session.get function.
+        :return: A response object with status code 200 (or 304 for conditional requests).
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        tried = 0
+        while True:
+            LIMITER.wait(url)
+            STATS.count("requests")
+            RECORDER.count("http_requests")
+            try:
+                with RECORDER.timer("http"):
+                    r = self.session.get(url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if tried >= self.max_retries:
+                    raise
+                print("{} - {}".format(url, e), "Trying again.")
+                delay = self._backoff(tried)
+            else:
+                if r.status_code == 200 or r.status_code == 304:
+                    RECORDER.count("http_bytes", len(r.content))
+                    return r
+                elif tried >= self.max_retries or r.status_code not in RETRY_STATUS:
+                    raise requests.HTTPError("{} - {}".format(r.status_code, r.text), response=r)
+                print("{} - {}".format(r.status_code, r.reason), "Trying again.")
+                delay = None
+                if r.status_code in RETRY_AFTER_STATUS:
+                    delay = parse_retry_after(r.headers.get("Retry-After"))
+                if delay is None:
+                    delay = self._backoff(tried)
+            tried += 1
+            STATS.count("retries")
+            RECORDER.count("http_retries")
+            with RECORDER.timer("retry_sleep"):
+                sleep(delay)
+
+    def _backoff(self, tried: int) -> float:
+        """
+        Exponential backoff with full jitter.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** tried))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse the value of a Retry-After header.
+    :param value: Either delay in seconds or a HTTP date.
+    :return: Seconds to wait or None if value is missing or invalid.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+CLIENT = HttpClient()
+
+
+def safe_requests_get(url: str, *args, **kwargs) -> requests.Response:
+    """
+    Make a safe request using the shared client.
+    :param url: Absolute url to request.
+    :param *args: These are passed to the requests.Session.get function.
+    :return: A response object with status code 200.
+    """
+    return CLIENT.get(url, *args, **kwargs)
@@ -0,0 +1,153 @@
+"""
+Long running scraper which inserts statistics on a daily schedule.
+
+The daemon keeps its HTTP session and database engine between runs.
+Every run asks the database which tracked anime have no statistics for
+the current day and scrapes only these; rows are committed in small
+batches, so a run that dies halfway continues where it stopped.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import datetime
+import time
+from typing import Mapping, Sequence, Tuple
+
+from sqlalchemy import select, func, case
+
+from .dbaccess import Database, Anime, Statistics, StatisticsEncoded
+from .days import collection_day
+from .helpers import create_stats_object, db_insert, scrape, chunked
+from .titles import read_titles, anime_id
+from .migrations import ensure_partitions
+from .instrumentation import RECORDER
+
+
+class ScrapeDaemon:
+    """
+    Scrape statistics of tracked anime once a day.
+    """
+    def __init__(self, db: Database=None, seasons: Sequence[Tuple[int, int]]=(),
+                 at: datetime.time=datetime.time(0, 30), workers: int=1, batch_size: int=10,
+                 metrics: str=None):
+        """
+        Constructor
+        :param db: Database to write to. Connects to the default one if None.
+        :param seasons: (year, quarter) pairs whose titles files are tracked.
+                        All anime of the anime table are tracked if empty.
+        :param at: Time of day (UTC) of the daily run.
+        :param workers: Maximum number of concurrent requests.
+        :param batch_size: Number of anime committed at once.
+        :param metrics: Write timings and counters of every run to this path
+                        (JSON and Prometheus text format), see instrumentation.
+        """
+        self.db = db if db is not None else Database()
+        self.seasons = tuple(seasons)
+        self.at = at
+        self.workers = workers
+        self.batch_size = batch_size
+        self.metrics = metrics
+
+    def tracked(self) -> Mapping[int, str]:
+        """
+        :return: Dictionary mapping ids of tracked anime to their urls.
+        """
+        if self.seasons:
+            urls = [url for year, quarter in self.seasons for ignored in (False, True)
+                    for url in read_titles(year, quarter, ignored, True)]
+            return {anime_id(url): url for url in urls}
+        with self.db.engine.connect() as conn:
+            return dict(conn.execute(select(Anime.id, Anime.url)).all())
+
+    def missing(self, day: int, tracked: Sequence[int]=None) -> Sequence[int]:
+        """
+        :param day: Day to check.
+        :param tracked: Ids of tracked anime; looked up if None.
+        :return: Sorted ids of tracked anime without statistics for this day.
+        """
+        if tracked is None:
+            tracked = self.tracked()
+        if self.db.storage == "delta":
+            table = StatisticsEncoded
+            query = select(table.anime).where(table.day <= day, table.until >= day)
+        else:
+            query = select(Statistics.anime).where(Statistics.day == day)
+        with self.db.engine.connect() as conn:
+            present = set(conn.execute(query).scalars())
+        return sorted(anime for anime in tracked if anime not in present)
+
+    def gaps(self, last_day: int, tracked: Sequence[int]=None) -> Mapping[int, int]:
+        """
+        Count days without statistics for each tracked anime, starting at
+        the first day the anime has statistics for.
+        :param last_day: Last day to check (inclusive).
+        :param tracked: Ids of tracked anime; looked up if None.
+        :return: Dictionary mapping anime ids to their number of missing days; only anime with gaps.
+        """
+        if tracked is None:
+            tracked = self.tracked()
+        if self.db.storage == "delta":
+            table = StatisticsEncoded
+            until = case((table.until > last_day, last_day), else_=table.until)
+            query = select(table.anime, func.min(table.day), func.sum(until - table.day + 1))
+            query = query.where(table.day <= last_day)
+        else:
+            table = Statistics
+            query = select(table.anime, func.min(table.day), func.count()).where(
+                table.day <= last_day)
+        with self.db.engine.connect() as conn:
+            rows = conn.execute(query.group_by(table.anime)).all()
+        tracked = set(tracked)
+        return {anime: last_day - first_day + 1 - days for anime, first_day, days in rows
+                if anime in tracked and last_day - first_day + 1 > days}
+
+    def run_once(self) -> int:
+        """
+        Scrape statistics of all tracked anime missing for the current day.
+        Past days cannot be scraped anymore; these gaps are only reported.
+        :return: Number of inserted rows.
+        """
+        today = collection_day()
+        with self.db.engine.begin() as conn:
+            for name in ensure_partitions(conn):
+                print("Created partition {}.".format(name))
+        tracked = self.tracked()
+        gaps = sum(self.gaps(today - 1, tracked).values())
+        if gaps:
+            print("{} past (anime, day) pairs have no statistics.".format(gaps))
+        urls = [tracked[anime] for anime in self.missing(today, tracked)]
+        print("Scraping {} of {} anime for day {}.".format(len(urls), len(tracked), today))
+        inserted = 0
+        for batch in chunked(urls, self.batch_size):
+            rows = scrape(batch, create_stats_object, self.workers)
+            # A run started before midnight must not write rows of the next day.
+            rows = [row for row in rows if row.day == today]
+            inserted += db_insert(rows, True, self.db)
+        return inserted
+
+    def seconds_until_next_run(self, now: datetime.datetime=None) -> float:
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        run = datetime.datetime.combine(now.date(), self.at, tzinfo=datetime.timezone.utc)
+        if run <= now:
+            run += datetime.timedelta(days=1)
+        return (run - now).total_seconds()
+
+    def run_forever(self) -> None:
+        """
+        Catch up immediately, then run once a day at the scheduled time.
+        """
+        while True:
+            RECORDER.reset()
+            try:
+                self.run_once()
+            except Exception as e:
+                # Keep the daemon alive; the next run retries what is missing.
+                RECORDER.count("runs_failed")
+                print("Run failed: {!r}".format(e))
+            if self.metrics:
+                RECORDER.write(self.metrics)
+            time.sleep(self.seconds_until_next_run())
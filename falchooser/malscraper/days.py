@@ -0,0 +1,39 @@
+"""
+Collection days and seasons.
+
+Statistics are stored per collection day, the number of days since the
+start of data collection (UTC). Only needs the standard library, so
+analysis modules can use it without loading the scraper.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import datetime
+from typing import Tuple
+
+
+START_OF_DATA_COLLECTION = datetime.date(2017, 4, 2)
+
+
+def collection_day(now: datetime.datetime=None) -> int:
+    """
+    :param now: Point in time (UTC); the current time if None.
+    :return: Number of days since START_OF_DATA_COLLECTION.
+    """
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    return (now.date() - START_OF_DATA_COLLECTION).days
+
+
+def season_days(year: int, quarter: int) -> Tuple[int, int]:
+    """
+    :param year: Year of broadcast.
+    :param quarter: Quarter of broadcast (winter, spring, summer, fall).
+    :return: Collection days of the first and the day after the last day of this season.
+    """
+    first = datetime.date(year, quarter * 3 - 2, 1)
+    end = datetime.date(year + quarter // 4, quarter % 4 * 3 + 1, 1)
+    return (first - START_OF_DATA_COLLECTION).days, (end - START_OF_DATA_COLLECTION).days
@@ -8,21 +8,29 @@ Created on Apr 1, 2017
 :licence: GPLv3, see LICENSE for more details.
 """
 
-from configparser import ConfigParser
-import os
+from collections import OrderedDict
+from typing import Any, Iterable, Mapping, Sequence
 
-from sqlalchemy import Column, ForeignKey, create_engine, Table
-from sqlalchemy import Integer, Float, DateTime, String
+from sqlalchemy import Column, ForeignKey, Index, UniqueConstraint, create_engine, Table
+from sqlalchemy import Integer, Float, DateTime, String, Boolean
+from sqlalchemy import select, tuple_, and_, bindparam, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.pool import StaticPool
 
+from .config import CONFIG
 
-CONFIG = ConfigParser()
-CONFIG.read(os.path.join(os.path.expanduser("~"), ".falchooser.ini"))
-try:
-    DBENGINE = CONFIG["DEFAULT"]["DBEngine"]
-except KeyError as e:
-    raise e
+
+CHUNK_SIZE = 1000
+
+
+def __getattr__(name: str) -> str:
+    # DBENGINE used to be read at import time.
+    if name == "DBENGINE":
+        return CONFIG.dbengine
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 Base = declarative_base()
@@ -33,14 +41,43 @@ user_anime_team = Table("user_anime_team", Base.metadata,
                         Column("anime", ForeignKey("anime.id"), primary_key=True))
 
 
+def season_id(year: int, quarter: int) -> int:
+    """
+    :param year: Year of broadcast.
+    :param quarter: Quarter of broadcast (winter, spring, summer, fall).
+    :return: Id of the season, e.g. 20172 for spring 2017.
+    """
+    return year * 10 + quarter
+
+
+class Season(Base):
+    """
+    Broadcast season of anime. Ids are made by season_id.
+    """
+    __tablename__ = "season"
+    __table_args__ = (UniqueConstraint("year", "quarter"),)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    year = Column(Integer, nullable=False)
+    quarter = Column(Integer, nullable=False)
+    anime = relationship("Anime", back_populates="season")
+
+    def __repr__(self):
+        return "<Season(year={}, quarter={})>".format(self.year, self.quarter)
+
+
 class Anime(Base):
     """
-    This table just holds the anime's title and id.
+    This table holds the anime's title and id and the season it was inserted for.
     """
     __tablename__ = "anime"
+    # Anime of a season, optionally only the (not) ignored ones, without reading the table.
+    __table_args__ = (Index("ix_anime_season_ignored", "season_id", "ignored"),)
     id = Column(Integer, primary_key=True, autoincrement=False)
     title = Column(String(1024), nullable=False)
     url = Column(String(2048), nullable=False, unique=True)
+    season_id = Column(Integer, ForeignKey("season.id"))
+    ignored = Column(Boolean)
+    season = relationship("Season", back_populates="anime")
     users = relationship("User", secondary=user_anime_team, back_populates="anime")
 
     def __repr__(self):
@@ -50,8 +87,12 @@ class Anime(Base):
 class Statistics(Base):
     """
     Save the statistics as a time series.
+    The primary key serves lookups by anime, the day index lookups by day
+    (latest day, all anime of one day). On PostgreSQL the table can be
+    partitioned by day, see migrations module.
     """
     __tablename__ = "statistics"
+    __table_args__ = (Index("ix_statistics_day_anime", "day", "anime"),)
     anime = Column(Integer, ForeignKey("anime.id"), primary_key=True, autoincrement=False)
     day = Column(Integer, primary_key=True, autoincrement=False)
     score = Column(Float)
@@ -71,6 +112,73 @@ class Statistics(Base):
         return "<Statistics(anime={}, day={}, accessed={})>".format(self.anime, self.day, self.accessed)
 
 
+# Names of the scraped statistics columns.
+METRICS = ("score", "users", "ranked", "popularity", "members", "favorites",
+           "watching", "completed", "onhold", "dropped", "plantowatch")
+
+STORAGE_MODES = ("full", "delta")
+
+
+class StatisticsEncoded(Base):
+    """
+    Statistics in the "delta" storage mode, see encoding module.
+    A row holds the values of the days day..until. Keyframes store all
+    values, other rows store the counters as differences to the row before
+    and the day of the keyframe they are relative to.
+    """
+    __tablename__ = "statistics_encoded"
+    __table_args__ = (Index("ix_statistics_encoded_day", "day"),
+                      Index("ix_statistics_encoded_until", "until"))
+    anime = Column(Integer, ForeignKey("anime.id"), primary_key=True, autoincrement=False)
+    day = Column(Integer, primary_key=True, autoincrement=False)
+    until = Column(Integer, nullable=False)
+    keyframe = Column(Integer, nullable=False)
+    score = Column(Float)
+    users = Column(Integer)
+    ranked = Column(Integer)
+    popularity = Column(Integer)
+    members = Column(Integer)
+    favorites = Column(Integer)
+    watching = Column(Integer)
+    completed = Column(Integer)
+    onhold = Column(Integer)
+    dropped = Column(Integer)
+    plantowatch = Column(Integer)
+    accessed = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return "<StatisticsEncoded(anime={}, day={}, until={})>".format(
+            self.anime, self.day, self.until)
+
+
+class StatisticsDelta(Base):
+    """
+    Day-over-day and week-over-week differences of each statistics metric.
+    Maintained from the statistics table, see aggregates module.
+    """
+    __tablename__ = "statistics_delta"
+    metric = Column(String(16), primary_key=True)
+    day = Column(Integer, primary_key=True, autoincrement=False)
+    anime = Column(Integer, ForeignKey("anime.id"), primary_key=True, autoincrement=False)
+    daily = Column(Float)
+    weekly = Column(Float)
+
+    def __repr__(self):
+        return "<StatisticsDelta(anime={}, day={}, metric={})>".format(self.anime, self.day, self.metric)
+
+
+class DataVersion(Base):
+    """
+    Counter increased by every write, so caches can tell if their results are stale.
+    """
+    __tablename__ = "data_version"
+    name = Column(String(16), primary_key=True)
+    version = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return "<DataVersion(name={}, version={})>".format(self.name, self.version)
+
+
 class User(Base):
     """
     Simple list of MAL usernames.
@@ -89,9 +197,29 @@ class Database:
     Simple database class for creating tables and
     getting the session object (for queryies and inserts).
     """
-    def __init__(self, engine: str=DBENGINE, echo: bool=False):
-        self.engine = create_engine(engine, echo=echo)
+    def __init__(self, engine: str=None, echo: bool=False, storage: str=None):
+        """
+        Constructor
+        :param engine: SQLAlchemy database url; DBEngine of the configuration if None.
+        :param echo: Log all statements.
+        :param storage: How statistics are stored, "full" rows or "delta" encoded
+                        (see encoding module); Storage of the configuration if None.
+        """
+        if engine is None:
+            engine = CONFIG.dbengine
+        if storage is None:
+            storage = CONFIG.get("storage", "full")
+        if storage not in STORAGE_MODES:
+            raise ValueError("Unknown storage mode: {}".format(storage))
+        self.storage = storage
+        kwargs = dict()
+        url = make_url(engine)
+        if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+            # Otherwise every thread gets its own, empty in-memory database.
+            kwargs = {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+        self.engine = create_engine(engine, echo=echo, **kwargs)
         self._sessionmaker = sessionmaker(bind=self.engine)
+        self._version_table_checked = False
 
     def create_tables(self):
         global Base
@@ -103,3 +231,133 @@ class Database:
 
     def get_session(self) -> Session:
         return self._sessionmaker()
+
+    def upsert(self, rows: Sequence[Base]) -> int:
+        """
+        Insert ORM objects in bulk, updating rows which already exist.
+        Everything is written in a single transaction. In the "delta"
+        storage mode statistics go to the statistics_encoded table.
+        :param rows: A list of database row objects.
+        :return: Number of written rows.
+        """
+        tables = OrderedDict()
+        for row in rows:
+            tables.setdefault(row.__table__, []).append(row_to_dict(row))
+        with self.engine.begin() as conn:
+            count = 0
+            for table, values in tables.items():
+                if table is Statistics.__table__ and self.storage == "delta":
+                    from .encoding import write_statistics
+                    count += write_statistics(conn, values)
+                else:
+                    count += upsert_rows(conn, table, values)
+            if count:
+                self.bump_version(conn)
+            return count
+
+    def bump_version(self, conn: Connection) -> None:
+        """
+        Increase the data version in the transaction of conn.
+        Databases created before the data_version table get it on first use.
+        """
+        if not self._version_table_checked:
+            DataVersion.__table__.create(conn, checkfirst=True)
+            self._version_table_checked = True
+        bump_data_version(conn)
+
+
+def bump_data_version(conn: Connection, name: str="data") -> None:
+    """
+    Increase a data version by one.
+    :param conn: Connection with an open transaction.
+    :param name: Name of the version counter.
+    """
+    table = DataVersion.__table__
+    result = conn.execute(update(table).where(table.c.name == name)
+                          .values(version=table.c.version + 1))
+    if result.rowcount == 0:
+        upsert_rows(conn, table, [{"name": name, "version": 1}], update=False)
+
+
+def read_data_version(conn: Connection, name: str="data") -> int:
+    """
+    :param conn: An open connection.
+    :param name: Name of the version counter.
+    :return: Current version; 0 if nothing was written yet.
+    """
+    table = DataVersion.__table__
+    version = conn.execute(select(table.c.version).where(table.c.name == name)).scalar()
+    return version or 0
+
+
+def row_to_dict(row: Base) -> Mapping[str, Any]:
+    """
+    :param row: Database object (ORM).
+    :return: Dictionary mapping column names to the object's values.
+    """
+    return {column.name: getattr(row, column.key)
+            for column in row.__mapper__.columns}
+
+
+def _chunks(values: Sequence[Any], size: int=CHUNK_SIZE) -> Iterable[Sequence[Any]]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def upsert_rows(conn: Connection, table: Table, rows: Sequence[Mapping[str, Any]],
+                update: bool=True) -> int:
+    """
+    Insert rows in bulk. Rows with an existing primary key are updated
+    (or skipped if update is False) instead of raising an error.
+    Uses INSERT ... ON CONFLICT on PostgreSQL and SQLite and a
+    select followed by executemany updates/inserts on other backends.
+    :param conn: Connection with an open transaction.
+    :param table: Table to write to.
+    :param rows: Dictionaries mapping column names to values.
+    :param update: Overwrite existing rows.
+    :return: Number of written rows.
+    """
+    if not rows:
+        return 0
+    if conn.dialect.name in ("postgresql", "sqlite"):
+        return _upsert_on_conflict(conn, table, rows, update)
+    return _upsert_generic(conn, table, rows, update)
+
+
+def _upsert_on_conflict(conn: Connection, table: Table, rows: Sequence[Mapping[str, Any]],
+                        update: bool) -> int:
+    keys = [column.name for column in table.primary_key.columns]
+    insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(table)
+    values = [column.name for column in table.columns
+              if column.name not in keys and column.name in rows[0]]
+    if update and values:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys, set_={name: stmt.excluded[name] for name in values})
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+    for chunk in _chunks(rows):
+        conn.execute(stmt, list(chunk))
+    return len(rows)
+
+
+def _upsert_generic(conn: Connection, table: Table, rows: Sequence[Mapping[str, Any]],
+                    update: bool) -> int:
+    keys = [column.name for column in table.primary_key.columns]
+    key_columns = [table.c[key] for key in keys]
+    existing = set()
+    for chunk in _chunks(rows):
+        query = select(*key_columns).where(
+            tuple_(*key_columns).in_([tuple(row[key] for key in keys) for row in chunk]))
+        existing.update(tuple(found) for found in conn.execute(query))
+    new_rows = [row for row in rows if tuple(row[key] for key in keys) not in existing]
+    old_rows = [row for row in rows if tuple(row[key] for key in keys) in existing]
+    if update and old_rows:
+        criteria = and_(*(table.c[key] == bindparam("_" + key) for key in keys))
+        stmt = table.update().where(criteria)
+        params = [dict(row, **{"_" + key: row[key] for key in keys}) for row in old_rows]
+        for chunk in _chunks(params):
+            conn.execute(stmt, list(chunk))
+    for chunk in _chunks(new_rows):
+        conn.execute(table.insert(), list(chunk))
+    return len(new_rows) + (len(old_rows) if update else 0)
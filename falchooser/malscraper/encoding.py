@@ -0,0 +1,372 @@
+"""
+Change-aware, delta encoded storage of the statistics ("delta" storage mode).
+
+Most counters of finished or ignored anime barely move, so storing a
+full row per anime and day mostly repeats the day before. In this mode
+the statistics_encoded table holds runs instead:
+
+- A day with the same values as the day before, accessed exactly one
+  day later, only extends the run of that day (until += 1); no row is
+  written.
+- A changed day starts a new run. Its counters are stored as the
+  difference to the run before; SQLite stores these small integers in
+  fewer bytes.
+- Every KEYFRAME_INTERVAL days (and whenever a counter reappears after
+  being unknown) a run is a keyframe holding all values. Every row
+  names the day of its keyframe, so decoding a range of days starts
+  at the earliest keyframe any row of the range refers to.
+
+read_runs and read_statistics decode the table again; queries,
+aggregates, export, store and the daemon use them when a Database is
+in the "delta" mode, so callers see the same values as with full rows.
+A run only covers days accessed at the same time of day: the accessed
+time of a day inside a run is the one of the run's first day shifted by
+whole days, so it is stored without loss. compact re-encodes the data of each anime,
+merging runs and placing keyframes further apart in old data, which is
+rarely read in small ranges.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import datetime
+from typing import Any, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import select, func, and_, bindparam
+from sqlalchemy.engine import Connection
+
+from .dbaccess import Database, Statistics, StatisticsEncoded, METRICS, CHUNK_SIZE
+
+# Keyframes are at most this many days apart.
+KEYFRAME_INTERVAL = 28
+
+# Same for old data after compaction.
+OLD_KEYFRAME_INTERVAL = 364
+
+# Metrics stored as differences; score is a float and always stored as it is.
+COUNTERS = METRICS[1:]
+
+
+class Run:
+    """
+    Decoded values of an anime which stayed the same from day to until.
+    """
+    __slots__ = ("anime", "day", "until", "keyframe", "values", "accessed")
+
+    def __init__(self, anime: int, day: int, until: int, keyframe: int,
+                 values: Tuple, accessed: datetime.datetime):
+        self.anime = anime
+        self.day = day
+        self.until = until
+        # Day of the keyframe this run is relative to.
+        self.keyframe = keyframe
+        self.values = values
+        self.accessed = accessed
+
+    def __repr__(self):
+        return "<Run(anime={}, day={}, until={})>".format(self.anime, self.day, self.until)
+
+    def days(self) -> Iterator[Tuple[int, Tuple, datetime.datetime]]:
+        """
+        :return: Iterator of (day, values, accessed) of every day of the run.
+        """
+        for day in range(self.day, self.until + 1):
+            yield day, self.values, self.accessed + datetime.timedelta(days=day - self.day)
+
+
+def encode(anime: int, points: Iterable[Tuple[int, Tuple, datetime.datetime]],
+           last: Run=None, interval: int=KEYFRAME_INTERVAL) -> Tuple[bool, List[Run]]:
+    """
+    Encode days of one anime as runs.
+    :param anime: Mal id of the anime.
+    :param points: (day, values of METRICS, accessed) sorted by day.
+    :param last: Last stored run; all days must be after its until.
+    :param interval: Maximum number of days between keyframes.
+    :return: Whether last got extended, and the new runs.
+    """
+    extended = False
+    runs = []
+    for day, values, accessed in points:
+        values = tuple(values)
+        if last is not None and day == last.until + 1 and values == last.values \
+                and day - last.keyframe < interval and _in_run(last, day, accessed):
+            last.until = day
+            extended = extended or not runs
+            continue
+        keyframe = last is None or day - last.keyframe >= interval or any(
+            value is not None and previous is None
+            for value, previous in zip(values[1:], last.values[1:]))
+        last = Run(anime, day, day, day if keyframe else last.keyframe, values, accessed)
+        runs.append(last)
+    return extended, runs
+
+
+def _in_run(run: Run, day: int, accessed: datetime.datetime) -> bool:
+    """
+    :return: Whether Run.days would yield accessed for day.
+    """
+    expected = run.accessed + datetime.timedelta(days=day - run.day)
+    if (expected.tzinfo is None) != (accessed.tzinfo is None):
+        # SQLite returns naive datetimes of the stored (UTC) times.
+        expected, accessed = expected.replace(tzinfo=None), accessed.replace(tzinfo=None)
+    return expected == accessed
+
+
+def to_rows(runs: Sequence[Run], previous: Run=None) -> List[Mapping[str, Any]]:
+    """
+    :param runs: Runs of one anime sorted by day.
+    :param previous: Run before the first one; None if the first one is a keyframe.
+    :return: Rows of the statistics_encoded table.
+    """
+    rows = []
+    for run in runs:
+        keyframe = run.keyframe == run.day
+        row = {"anime": run.anime, "day": run.day, "until": run.until, "keyframe": run.keyframe,
+               "score": run.values[0], "accessed": run.accessed}
+        for i, metric in enumerate(COUNTERS, 1):
+            value = run.values[i]
+            if not keyframe and value is not None:
+                value -= previous.values[i]
+            row[metric] = value
+        rows.append(row)
+        previous = run
+    return rows
+
+
+def _decode(rows: Iterable[Sequence]) -> Iterator[Run]:
+    """
+    :param rows: (anime, day, until, keyframe, score, counters..., accessed) sorted
+                 by anime and day. Rows before the first keyframe of an anime are skipped.
+    """
+    previous = None
+    for anime, day, until, keyframe, *values, accessed in rows:
+        if keyframe == day:
+            values = tuple(values)
+            previous = Run(anime, day, until, day, values, accessed)
+        elif previous is not None and previous.anime == anime:
+            values = (values[0],) + tuple(
+                None if delta is None else old + delta
+                for delta, old in zip(values[1:], previous.values[1:]))
+            previous = Run(anime, day, until, previous.keyframe, values, accessed)
+        else:
+            continue
+        yield previous
+
+
+def _columns() -> Sequence:
+    table = StatisticsEncoded
+    return [table.anime, table.day, table.until, table.keyframe] + \
+        [getattr(table, metric) for metric in METRICS] + [table.accessed]
+
+
+def read_runs(conn: Connection, first_day: int=0, last_day: int=None,
+              anime_ids: Iterable[int]=None) -> Iterator[Run]:
+    """
+    Decode the runs overlapping the given days.
+    :param conn: An open connection.
+    :param first_day: First day (inclusive).
+    :param last_day: Last day (inclusive) or None for all.
+    :param anime_ids: Only these anime or None for all.
+    :return: Runs clipped to the days, sorted by anime and day.
+    """
+    table = StatisticsEncoded
+    query = select(*_columns())
+    start = select(func.min(table.keyframe)).where(table.until >= first_day)
+    if last_day is not None:
+        query = query.where(table.day <= last_day)
+    if anime_ids is not None:
+        anime_ids = sorted({int(id) for id in anime_ids})
+        query = query.where(table.anime.in_(anime_ids))
+        start = start.where(table.anime.in_(anime_ids))
+    # Keyframes only grow with the day, so the first run of each anime
+    # reaching first_day refers to the earliest keyframe needed.
+    start = conn.execute(start).scalar()
+    if start is None:
+        return
+    rows = conn.execute(query.where(table.day >= start).order_by(table.anime, table.day))
+    for run in _decode(rows):
+        if run.until < first_day:
+            continue
+        if run.day < first_day:
+            run.accessed += datetime.timedelta(days=first_day - run.day)
+            run.day = first_day
+        if last_day is not None and run.until > last_day:
+            run.until = last_day
+        yield run
+
+
+def read_statistics(conn: Connection, columns: Sequence[str]=METRICS, first_day: int=0,
+                    last_day: int=None, anime_ids: Iterable[int]=None) -> Iterator[Tuple]:
+    """
+    Read statistics like from the statistics table.
+    :param conn: An open connection.
+    :param columns: Names of METRICS and/or "accessed".
+    :param first_day: First day (inclusive).
+    :param last_day: Last day (inclusive) or None for all.
+    :param anime_ids: Only these anime or None for all.
+    :return: Tuples of (anime, day, *columns) ordered by anime and day.
+    """
+    index = [METRICS.index(column) if column != "accessed" else None for column in columns]
+    for run in read_runs(conn, first_day, last_day, anime_ids):
+        for day, values, accessed in run.days():
+            yield (run.anime, day) + tuple(accessed if i is None else values[i] for i in index)
+
+
+def latest_day(conn: Connection) -> Optional[int]:
+    """
+    :param conn: An open connection.
+    :return: Latest day with statistics or None if there are none.
+    """
+    return conn.execute(select(func.max(StatisticsEncoded.until))).scalar()
+
+
+def _read_tails(conn: Connection, anime_ids: Sequence[int]) -> Mapping[int, List[Run]]:
+    """
+    :return: Dictionary mapping anime ids to their runs from their last keyframe on.
+    """
+    table = StatisticsEncoded
+    last = select(table.anime.label("anime"), func.max(table.keyframe).label("keyframe")) \
+        .where(table.anime.in_(anime_ids)).group_by(table.anime).subquery()
+    rows = conn.execute(select(*_columns()).join(last, and_(
+        table.anime == last.c.anime, table.day >= last.c.keyframe))
+        .order_by(table.anime, table.day))
+    tails = dict()
+    for run in _decode(rows):
+        tails.setdefault(run.anime, []).append(run)
+    return tails
+
+
+def _delete(conn: Connection, anime: int, first_day: int=None) -> None:
+    table = StatisticsEncoded.__table__
+    delete = table.delete().where(table.c.anime == anime)
+    if first_day is not None:
+        delete = delete.where(table.c.day >= first_day)
+    conn.execute(delete)
+
+
+def write_statistics(conn: Connection, rows: Sequence[Mapping[str, Any]],
+                     interval: int=KEYFRAME_INTERVAL) -> int:
+    """
+    Write statistics rows, replacing days which already exist.
+    New days after the stored ones are appended; days in between make
+    the anime get re-encoded from the keyframe before them.
+    :param conn: Connection with an open transaction.
+    :param rows: Dictionaries of statistics table columns.
+    :param interval: Maximum number of days between keyframes.
+    :return: Number of written statistics rows.
+    """
+    table = StatisticsEncoded.__table__
+    points = dict()
+    for row in rows:
+        points.setdefault(row["anime"], dict())[row["day"]] = (
+            tuple(row[metric] for metric in METRICS), row["accessed"])
+    ids = sorted(points)
+    inserts = []
+    extensions = []
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        tails = _read_tails(conn, chunk)
+        for anime in chunk:
+            new = sorted((day, values, accessed)
+                         for day, (values, accessed) in points[anime].items())
+            tail = tails.get(anime)
+            if tail and new[0][0] > tail[-1].until:
+                extended, runs = encode(anime, new, tail[-1], interval)
+                if extended:
+                    extensions.append({"_anime": anime, "_day": tail[-1].day,
+                                       "until": tail[-1].until})
+                inserts.extend(to_rows(runs, tail[-1]))
+                continue
+            if tail and new[0][0] >= tail[0].day:
+                base = tail[0].day
+            else:
+                # Before the last keyframe (or nothing stored yet): re-encode everything.
+                base = None
+                tail = list(_decode(conn.execute(select(*_columns()).where(
+                    StatisticsEncoded.anime == anime).order_by(StatisticsEncoded.day))))
+            merged = {day: (values, accessed)
+                      for run in tail for day, values, accessed in run.days()}
+            merged.update(points[anime])
+            _delete(conn, anime, base)
+            merged = sorted((day, values, accessed) for day, (values, accessed) in merged.items())
+            inserts.extend(to_rows(encode(anime, merged, interval=interval)[1]))
+    if extensions:
+        conn.execute(table.update().where(and_(
+            table.c.anime == bindparam("_anime"), table.c.day == bindparam("_day"))),
+            extensions)
+    for start in range(0, len(inserts), CHUNK_SIZE):
+        conn.execute(table.insert(), inserts[start:start + CHUNK_SIZE])
+    return len(rows)
+
+
+def compact(db: Database=None, before_day: int=None, old_interval: int=OLD_KEYFRAME_INTERVAL,
+            anime_ids: Iterable[int]=None, chunk_size: int=500) -> Tuple[int, int]:
+    """
+    Re-encode the stored statistics of each anime: merge runs and place
+    keyframes anew, old_interval days apart before before_day and
+    KEYFRAME_INTERVAL days apart from then on.
+    Each chunk of anime is rewritten in its own transaction.
+    :param db: Database to compact. Connects to the default one if None.
+    :param before_day: Days before this one are old; no day is old if None.
+    :param old_interval: Maximum number of days between keyframes of old days.
+    :param anime_ids: Only these anime or None for all.
+    :param chunk_size: Number of anime per transaction.
+    :return: Number of rows before and after.
+    """
+    if db is None:
+        db = Database()
+    table = StatisticsEncoded
+    if anime_ids is None:
+        with db.engine.connect() as conn:
+            anime_ids = conn.execute(select(table.anime).distinct()).scalars().all()
+    anime_ids = sorted({int(id) for id in anime_ids})
+    before = after = 0
+    for start in range(0, len(anime_ids), chunk_size):
+        chunk = anime_ids[start:start + chunk_size]
+        with db.engine.begin() as conn:
+            rows = conn.execute(select(*_columns()).where(table.anime.in_(chunk))
+                                .order_by(table.anime, table.day)).all()
+            before += len(rows)
+            runs = dict()
+            for run in _decode(rows):
+                runs.setdefault(run.anime, []).append(run)
+            conn.execute(table.__table__.delete().where(table.anime.in_(chunk)))
+            encoded = []
+            for anime, decoded in runs.items():
+                points = [point for run in decoded for point in run.days()]
+                old = [point for point in points
+                       if before_day is not None and point[0] < before_day]
+                _, old_runs = encode(anime, old, interval=old_interval)
+                _, new_runs = encode(anime, points[len(old):], old_runs[-1] if old_runs else None)
+                encoded.extend(to_rows(old_runs + new_runs))
+            for i in range(0, len(encoded), CHUNK_SIZE):
+                conn.execute(table.__table__.insert(), encoded[i:i + CHUNK_SIZE])
+            after += len(encoded)
+    return before, after
+
+
+def import_statistics(db: Database=None, chunk_size: int=500) -> int:
+    """
+    Encode all rows of the statistics table into the statistics_encoded
+    table, e.g. before switching a database to the "delta" storage mode.
+    The statistics table is left as it is.
+    :param db: Database to use. Connects to the default one if None.
+    :param chunk_size: Number of anime per transaction.
+    :return: Number of encoded statistics rows.
+    """
+    if db is None:
+        db = Database()
+    columns = [Statistics.anime, Statistics.day, Statistics.accessed] + \
+        [getattr(Statistics, metric) for metric in METRICS]
+    with db.engine.connect() as conn:
+        anime_ids = conn.execute(select(Statistics.anime).distinct()).scalars().all()
+    count = 0
+    for start in range(0, len(anime_ids), chunk_size):
+        chunk = sorted(anime_ids[start:start + chunk_size])
+        with db.engine.begin() as conn:
+            rows = [dict(row._mapping) for row in conn.execute(
+                select(*columns).where(Statistics.anime.in_(chunk)))]
+            count += write_statistics(conn, rows)
+    return count
@@ -0,0 +1,190 @@
+"""
+Export the statistics to a Parquet dataset.
+
+Statistics joined with the anime titles are written as one Parquet file
+per day in a hive-partitioned directory tree:
+
+    <directory>/season=2017-2/day=12/part-0.parquet
+
+The season is the broadcast season of the anime, so continuing anime
+stay in the season they started in; anime without a season are filed
+under the season the day belongs to. A state file
+remembers the last exported day, so later exports only write new days.
+Readers (pyarrow, pandas, DuckDB, Spark) can prune columns and skip
+partitions by season and day. Needs pyarrow.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import datetime
+import json
+import os
+import shutil
+from typing import Sequence
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+from .dbaccess import Database, Anime, Season, Statistics, METRICS
+from .encoding import read_statistics
+from .days import START_OF_DATA_COLLECTION
+from .queries import latest_day
+
+
+STATE_FILE = "_export_state.json"
+
+SCHEMA = pa.schema([("anime", pa.int32()), ("title", pa.string()), ("url", pa.string())] +
+                   [(metric, pa.float32() if metric == "score" else pa.int32())
+                    for metric in METRICS] +
+                   [("accessed", pa.timestamp("us", tz="UTC"))])
+
+
+def day_season(day: int) -> str:
+    """
+    :param day: Collection day.
+    :return: Season of this day as "YEAR-QUARTER".
+    """
+    date = START_OF_DATA_COLLECTION + datetime.timedelta(days=day)
+    return "{}-{}".format(date.year, (date.month - 1) // 3 + 1)
+
+
+def anime_season(year: int, quarter: int, day: int) -> str:
+    """
+    :param year: Year of broadcast of the anime or None.
+    :param quarter: Quarter of broadcast of the anime or None.
+    :param day: Collection day, for anime without season.
+    :return: Season of the partition as "YEAR-QUARTER".
+    """
+    if year is None or quarter is None:
+        return day_season(day)
+    return "{}-{}".format(year, quarter)
+
+
+def partition_path(directory: str, day: int, season: str=None) -> str:
+    """
+    :param directory: Root directory of the dataset.
+    :param day: Collection day.
+    :param season: Season as "YEAR-QUARTER"; the season of the day if None.
+    """
+    if season is None:
+        season = day_season(day)
+    return os.path.join(directory, "season={}".format(season), "day={}".format(day))
+
+
+def read_state(directory: str) -> dict:
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.exists(path):
+        return dict()
+    with open(path) as fd:
+        return json.load(fd)
+
+
+def export_parquet(directory: str, db: Database=None, overlap: int=1,
+                   full: bool=False) -> Sequence[int]:
+    """
+    Write all days which are not exported yet.
+    :param directory: Root directory of the dataset.
+    :param db: Database to read from. Connects to the default one if None.
+    :param overlap: Number of already exported days to write again, because
+                    a scrape may still have been running during the last export.
+    :param full: Ignore the state file and export everything.
+    :return: Exported days.
+    """
+    if db is None:
+        db = Database()
+    last_day = latest_day(db)
+    if last_day is None:
+        return []
+    exported = None if full else read_state(directory).get("last_day")
+    first_day = 0 if exported is None else max(exported + 1 - overlap, 0)
+    columns = [Statistics.anime, Anime.title, Anime.url] + \
+        [getattr(Statistics, metric) for metric in METRICS] + [Statistics.accessed]
+    query = select(Statistics.day, Season.year, Season.quarter, *columns) \
+        .join(Anime, Anime.id == Statistics.anime).outerjoin(Season, Season.id == Anime.season_id) \
+        .where(Statistics.day >= first_day, Statistics.day <= last_day) \
+        .order_by(Statistics.day, Statistics.anime)
+    days = []
+    with db.engine.connect() as conn:
+        if db.storage == "delta":
+            result = _decoded_rows(conn, first_day, last_day)
+        else:
+            result = conn.execute(query)
+        rows = []
+        current = None
+        for row in result:
+            if row[0] != current and rows:
+                _write_day(directory, current, rows)
+                days.append(current)
+                rows = []
+            current = row[0]
+            rows.append((anime_season(row[1], row[2], row[0]),) + tuple(row[3:]))
+        if rows:
+            _write_day(directory, current, rows)
+            days.append(current)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, STATE_FILE)
+    with open(path + ".tmp", "w") as fd:
+        json.dump({"last_day": last_day}, fd)
+    os.replace(path + ".tmp", path)
+    return days
+
+
+def _decoded_rows(conn: Connection, first_day: int, last_day: int) -> Sequence[tuple]:
+    """
+    Rows of the export query from statistics in the "delta" storage mode.
+    """
+    anime = {id: (year, quarter, title, url) for id, year, quarter, title, url in conn.execute(
+        select(Anime.id, Season.year, Season.quarter, Anime.title, Anime.url)
+        .outerjoin(Season, Season.id == Anime.season_id))}
+    rows = [(day,) + anime[id][:2] + (id,) + anime[id][2:] + tuple(values)
+            for id, day, *values in
+            read_statistics(conn, METRICS + ("accessed",), first_day, last_day) if id in anime]
+    rows.sort(key=lambda row: (row[0], row[3]))
+    return rows
+
+
+def _write_day(directory: str, day: int, rows: Sequence[tuple]) -> None:
+    """
+    Replace the partitions of a day with the given (season, row) tuples.
+    Partitions of the day in other seasons are removed.
+    """
+    seasons = dict()
+    for season, *row in rows:
+        seasons.setdefault(season, []).append(row)
+    for season, season_rows in seasons.items():
+        table = pa.Table.from_arrays([pa.array(column, type=field.type) for column, field
+                                      in zip(zip(*season_rows), SCHEMA)], schema=SCHEMA)
+        path = partition_path(directory, day, season)
+        # Hidden from readers until it is complete.
+        tmp = os.path.join(os.path.dirname(path), "." + os.path.basename(path))
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        pq.write_table(table, os.path.join(tmp, "part-0.parquet"), compression="zstd")
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+    # The anime of an old partition may have got a season since.
+    for name in os.listdir(directory):
+        if name.startswith("season=") and name[len("season="):] not in seasons:
+            shutil.rmtree(os.path.join(directory, name, "day={}".format(day)), ignore_errors=True)
+
+
+def open_dataset(directory: str) -> ds.Dataset:
+    """
+    Open an exported dataset. Use columns= and filter= of to_table() for
+    column pruning and predicate pushdown, e.g.
+
+        open_dataset(path).to_table(columns=["anime", "members"],
+                                    filter=ds.field("season") == "2017-2")
+
+    :param directory: Root directory of the dataset.
+    """
+    partitioning = ds.partitioning(pa.schema([("season", pa.string()), ("day", pa.int32())]),
+                                   flavor="hive")
+    return ds.dataset(directory, format="parquet", partitioning=partitioning,
+                      ignore_prefixes=[".", "_"])
@@ -0,0 +1,179 @@
+"""
+Batched growth forecasts of the statistics of all tracked anime.
+
+Every (anime, metric) series is fitted by least squares to a small
+growth model y = X(t) beta, where t counts the days since the first
+statistics of the anime. Only the sufficient statistics X'X, X'y, y'y
+and n are kept per series, so all anime are fitted at once with batched
+linear algebra and a new day is added in O(anime) without touching
+older data. Needs numpy.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+from collections import namedtuple
+from statistics import NormalDist
+from typing import TYPE_CHECKING, Callable, Mapping, Sequence
+
+import numpy as np
+
+from .days import season_days
+
+if TYPE_CHECKING:
+    # Only for annotations; the queries pull in SQLAlchemy.
+    from .queries import StatisticsArrays
+
+
+# Basis functions of the growth models; t is an array of days since the first statistics.
+MODELS = {
+    "constant": lambda t: [np.ones_like(t)],
+    "linear": lambda t: [np.ones_like(t), t],
+    "log": lambda t: [np.ones_like(t), np.log1p(t)],
+}
+
+# Counts saturate during a season, the score mostly settles around a level.
+FORECAST_MODELS = {
+    "members": "log",
+    "watching_completed": "log",
+    "dropped": "log",
+    "score": "constant",
+}
+
+# Keeps X'X invertible for series with fewer days than parameters.
+RIDGE = 1e-9
+
+Forecast = namedtuple("Forecast", ["anime_ids", "mean", "lower", "upper"])
+
+
+def season_end(year: int, quarter: int) -> int:
+    """
+    :param year: Year of broadcast.
+    :param quarter: Quarter of broadcast (winter, spring, summer, fall).
+    :return: Collection day of the last day of this season.
+    """
+    return season_days(year, quarter)[1] - 1
+
+
+class _Series:
+    """
+    Sufficient statistics of one metric for all anime.
+    """
+    def __init__(self, basis: Callable, n_anime: int):
+        self.basis = basis
+        p = len(basis(np.zeros(1)))
+        self.origin = np.full(n_anime, np.nan)
+        self.xtx = np.zeros((n_anime, p, p))
+        self.xty = np.zeros((n_anime, p))
+        self.yty = np.zeros(n_anime)
+        self.n = np.zeros(n_anime)
+
+    def design(self, days: np.ndarray) -> np.ndarray:
+        """
+        :param days: Days of shape (anime, k).
+        :return: Design matrices of shape (anime, k, p).
+        """
+        t = np.maximum(days - self.origin[:, None], 0)
+        return np.stack([np.broadcast_to(f, t.shape) for f in self.basis(t)], axis=-1)
+
+    def add(self, days: np.ndarray, values: np.ndarray) -> None:
+        """
+        :param days: Days of shape (k,).
+        :param values: Values of shape (anime, k); NaN where missing.
+        """
+        present = ~np.isnan(values)
+        first = np.where(present.any(axis=1), days[np.argmax(present, axis=1)], np.nan)
+        self.origin = np.where(np.isnan(self.origin), first, self.origin)
+        x = self.design(np.broadcast_to(days, values.shape).astype(float))
+        x = np.where(present[:, :, None], np.nan_to_num(x), 0)
+        y = np.where(present, values, 0)
+        self.xtx += np.einsum("akp,akq->apq", x, x)
+        self.xty += np.einsum("akp,ak->ap", x, y)
+        self.yty += (y * y).sum(axis=1)
+        self.n += present.sum(axis=1)
+
+    def extend(self, index: np.ndarray, n_anime: int) -> None:
+        """
+        Move the statistics to rows index of arrays with n_anime rows.
+        """
+        for name in ("origin", "xtx", "xty", "yty", "n"):
+            old = getattr(self, name)
+            new = np.full((n_anime,) + old.shape[1:], np.nan if name == "origin" else 0.0)
+            new[index] = old
+            setattr(self, name, new)
+
+    def predict(self, day: int, z: float):
+        p = self.xty.shape[1]
+        xtx = self.xtx + RIDGE * np.eye(p)
+        beta = np.linalg.solve(xtx, self.xty[:, :, None])[:, :, 0]
+        rss = np.maximum(self.yty - np.einsum("ap,ap->a", beta, self.xty), 0)
+        dof = self.n - p
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sigma2 = np.where(dof > 0, rss / dof, np.nan)
+        x = self.design(np.full((len(self.n), 1), float(day)))[:, 0, :]
+        mean = np.einsum("ap,ap->a", x, beta)
+        leverage = np.einsum("ap,ap->a", x, np.linalg.solve(xtx, x[:, :, None])[:, :, 0])
+        half = z * np.sqrt(sigma2 * (1 + leverage))
+        unknown = self.n == 0
+        mean[unknown] = np.nan
+        return mean, mean - half, mean + half
+
+
+class Forecaster:
+    """
+    Growth models for several metrics of many anime.
+    """
+    def __init__(self, models: Mapping[str, str]=FORECAST_MODELS):
+        """
+        Constructor
+        :param models: Name of the growth model (key of MODELS) for every metric.
+        """
+        self.models = dict(models)
+        self.anime_ids = np.zeros(0, dtype=np.int64)
+        self.last_day = None
+        self._series = {metric: _Series(MODELS[model], 0) for metric, model in self.models.items()}
+
+    @property
+    def metrics(self) -> Sequence[str]:
+        return tuple(self.models)
+
+    def update(self, arrays: "StatisticsArrays") -> None:
+        """
+        Add statistics. Call once with the whole history, then with every
+        new day; days must not be added twice.
+        :param arrays: Statistics containing all metrics of this forecaster,
+                       e.g. from queries.load_statistics.
+        """
+        if len(arrays.days) == 0:
+            return
+        assert self.last_day is None or arrays.days[0] > self.last_day, \
+            "Days must not be added twice."
+        anime_ids = np.union1d(self.anime_ids, arrays.anime_ids)
+        if len(anime_ids) > len(self.anime_ids):
+            index = np.searchsorted(anime_ids, self.anime_ids)
+            for series in self._series.values():
+                series.extend(index, len(anime_ids))
+            self.anime_ids = anime_ids
+        rows = np.searchsorted(self.anime_ids, arrays.anime_ids)
+        days = np.asarray(arrays.days, dtype=float)
+        for metric, series in self._series.items():
+            values = np.full((len(self.anime_ids), len(days)), np.nan)
+            values[rows] = arrays[metric]
+            series.add(days, values)
+        self.last_day = int(arrays.days[-1])
+
+    def predict(self, day: int, level: float=0.9) -> Forecast:
+        """
+        :param day: Day to forecast, e.g. season_end(year, quarter).
+        :param level: Probability covered by the prediction band.
+        :return: Forecast with mean, lower and upper arrays of every metric
+                 in order of anime_ids. Bands are NaN for series with
+                 too few days.
+        """
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        mean, lower, upper = dict(), dict(), dict()
+        for metric, series in self._series.items():
+            mean[metric], lower[metric], upper[metric] = series.predict(day, z)
+        return Forecast(self.anime_ids, mean, lower, upper)
@@ -8,14 +8,27 @@ Created on Apr 2, 2017
 """
 
 import datetime
-import argparse
-from typing import Sequence
+import itertools
+import time
+from collections import OrderedDict
+from typing import Sequence, Callable, Iterable, Iterator, Mapping, Tuple, TypeVar
 
-from .scraper import read_titles, MalEntry, read_teamlist
-from .dbaccess import Statistics, Anime, Database, User, Base
+from sqlalchemy import select
 
+from .scraper import MalEntry
+from .titles import read_titles, iter_teamlist, read_titles_file, anime_id
+from .dbaccess import Statistics, Anime, Season, Database, User, Base, user_anime_team, \
+    upsert_rows, season_id
+from .throttle import map_concurrently
+from .aggregates import update_deltas
+from .instrumentation import RECORDER
+from .pipeline import stream
+from .config import BATCH_SIZE
+from .days import START_OF_DATA_COLLECTION, collection_day, season_days
+from .cli import cmd_stats_insert  # Still importable from here.
 
-START_OF_DATA_COLLECTION = datetime.date(2017, 4, 2)
+
+T = TypeVar("T")
 
 
 def create_stats_object(malentry: MalEntry) -> Statistics:
@@ -27,9 +40,8 @@ def create_stats_object(malentry: MalEntry) -> Statistics:
     malstats = malentry.get_stats()
     assert len(malstats) == 11, "There must be 11 statistic entries (current: {}).".format(len(malstats))
     now = datetime.datetime.now(datetime.timezone.utc)
-    days = now.date() - START_OF_DATA_COLLECTION
     stats = Statistics(anime=malentry.id,
-                                day=days.days,
+                                day=collection_day(now),
                                 score=malstats["score"],
                                 users=malstats["users"],
                                 ranked=malstats["ranked"],
@@ -45,23 +57,41 @@ def create_stats_object(malentry: MalEntry) -> Statistics:
     return stats
 
 
-def create_anime_object(malentry: MalEntry) -> Anime:
+def create_anime_object(malentry: MalEntry, season: Tuple[int, int]=None,
+                        ignored: bool=None) -> Anime:
     """
     Create a Anime database object (ORM) form a MalEntry object.
     :param malentry: Use this as source of data.
+    :param season: (year, quarter) of broadcast.
+    :param ignored: The anime is listed in the season's 'ignored' file.
     :return: Anime object from SQLAlchemy's ORM.
     """
     anime = Anime(id=malentry.id,
                            title=malentry.get_title(),
-                           url=malentry.url)
+                           url=malentry.url,
+                           season_id=season_id(*season) if season else None,
+                           ignored=ignored)
     return anime
 
 
-def db_insert(rows: Sequence[Base], y: bool) -> None:
+def create_season_object(year: int, quarter: int) -> Season:
+    """
+    :param year: Year of broadcast.
+    :param quarter: Quarter of broadcast (winter, spring, summer, fall).
+    :return: Season object from SQLAlchemy's ORM.
+    """
+    return Season(id=season_id(year, quarter), year=year, quarter=quarter)
+
+
+def db_insert(rows: Sequence[Base], y: bool, db: Database=None) -> int:
     """
     Insert all given rows to database.
+    Rows which already exist (e.g. same anime and day) are updated,
+    so repeating a run is safe. Deltas of written statistics are updated.
     :param rows: A list of database row objects.
     :param y: Omit confirmation dialog and default to y(es).
+    :param db: Database to write to. Connects to the default one if None.
+    :return: Number of written rows.
     """
     if not y:
         for row in rows:
@@ -70,16 +100,93 @@ def db_insert(rows: Sequence[Base], y: bool) -> None:
     else:
         confirm = "y"
     if confirm == "y":
-        db = Database()
-        session = db.get_session()
-        session.add_all(rows)
-        session.commit()
-        session.close()
+        if db is None:
+            db = Database()
+        start = time.perf_counter()
+        with RECORDER.timer("db"):
+            count = db.upsert(rows)
+        elapsed = time.perf_counter() - start
+        RECORDER.count("rows_written", count)
+        print("Wrote {} rows in {:.2f} s ({:.0f} rows/s).".format(
+            count, elapsed, count / elapsed if elapsed > 0 else float("inf")))
+        statistics = [row for row in rows if isinstance(row, Statistics)]
+        if statistics:
+            with RECORDER.timer("deltas"), db.engine.begin() as conn:
+                update_deltas(conn, {row.day for row in statistics},
+                              {row.anime for row in statistics}, storage=db.storage)
+                # Readers may have cached old deltas after the upsert.
+                db.bump_version(conn)
+        return count
     else:
         print("Insertion in database aborted.")
+        return 0
+
+
+def scrape(urls: Sequence[str], create: Callable[[MalEntry], Base],
+           workers: int=1) -> Sequence[Base]:
+    """
+    Scrape all given urls and create database objects from them.
+    Failed entries are reported but do not abort the others.
+    :param urls: Absolute urls of Mal entries.
+    :param create: Function creating a database object from a MalEntry.
+    :param workers: Maximum number of concurrent requests.
+    :return: Database objects of all successfully scraped entries.
+    """
+    def scrape_one(url: str) -> Base:
+        entry = MalEntry(url)
+        with RECORDER.timer("scrape", entry.id):
+            return create(entry)
+
+    rows, failed = map_concurrently(scrape_one, urls, workers)
+    RECORDER.count("anime_scraped", len(rows))
+    RECORDER.count("anime_failed", len(failed))
+    for url, e in failed.items():
+        print("Failed to scrape {}: {!r}".format(url, e))
+    return rows
+
+
+def scrape_and_insert(urls: Iterable[str], page: str, create: Callable[[MalEntry], Base],
+                      y: bool=False, workers: int=1, processes: int=0,
+                      batch_size: int=BATCH_SIZE, db: Database=None,
+                      parents: Sequence[Base]=()) -> int:
+    """
+    Scrape urls and insert the created rows.
+    With y the rows are streamed through the pipeline module and
+    committed in batches as soon as they are scraped; otherwise all
+    rows are collected first and shown for confirmation.
+    :param urls: Absolute urls of Mal entries.
+    :param page: Page to parse, "stats" or "page" (see pipeline.PAGES).
+    :param create: Function creating a database object from a MalEntry.
+    :param y: Omit confirmation dialog and default to y(es).
+    :param workers: Maximum number of concurrent requests.
+    :param processes: Number of processes parsing pages (only with y).
+    :param batch_size: Number of rows committed at once (only with y).
+    :param db: Database to write to. Connects to the default one if None.
+    :param parents: Rows the created rows reference (e.g. their season); written
+                    in the same transaction as every non-empty batch.
+    :return: Number of written rows.
+    """
+    parents = list(parents)
+
+    def write(rows: Sequence[Base], y: bool) -> int:
+        if not rows:
+            return 0
+        count = db_insert(parents + list(rows), y, db)
+        return max(count - len(parents), 0)
+
+    if not y:
+        return write(scrape(list(urls), create, workers), y)
+    if db is None:
+        db = Database()
+    result = stream(urls, page, create, lambda rows: write(rows, True),
+                    workers, processes, batch_size)
+    RECORDER.count("anime_scraped", result.written)
+    RECORDER.count("anime_failed", len(result.failed))
+    return result.written
 
 
-def insert_anime(year: int, quarter: int, ignored: bool=False, y: bool=False) -> None:
+def insert_anime(year: int, quarter: int, ignored: bool=False, y: bool=False,
+                 workers: int=1, processes: int=0, db: Database=None) -> None:
     """
     Insert all anime from specified season into database.
     Needs a file YYYY-Q-urls.txt in titles folder.
@@ -88,16 +195,22 @@ def insert_anime(year: int, quarter: int, ignored: bool=False, y: bool=False) ->
     :param quarter: Quarter of broadcast (winter, spring, summer, fall).
     :param ignored: Read the titles from the 'ignored' file.
     :param y: Omit confirmation dialog and default to y(es).
+    :param workers: Maximum number of concurrent requests.
+    :param processes: Number of processes parsing pages.
+    :param db: Database to write to. Connects to the default one if None.
     """
     urls = read_titles(year, quarter, ignored, True)
-    entries = map(MalEntry, urls)
-    animes = list(map(create_anime_object, entries))
-    assert len(animes) == len(urls), ("Number of objects ({})".format(len(animes)),
-            "and lines in titles file ({}) does not match.".format(len(urls)))
-    db_insert(animes, y)
+
+    def create(malentry: MalEntry) -> Anime:
+        return create_anime_object(malentry, (year, quarter), ignored)
+
+    # The anime rows reference the season; nothing is written without confirmation.
+    scrape_and_insert(urls, "page", create, y, workers, processes, db=db,
+                      parents=[create_season_object(year, quarter)])
 
 
-def insert_statistics(year: int, quarter: int, ignored: bool=False, y: bool=False) -> None:
+def insert_statistics(year: int, quarter: int, ignored: bool=False, y: bool=False,
+                      workers: int=1, processes: int=0) -> None:
     """
     Insert statistics for all specified anime at current date.
     Needs a file YYYY-Q-urls.txt in titles folder.
@@ -106,47 +219,95 @@ def insert_statistics(year: int, quarter: int, ignored: bool=False, y: bool=Fals
     :param quarter: Quarter of broadcast (winter, spring, summer, fall).
     :param ignored: Read the titles from the 'ignored' file.
     :param y: Omit confirmation dialog and default to y(es).
+    :param workers: Maximum number of concurrent requests.
+    :param processes: Number of processes parsing pages.
     """
     urls = read_titles(year, quarter, ignored, True)
-    entries = map(MalEntry, urls)
-    stats = list(map(create_stats_object, entries))
-    assert len(stats) == len(urls), ("Number of objects ({})".format(len(stats)),
-            "and lines in titles file ({}) does not match.".format(len(urls)))
-    db_insert(stats, y)
+    scrape_and_insert(urls, "stats", create_stats_object, y, workers, processes)
 
 
-def insert_teamlist(filepath: str) -> None:
+def read_url_files(paths: Iterable[str]) -> Sequence[str]:
+    """
+    Read several url files and drop anime which occur more than once.
+    :param paths: Paths of YYYY-Q[-ignore]-urls.txt files.
+    :return: Urls in order of first occurrence, one per anime.
+    """
+    urls = OrderedDict()
+    for path in paths:
+        for url in read_titles_file(path):
+            urls.setdefault(anime_id(url), url)
+    return list(urls.values())
+
+
+def insert_statistics_batch(paths: Iterable[str], y: bool=False, workers: int=1,
+                            db: Database=None, processes: int=0,
+                            batch_size: int=BATCH_SIZE) -> int:
+    """
+    Insert statistics of all anime listed in several url files.
+    Every anime is scraped once even if it occurs in more than one file.
+    :param paths: Paths of YYYY-Q[-ignore]-urls.txt files.
+    :param y: Omit confirmation dialog and default to y(es).
+    :param workers: Maximum number of concurrent requests.
+    :param db: Database to write to. Connects to the default one if None.
+    :param processes: Number of processes parsing pages.
+    :param batch_size: Number of rows committed at once.
+    :return: Number of written rows.
+    """
+    paths = list(paths)
+    urls = read_url_files(paths)
+    print("Inserting statistics for {} anime from {} files...".format(len(urls), len(paths)))
+    return scrape_and_insert(urls, "stats", create_stats_object, y, workers, processes,
+                             batch_size, db)
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[Sequence[T]]:
+    """
+    Split an iterable into lists of at most size elements.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_teamlist(filepath: str, db: Database=None,
+                    chunk_size: int=500) -> Mapping[str, Sequence[str]]:
     """
     Insert users and teams into database.
+    The file is streamed and written in chunks of users, each in its own
+    transaction. Titles are resolved with an index loaded once; titles
+    which are not in the anime table are skipped and reported.
     :param filepath: Path to teamlist-seasonYY.txt
+    :param db: Database to write to. Connects to the default one if None.
+    :param chunk_size: Number of users per transaction.
+    :return: Dictionary mapping usernames to their unresolved titles.
     """
-    teams = read_teamlist(filepath)
-    db = Database()
-    session = db.get_session()
-    for username in teams:
-        user = User(name=username)
-        for anime in teams[username]:
-            user.anime.append(session.query(Anime).filter(Anime.title==anime).first())
-    session.commit()
-    session.close()
-
-
-def cmd_stats_insert() -> None:
-    """
-    Automatically scrape statistics and insert them into database.
-    Control via command line arguments.
-    """
-    parser = argparse.ArgumentParser(
-        description="Scrape anime statistics from MAL and insert them into database.")
-    parser.add_argument("year", type=int, help="Year of broadcast.")
-    parser.add_argument("quarter", type=int, help="Quarter of broadcast.", choices=[1, 2, 3, 4])
-    parser.add_argument("-y", action="store_true", help="Omit confirmation dialog.")
-    args = parser.parse_args()
-    year = args.year
-    quarter = args.quarter
-    y = args.y
-    print("Inserting statistics for {}-{}...".format(year, quarter))
-    insert_statistics(year, quarter, False, y)
-    print("Inserting statistics for {}-{}-ignore...".format(year, quarter))
-    insert_statistics(year, quarter, True, y)
-    print("Done.")
+    if db is None:
+        db = Database()
+    users = User.__table__
+    with db.engine.connect() as conn:
+        title_index = dict(conn.execute(select(Anime.title, Anime.id)).all())
+    unresolved = dict()
+    for chunk in chunked(iter_teamlist(filepath), chunk_size):
+        names = [username for username, _ in chunk]
+        with db.engine.begin() as conn:
+            user_ids = dict(conn.execute(
+                select(users.c.name, users.c.id).where(users.c.name.in_(names))).all())
+            missing = [{"name": name} for name in dict.fromkeys(names) if name not in user_ids]
+            if missing:
+                conn.execute(users.insert(), missing)
+                user_ids.update(conn.execute(
+                    select(users.c.name, users.c.id).where(users.c.name.in_(names))).all())
+            team_rows = []
+            for username, titles in chunk:
+                for title in titles:
+                    if title in title_index:
+                        team_rows.append({"users": user_ids[username], "anime": title_index[title]})
+                    else:
+                        unresolved.setdefault(username, []).append(title)
+            upsert_rows(conn, user_anime_team, team_rows, update=False)
+    for username, titles in unresolved.items():
+        print("Unresolved titles of {}: {}".format(username, ", ".join(titles)))
+    return unresolved
@@ -0,0 +1,162 @@
+"""
+Timers and counters for the phases of a scrape run.
+
+The scraper records the time spent in every phase (fetch, parse, db,
+...) in total and per anime, together with counters like retries,
+downloaded bytes and written rows. A summary can be written as JSON
+or in the Prometheus text format (e.g. for the textfile collector of
+the node exporter).
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Iterator, Mapping, TypeVar
+
+
+PREFIX = "falchooser_"
+
+R = TypeVar("R")
+
+
+class Recorder:
+    """
+    Thread safe phase timers and counters.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = Counter()
+            self._calls = Counter()
+            self._seconds = Counter()
+            self._max = dict()
+            self._anime = dict()
+            self._started = time.time()
+
+    def count(self, name: str, n: float=1) -> None:
+        """
+        Increase a counter.
+        :param name: Name of the counter, e.g. "http_bytes".
+        :param n: Increment.
+        """
+        with self._lock:
+            self._counters[name] += n
+
+    def add_time(self, phase: str, seconds: float, anime: int=None) -> None:
+        """
+        Record time spent in a phase.
+        :param phase: Name of the phase, e.g. "parse".
+        :param seconds: Duration.
+        :param anime: Mal id if the time was spent for a single anime.
+        """
+        with self._lock:
+            self._calls[phase] += 1
+            self._seconds[phase] += seconds
+            self._max[phase] = max(self._max.get(phase, 0.0), seconds)
+            if anime is not None:
+                phases = self._anime.setdefault(anime, Counter())
+                phases[phase] += seconds
+
+    @contextlib.contextmanager
+    def timer(self, phase: str, anime: int=None) -> Iterator[None]:
+        """
+        Time the body of a with statement, also if it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start, anime)
+
+    def snapshot(self) -> Mapping[str, Any]:
+        """
+        :return: Dictionary with counters, phases and seconds per anime and phase.
+        """
+        with self._lock:
+            return {"started": self._started,
+                    "elapsed": time.time() - self._started,
+                    "counters": dict(self._counters),
+                    "phases": {phase: {"calls": self._calls[phase],
+                                       "seconds": self._seconds[phase],
+                                       "max_seconds": self._max[phase]}
+                               for phase in sorted(self._calls)},
+                    "anime": {str(anime): dict(phases)
+                              for anime, phases in sorted(self._anime.items())}}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self) -> str:
+        """
+        :return: Counters and phase timers in the Prometheus text format.
+                 Times per anime are only part of the JSON summary.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name: str, kind: str, doc: str, samples: Mapping[str, float]) -> None:
+            lines.append("# HELP {}{} {}".format(PREFIX, name, doc))
+            lines.append("# TYPE {}{} {}".format(PREFIX, name, kind))
+            for labels, value in samples.items():
+                lines.append("{}{}{} {!r}".format(PREFIX, name, labels, float(value)))
+
+        phases = snapshot["phases"]
+        metric("phase_seconds_total", "counter", "Time spent in each phase.",
+               {_labels(phase=p): v["seconds"] for p, v in phases.items()})
+        metric("phase_calls_total", "counter", "Number of timed calls of each phase.",
+               {_labels(phase=p): v["calls"] for p, v in phases.items()})
+        metric("phase_max_seconds", "gauge", "Longest single call of each phase.",
+               {_labels(phase=p): v["max_seconds"] for p, v in phases.items()})
+        for name, value in sorted(snapshot["counters"].items()):
+            metric(name + "_total", "counter", "Counter {}.".format(name), {"": value})
+        metric("run_elapsed_seconds", "gauge", "Seconds since the recorder was reset.",
+               {"": snapshot["elapsed"]})
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Write the JSON summary to path and the Prometheus text format
+        next to it with extension .prom.
+        """
+        for target, text in ((path, self.to_json()),
+                             (os.path.splitext(path)[0] + ".prom", self.to_prometheus())):
+            with open(target + ".tmp", "w") as fd:
+                fd.write(text)
+            # Collectors must never see a half written file.
+            os.replace(target + ".tmp", target)
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join('{}="{}"'.format(key, value) for key, value in labels.items()) + "}"
+
+
+RECORDER = Recorder()
+
+
+def profiled(func: Callable[..., R], path: str=None, *args, **kwargs) -> R:
+    """
+    Call func and write a cProfile dump of the call to path.
+    :param func: Function to call with args and kwargs.
+    :param path: Path of the dump (for pstats or snakeviz); no profiling if None.
+    :return: Return value of func.
+    """
+    if path is None:
+        return func(*args, **kwargs)
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        profile.dump_stats(path)
+        print("Wrote profile to {}.".format(path))
@@ -0,0 +1,260 @@
+"""
+Bring databases created by older versions up to the current schema.
+
+migrate is idempotent and only adds: missing tables, the season columns
+of the anime table, missing indexes and the seasons of anime listed in
+the titles folder. Run it once after updating:
+
+    anime2db-migrate [--partition season|days] [--days N]
+
+On PostgreSQL the statistics table can additionally be turned into a
+table partitioned by range of day, one partition per season or per
+fixed number of days, plus a default partition. Queries of the latest
+day or of one season then only touch one partition. New partitions are
+created ahead of time by ensure_partitions, which the daemon calls.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import os
+import re
+from typing import Sequence, Tuple
+
+from sqlalchemy import inspect, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import AddConstraint, CreateColumn, CreateIndex, CreateTable
+
+from .dbaccess import Base, Database, Anime, Season, Statistics, upsert_rows, season_id
+from .days import collection_day, season_days
+from .titles import get_titles_path, read_titles_file, anime_id
+
+
+PARTITION_SCHEMES = ("season", "days")
+
+# Partitions are created this many days ahead of the current day.
+LOOKAHEAD = 100
+
+RE_URL_FILE = re.compile(r"""^(\d{4})-([1-4])(-ignore)?-urls\.txt$""")
+
+
+def add_missing_columns(conn: Connection) -> Sequence[str]:
+    """
+    Add columns of the ORM tables which the database tables lack.
+    Only for nullable columns without default, which is all that got added so far.
+    :param conn: Connection with an open transaction.
+    :return: "table.column" of every added column.
+    """
+    inspector = inspect(conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.execute(text("ALTER TABLE {} ADD COLUMN {}".format(
+                    conn.dialect.identifier_preparer.format_table(table), ddl)))
+                # SQLite cannot add constraints to existing tables.
+                if conn.dialect.name != "sqlite":
+                    for foreign_key in column.foreign_keys:
+                        conn.execute(AddConstraint(foreign_key.constraint))
+                added.append("{}.{}".format(table.name, column.name))
+    return added
+
+
+def add_missing_indexes(conn: Connection) -> Sequence[str]:
+    """
+    :param conn: Connection with an open transaction.
+    :return: Names of the created indexes.
+    """
+    inspector = inspect(conn)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                conn.execute(CreateIndex(index))
+                created.append(index.name)
+    return created
+
+
+def assign_seasons(conn: Connection, path: str=None) -> int:
+    """
+    Set season and ignored flag of anime listed in YYYY-Q[-ignore]-urls.txt files.
+    :param conn: Connection with an open transaction.
+    :param path: Folder with the url files; the titles folder if None.
+    :return: Number of updated anime.
+    """
+    if path is None:
+        path = get_titles_path()
+    count = 0
+    for filename in sorted(os.listdir(path)):
+        match = RE_URL_FILE.match(filename)
+        if match is None:
+            continue
+        year, quarter = int(match.group(1)), int(match.group(2))
+        ids = [anime_id(url) for url in read_titles_file(os.path.join(path, filename))]
+        upsert_rows(conn, Season.__table__, [{"id": season_id(year, quarter), "year": year,
+                                             "quarter": quarter}], update=False)
+        result = conn.execute(update(Anime).where(Anime.id.in_(ids)).values(
+            season_id=season_id(year, quarter), ignored=match.group(3) is not None))
+        count += result.rowcount
+    return count
+
+
+def partition_ranges(first_day: int, last_day: int, scheme: str="season",
+                     days: int=92) -> Sequence[Tuple[str, int, int]]:
+    """
+    Partitions covering the given days.
+    :param first_day: First day to cover.
+    :param last_day: Last day to cover.
+    :param scheme: "season" for one partition per season, "days" for fixed ranges.
+    :param days: Length of the fixed ranges.
+    :return: (name suffix, first day, day after the last day) of every partition.
+    """
+    assert scheme in PARTITION_SCHEMES, "Unknown partition scheme: {}".format(scheme)
+    ranges = []
+    if scheme == "days":
+        start = first_day - first_day % days
+        while start <= last_day:
+            ranges.append(("d{}".format(start), start, start + days))
+            start += days
+        return ranges
+    year, quarter = 2017, 2
+    while season_days(year, quarter)[0] > first_day:
+        year, quarter = (year, quarter - 1) if quarter > 1 else (year - 1, 4)
+    while True:
+        start, end = season_days(year, quarter)
+        if start > last_day:
+            return ranges
+        if end > first_day:
+            ranges.append(("{}_{}".format(year, quarter), start, end))
+        year, quarter = (year, quarter + 1) if quarter < 4 else (year + 1, 1)
+
+
+def partition_statements(ranges: Sequence[Tuple[str, int, int]],
+                         table: str="statistics") -> Sequence[str]:
+    """
+    :param ranges: Partitions as returned by partition_ranges.
+    :param table: Name of the partitioned table.
+    :return: PostgreSQL statements creating the partitions.
+    """
+    return ["CREATE TABLE {0}_{1} PARTITION OF {0} FOR VALUES FROM ({2}) TO ({3})".format(
+        table, name, start, end) for name, start, end in ranges]
+
+
+def is_partitioned(conn: Connection, table: str="statistics") -> bool:
+    """
+    :param conn: An open connection.
+    :param table: Name of the table.
+    :return: Whether the table is a partitioned PostgreSQL table.
+    """
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text(
+        "SELECT count(*) FROM pg_partitioned_table p JOIN pg_class c ON p.partrelid = c.oid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"), {"table": table}).scalar() > 0
+
+
+def _partitions(conn: Connection, table: str="statistics") -> Sequence[str]:
+    return conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON i.inhrelid = c.oid "
+        "JOIN pg_class p ON i.inhparent = p.oid WHERE p.relname = :table"),
+        {"table": table}).scalars().all()
+
+
+def partition_statistics(conn: Connection, scheme: str="season", days: int=92,
+                         until_day: int=None) -> int:
+    """
+    Replace the statistics table by a table partitioned by range of day
+    and copy all rows. PostgreSQL only.
+    :param conn: Connection with an open transaction.
+    :param scheme: "season" or "days", see partition_ranges.
+    :param days: Length of the ranges of the "days" scheme.
+    :param until_day: Create partitions up to this day; LOOKAHEAD days after today if None.
+    :return: Number of copied rows.
+    """
+    if conn.dialect.name != "postgresql":
+        raise ValueError("Partitioning needs PostgreSQL, not {}.".format(conn.dialect.name))
+    if is_partitioned(conn):
+        return 0
+    table = Statistics.__table__
+    old = "statistics_unpartitioned"
+    conn.execute(text("ALTER TABLE statistics RENAME TO {}".format(old)))
+    # Names of indexes must be unique in the schema, the new table needs them.
+    primary_key = inspect(conn).get_pk_constraint(old)["name"]
+    if primary_key:
+        conn.execute(text("ALTER TABLE {0} RENAME CONSTRAINT {1} TO {0}_pkey".format(
+            old, primary_key)))
+    for index in inspect(conn).get_indexes(old):
+        conn.execute(text("ALTER INDEX {1} RENAME TO {0}_{1}".format(old, index["name"])))
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+    conn.execute(text(ddl.rstrip() + " PARTITION BY RANGE (day)"))
+    first_day, last_day = conn.execute(text(
+        "SELECT min(day), max(day) FROM {}".format(old))).one()
+    if until_day is None:
+        until_day = collection_day() + LOOKAHEAD
+    for statement in partition_statements(partition_ranges(
+            first_day or 0, max(last_day or 0, until_day), scheme, days)):
+        conn.execute(text(statement))
+    conn.execute(text("CREATE TABLE statistics_default PARTITION OF statistics DEFAULT"))
+    # Remembered for ensure_partitions.
+    conn.execute(text("COMMENT ON TABLE statistics IS '{} {}'".format(scheme, days)))
+    for index in table.indexes:
+        conn.execute(CreateIndex(index))
+    columns = ", ".join(column.name for column in table.columns)
+    count = conn.execute(text("INSERT INTO statistics ({0}) SELECT {0} FROM {1}".format(
+        columns, old))).rowcount
+    conn.execute(text("DROP TABLE {}".format(old)))
+    return count
+
+
+def ensure_partitions(conn: Connection, until_day: int=None) -> Sequence[str]:
+    """
+    Create missing partitions of the statistics table with the scheme it
+    was partitioned with, so rows of the coming days do not end up in the
+    default partition (a partition cannot be created while the default
+    one holds rows of its range). Does nothing if the table is not partitioned.
+    :param conn: Connection with an open transaction.
+    :param until_day: Last day to cover; LOOKAHEAD days after today if None.
+    :return: Names of the created partitions.
+    """
+    if not is_partitioned(conn):
+        return []
+    if until_day is None:
+        until_day = collection_day() + LOOKAHEAD
+    comment = conn.execute(text(
+        "SELECT obj_description('statistics'::regclass, 'pg_class')")).scalar()
+    scheme, days = (comment or "season 92").split()
+    existing = set(_partitions(conn))
+    ranges = partition_ranges(collection_day(), until_day, scheme, int(days))
+    created = []
+    for statement, (name, _, _) in zip(partition_statements(ranges), ranges):
+        if "statistics_" + name not in existing:
+            conn.execute(text(statement))
+            created.append("statistics_" + name)
+    return created
+
+
+def migrate(db: Database=None, partition: str=None, days: int=92) -> None:
+    """
+    Update the schema of a database and fill the new columns.
+    :param db: Database to migrate. Connects to the default one if None.
+    :param partition: Also partition the statistics table with this scheme (PostgreSQL).
+    :param days: Length of the ranges of the "days" scheme.
+    """
+    if db is None:
+        db = Database()
+    db.create_tables()
+    with db.engine.begin() as conn:
+        for column in add_missing_columns(conn):
+            print("Added column {}.".format(column))
+        for index in add_missing_indexes(conn):
+            print("Created index {}.".format(index))
+        print("Assigned seasons to {} anime.".format(assign_seasons(conn)))
+        if partition is not None:
+            count = partition_statistics(conn, partition, days)
+            print("Copied {} rows into the partitioned statistics table.".format(count))
+
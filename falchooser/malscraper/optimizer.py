@@ -0,0 +1,250 @@
+"""
+Choose a FAL team from projected anime points.
+
+A team consists of ACTIVE titles which score points and BENCH titles
+which can be swapped in later. Points of every eligible anime are
+projected from its statistics history, either as single expectation
+or as matrix of scenarios (bootstrapped daily changes). The best teams
+are found with a branch-and-bound search over the candidates instead
+of enumerating all combinations. Needs numpy.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import heapq
+from collections import namedtuple
+from typing import Hashable, Iterable, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .queries import StatisticsArrays
+
+
+ACTIVE = 5
+BENCH = 2
+# Bench titles score nothing, but a good bench is worth something
+# because it can replace a weak active title.
+BENCH_WEIGHT = 0.1
+
+# Points per viewer of each metric.
+POINT_WEIGHTS = {
+    "watching_completed": 1.0,
+    "dropped_onhold": -1.0,
+}
+
+Team = namedtuple("Team", ["score", "active", "bench"])
+
+
+def _changes(arrays: StatisticsArrays, weights: Mapping[str, float],
+             window: int) -> np.ndarray:
+    """
+    :return: Last weighted value of each anime and its daily changes
+             of the last window days, shape (anime, window + 1).
+    """
+    values = sum(weight * arrays[metric] for metric, weight in weights.items())
+    values = values[:, -(window + 1):]
+    # Anime without statistics on some days get no points from these days.
+    changes = np.nan_to_num(np.diff(values, axis=1))
+    last = np.nan_to_num(values[:, -1])
+    return np.concatenate([last[:, None], changes], axis=1)
+
+
+def project_points(arrays: StatisticsArrays, horizon: int=7, window: int=7,
+                   weights: Mapping[str, float]=POINT_WEIGHTS) -> np.ndarray:
+    """
+    Expected points of every anime: last value plus horizon times the
+    mean daily change of the last window days.
+    :param arrays: Statistics as returned by queries.load_statistics with fill="ffill".
+    :param horizon: Number of days to project.
+    :param window: Number of past days the daily change is averaged over.
+    :param weights: Points per unit of each metric.
+    :return: Array of shape (anime,) in order of arrays.anime_ids.
+    """
+    data = _changes(arrays, weights, window)
+    mean_change = data[:, 1:].mean(axis=1) if data.shape[1] > 1 else 0.0
+    return data[:, 0] + horizon * mean_change
+
+
+def sample_points(arrays: StatisticsArrays, n: int=1000, horizon: int=7, window: int=14,
+                  weights: Mapping[str, float]=POINT_WEIGHTS, seed: int=None) -> np.ndarray:
+    """
+    Point scenarios drawn by resampling past days. All anime share the
+    sampled days of a scenario, so trends common to a season are kept.
+    :param arrays: Statistics as returned by queries.load_statistics with fill="ffill".
+    :param n: Number of scenarios.
+    :param horizon: Number of days to project.
+    :param window: Number of past days to sample from.
+    :param weights: Points per unit of each metric.
+    :param seed: Seed of the random generator.
+    :return: Array of shape (n, anime).
+    """
+    data = _changes(arrays, weights, window)
+    last, changes = data[:, 0], data[:, 1:]
+    if changes.shape[1] == 0:
+        return np.tile(last, (n, 1))
+    days = np.random.default_rng(seed).integers(0, changes.shape[1], size=(n, horizon))
+    # Count how often each day was drawn; one matrix product sums all scenarios.
+    counts = np.zeros((n, changes.shape[1]))
+    np.add.at(counts, (np.arange(n)[:, None], days), 1)
+    return last[None, :] + counts @ changes.T
+
+
+def score_teams(points: np.ndarray, active: np.ndarray, bench: np.ndarray,
+                bench_weight: float=BENCH_WEIGHT, quantile: Optional[float]=None) -> np.ndarray:
+    """
+    Score many teams at once.
+    :param points: Points of shape (anime,) or scenarios of shape (scenarios, anime).
+    :param active: Column indices of active titles, shape (teams, active).
+    :param bench: Column indices of bench titles, shape (teams, bench).
+    :param bench_weight: Weight of bench points.
+    :param quantile: Aggregate scenarios by this quantile; mean if None.
+    :return: Score of every team.
+    """
+    points = np.atleast_2d(points)
+    totals = points[:, active].sum(axis=2) + bench_weight * points[:, bench].sum(axis=2)
+    return _aggregate(totals, quantile, axis=0)
+
+
+def _aggregate(totals: np.ndarray, quantile: Optional[float], axis: int=-1) -> np.ndarray:
+    if quantile is None:
+        return totals.mean(axis=axis)
+    return np.quantile(totals, quantile, axis=axis)
+
+
+class TeamOptimizer:
+    """
+    Find the best teams with branch-and-bound.
+
+    Candidates are visited in order of decreasing mean points; every
+    candidate is put on the active list, on the bench or skipped. The
+    upper bound of a partial team fills the free slots with the best
+    remaining candidates of each scenario separately. The aggregate over
+    scenarios (mean or quantile) is monotone, so this bound is valid for
+    both and branches which cannot reach the k-th best team are pruned.
+    """
+    def __init__(self, anime_ids: Sequence[int], points: np.ndarray,
+                 active: int=ACTIVE, bench: int=BENCH, bench_weight: float=BENCH_WEIGHT,
+                 quantile: Optional[float]=None, required: Iterable[int]=(),
+                 excluded: Iterable[int]=(), groups: Mapping[int, Hashable]=None,
+                 limits: Mapping[Hashable, int]=None):
+        """
+        Constructor
+        :param anime_ids: Mal ids of the eligible anime.
+        :param points: Points of shape (anime,) or scenarios of shape (scenarios, anime).
+        :param active: Number of active titles.
+        :param bench: Number of bench titles.
+        :param bench_weight: Weight of bench points (0 <= bench_weight <= 1).
+        :param quantile: Maximize this quantile of the scenarios (e.g. 0.1 for
+                         a cautious team); the mean if None.
+        :param required: Ids which must be part of the team (active or bench).
+        :param excluded: Ids which must not be part of the team.
+        :param groups: Group (e.g. studio) of each anime id.
+        :param limits: Maximum number of titles of each group.
+        """
+        assert 0 <= bench_weight <= 1, "bench_weight must be between 0 and 1."
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        assert points.shape[1] == len(anime_ids), "One column of points per anime needed."
+        excluded = set(excluded)
+        keep = [i for i, id in enumerate(anime_ids) if id not in excluded]
+        order = sorted(keep, key=lambda i: -points[:, i].mean())
+        self.anime_ids = np.asarray(anime_ids)[order]
+        self.points = points[:, order]
+        self.active = active
+        self.bench = bench
+        self.bench_weight = bench_weight
+        self.quantile = quantile
+        self.required = np.isin(self.anime_ids, list(required))
+        assert self.required.sum() == len(set(required) - excluded), \
+            "Required anime must be eligible."
+        assert self.required.sum() <= active + bench, "Too many required anime."
+        groups = groups or dict()
+        self._limits = dict(limits or dict())
+        # Only groups with a limit need to be counted.
+        self._group = [groups.get(id) if groups.get(id) in self._limits else None
+                       for id in self.anime_ids.tolist()]
+        self._prepare_bounds()
+
+    def _prepare_bounds(self) -> None:
+        """
+        For every candidate i, the best active + bench values of each
+        scenario among the candidates i..n, sorted decreasing.
+        """
+        size = self.active + self.bench
+        n_scenarios, n = self.points.shape
+        suffix = np.full((n + 1, n_scenarios, size), -np.inf)
+        for i in range(n - 1, -1, -1):
+            merged = np.concatenate([suffix[i + 1], self.points[:, i:i + 1]], axis=1)
+            suffix[i] = -np.sort(-merged, axis=1)[:, :size]
+        self._suffix = suffix
+        # Remaining required anime after candidate i.
+        self._required_left = np.concatenate(
+            [np.cumsum(self.required[::-1])[::-1], [0]])
+
+    def _bound(self, i: int, totals: np.ndarray, active_left: int, bench_left: int) -> float:
+        best = self._suffix[i]
+        if active_left + bench_left > best.shape[1] or np.isneginf(
+                best[:, active_left + bench_left - 1]).any():
+            return -np.inf
+        optimistic = totals + best[:, :active_left].sum(axis=1) \
+            + self.bench_weight * best[:, active_left:active_left + bench_left].sum(axis=1)
+        return float(_aggregate(optimistic, self.quantile))
+
+    def best(self, k: int=1) -> Sequence[Team]:
+        """
+        :param k: Number of teams.
+        :return: The k best teams, best first. Active and bench ids are
+                 sorted by decreasing mean points.
+        """
+        heap = []  # Min-heap of (score, counter, active, bench); the worst team on top.
+        counter = 0
+        n = len(self.anime_ids)
+
+        def visit(i: int, totals: np.ndarray, active: tuple, bench: tuple,
+                  counts: dict) -> None:
+            nonlocal counter
+            active_left = self.active - len(active)
+            bench_left = self.bench - len(bench)
+            if active_left == 0 and bench_left == 0:
+                if self._required_left[i] > 0:
+                    return
+                score = float(_aggregate(totals, self.quantile))
+                counter += 1
+                item = (score, -counter, active, bench)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif score > heap[0][0]:
+                    heapq.heapreplace(heap, item)
+                return
+            if i >= n or self._required_left[i] > active_left + bench_left:
+                return
+            # Bound and totals are summed differently; with a tolerance
+            # ties are pruned despite rounding, which keeps equal points fast.
+            if len(heap) == k and self._bound(i, totals, active_left, bench_left) \
+                    <= heap[0][0] + 1e-9 * max(1.0, abs(heap[0][0])):
+                return
+            group = self._group[i]
+            if group is None or counts.get(group, 0) < self._limits[group]:
+                grouped = counts if group is None else {**counts, group: counts.get(group, 0) + 1}
+                column = self.points[:, i]
+                if active_left:
+                    visit(i + 1, totals + column, active + (i,), bench, grouped)
+                if bench_left:
+                    visit(i + 1, totals + self.bench_weight * column, active, bench + (i,), grouped)
+            if not self.required[i]:
+                visit(i + 1, totals, active, bench, counts)
+
+        visit(0, np.zeros(self.points.shape[0]), (), (), dict())
+        ids = self.anime_ids.tolist()
+        return [Team(score, tuple(ids[i] for i in active), tuple(ids[i] for i in bench))
+                for score, _, active, bench in sorted(heap, reverse=True)]
+
+
+def choose_team(anime_ids: Sequence[int], points: np.ndarray, k: int=1,
+                **kwargs) -> Sequence[Team]:
+    """
+    Find the k best teams. See TeamOptimizer for kwargs.
+    """
+    return TeamOptimizer(anime_ids, points, **kwargs).best(k)
@@ -0,0 +1,183 @@
+"""
+Streaming fetch -> parse -> insert pipeline.
+
+Three stages connected by bounded queues:
+
+    fetch threads --> parse (inline or process pool) --> writer thread
+
+Fetching is I/O bound and runs in threads, parsing is CPU bound and can
+use a process pool, and the writer commits a micro-batch as soon as it
+is full. A slow stage blocks the ones before it (backpressure), so the
+memory use does not grow with the number of urls, and a failing page
+or batch only loses itself.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Sequence
+
+from .cache import cached_get
+from .dbaccess import Base
+from .instrumentation import RECORDER
+from .scraper import MalEntry, parse_stats_page, parse_title_page
+from .titles import anime_id
+
+
+# suffix: appended to the anime url, kind: cache endpoint type,
+# parse: function of the raw page, field: MalEntry argument of the result.
+Page = namedtuple("Page", ["suffix", "kind", "parse", "field"])
+
+PAGES = {
+    "stats": Page("/stats", "stats", parse_stats_page, "stats"),
+    "page": Page("", "page", parse_title_page, "title"),
+}
+
+PipelineResult = namedtuple("PipelineResult", ["written", "failed"])
+
+_DONE = object()
+
+
+def _timed_parse(parse: Callable[[bytes], object], content: bytes) -> tuple:
+    """
+    Worker of the process pool.
+    :return: Seconds spent and the parsed page; the exception instead of the page on failure.
+    """
+    start = time.perf_counter()
+    try:
+        parsed = parse(content)
+    except Exception as e:
+        parsed = e
+    return time.perf_counter() - start, parsed
+
+
+def stream(urls: Iterable[str], page: str, create: Callable[[MalEntry], Base],
+           write: Callable[[Sequence[Base]], int], workers: int=1, processes: int=0,
+           batch_size: int=50, queue_size: int=None) -> PipelineResult:
+    """
+    Fetch, parse and write all urls.
+    :param urls: Absolute urls of Mal entries. May be a lazy iterable.
+    :param page: Which page of every entry to parse, key of PAGES.
+    :param create: Function creating a database object from a MalEntry.
+    :param write: Function writing and committing a batch of database objects;
+                  returns the number of written rows.
+    :param workers: Number of fetch threads.
+    :param processes: Number of parser processes; parse in this thread if 0.
+    :param batch_size: Number of rows committed at once.
+    :param queue_size: Capacity of each queue; derived from the other arguments if None.
+    :return: Number of written rows and a dictionary mapping failed urls to their exception.
+    """
+    spec = PAGES[page]
+    workers = max(workers, 1)
+    if queue_size is None:
+        queue_size = max(2 * workers, 2 * processes, batch_size)
+    fetched = queue.Queue(queue_size)
+    rows = queue.Queue(queue_size)
+    urls = iter(urls)
+    lock = threading.Lock()
+    stop = threading.Event()
+    failed = dict()
+    written = 0
+
+    def fail(url: str, e: Exception) -> None:
+        print("Failed to scrape {}: {!r}".format(url, e))
+        with lock:
+            failed[url] = e
+
+    def fetch() -> None:
+        while not stop.is_set():
+            with lock:
+                url = next(urls, None)
+            if url is None:
+                break
+            try:
+                id = anime_id(url)
+                with RECORDER.timer("fetch", id):
+                    content = cached_get(url + spec.suffix, spec.kind).content
+            except Exception as e:
+                fail(url, e)
+            else:
+                fetched.put((url, id, content))
+        fetched.put(_DONE)
+
+    def insert() -> None:
+        nonlocal written
+        batch = []
+        while True:
+            item = rows.get()
+            if item is not _DONE:
+                batch.append(item)
+            if batch and (len(batch) >= batch_size or item is _DONE):
+                try:
+                    written += write([row for _, row in batch])
+                except Exception as e:
+                    for url, _ in batch:
+                        fail(url, e)
+                batch = []
+            if item is _DONE:
+                return
+
+    def emit(url: str, id: int, parsed) -> None:
+        try:
+            row = create(MalEntry(url, id, **{spec.field: parsed}))
+        except Exception as e:
+            fail(url, e)
+        else:
+            rows.put((url, row))
+
+    def finish(url: str, id: int, future) -> None:
+        try:
+            seconds, parsed = future.result()
+        except Exception as e:
+            fail(url, e)
+            return
+        RECORDER.add_time("parse", seconds, id)
+        if isinstance(parsed, Exception):
+            fail(url, parsed)
+        else:
+            emit(url, id, parsed)
+
+    fetchers = [threading.Thread(target=fetch, daemon=True) for _ in range(workers)]
+    writer = threading.Thread(target=insert, daemon=True)
+    executor = ProcessPoolExecutor(processes) if processes > 0 else None
+    pending = deque()
+    try:
+        writer.start()
+        for fetcher in fetchers:
+            fetcher.start()
+        running = len(fetchers)
+        while running:
+            item = fetched.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            url, id, content = item
+            if executor is None:
+                try:
+                    with RECORDER.timer("parse", id):
+                        parsed = spec.parse(content)
+                except Exception as e:
+                    fail(url, e)
+                else:
+                    emit(url, id, parsed)
+                continue
+            pending.append((url, id, executor.submit(_timed_parse, spec.parse, content)))
+            # Keep the order of the urls and at most queue_size pages in flight.
+            while pending and (len(pending) >= queue_size or pending[0][2].done()):
+                finish(*pending.popleft())
+        while pending:
+            finish(*pending.popleft())
+    finally:
+        stop.set()
+        rows.put(_DONE)
+        writer.join()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return PipelineResult(written, failed)
@@ -0,0 +1,209 @@
+"""
+Vectorized queries of the statistics time series.
+
+Loads the statistics of many anime with a single query into dense
+NumPy arrays indexed by [anime, day]. Needs numpy (and pandas for
+the DataFrame conversions).
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+from typing import Iterable, Mapping, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, func
+
+from .dbaccess import Database, Anime, Statistics, METRICS, season_id
+from . import encoding
+from .titles import read_titles, anime_id
+
+
+# Derived metrics as sums of stored metrics.
+DERIVED = {
+    "watching_completed": ("watching", "completed"),
+    "dropped_onhold": ("dropped", "onhold"),
+}
+
+FILL_METHODS = ("nan", "ffill")
+
+
+class StatisticsArrays:
+    """
+    Statistics of several anime over a range of days.
+    Every metric is a float array of shape (len(anime_ids), len(days));
+    days without data are NaN or filled as requested.
+    """
+    def __init__(self, anime_ids: np.ndarray, days: np.ndarray,
+                 metrics: Mapping[str, np.ndarray]):
+        self.anime_ids = anime_ids
+        self.days = days
+        self.metrics = dict(metrics)
+
+    def __getitem__(self, metric: str) -> np.ndarray:
+        return self.metrics[metric]
+
+    def __contains__(self, metric: str) -> bool:
+        return metric in self.metrics
+
+    def __repr__(self):
+        return "<StatisticsArrays(anime={}, days={}..{})>".format(
+            len(self.anime_ids), self.days[0] if len(self.days) else None,
+            self.days[-1] if len(self.days) else None)
+
+    def row(self, anime_id: int) -> int:
+        """
+        :param anime_id: Mal id of an anime.
+        :return: Index of this anime in the first axis of the arrays.
+        """
+        i = int(np.searchsorted(self.anime_ids, anime_id))
+        if i >= len(self.anime_ids) or self.anime_ids[i] != anime_id:
+            raise KeyError(anime_id)
+        return i
+
+    def metric_frame(self, metric: str):
+        """
+        :param metric: Name of a metric.
+        :return: pandas.DataFrame with anime ids as index and days as columns.
+        """
+        import pandas as pd
+        return pd.DataFrame(self.metrics[metric], index=pd.Index(self.anime_ids, name="anime"),
+                            columns=pd.Index(self.days, name="day"))
+
+    def to_frame(self):
+        """
+        :return: Wide pandas.DataFrame indexed by [anime, day] with one column per metric.
+        """
+        import pandas as pd
+        index = pd.MultiIndex.from_product([self.anime_ids, self.days], names=["anime", "day"])
+        return pd.DataFrame({name: values.ravel() for name, values in self.metrics.items()},
+                            index=index)
+
+
+def season_anime_ids(year: int, quarter: int, ignored: Optional[bool]=None,
+                     db: Database=None) -> Sequence[int]:
+    """
+    Mal ids of all anime of a season.
+    Looked up in the anime table if a database is given and it knows the
+    season, otherwise read from the titles folder.
+    :param year: Year of broadcast.
+    :param quarter: Quarter of broadcast (winter, spring, summer, fall).
+    :param ignored: Only ignored (True) or not ignored (False) anime; None for both.
+    :param db: Database to query.
+    :return: Sorted anime ids.
+    """
+    if db is not None:
+        query = select(Anime.id).where(Anime.season_id == season_id(year, quarter))
+        if ignored is not None:
+            query = query.where(Anime.ignored == ignored)
+        with db.engine.connect() as conn:
+            ids = conn.execute(query.order_by(Anime.id)).scalars().all()
+        if ids:
+            return ids
+    choices = (False, True) if ignored is None else (ignored,)
+    ids = set()
+    for choice in choices:
+        ids.update(anime_id(url) for url in read_titles(year, quarter, choice, True))
+    return sorted(ids)
+
+
+def latest_day(db: Database=None) -> Optional[int]:
+    """
+    :param db: Database to query. Connects to the default one if None.
+    :return: Latest day with statistics or None if there are none.
+    """
+    if db is None:
+        db = Database()
+    with db.engine.connect() as conn:
+        if db.storage == "delta":
+            return encoding.latest_day(conn)
+        return conn.execute(select(func.max(Statistics.day))).scalar()
+
+
+def load_statistics(anime_ids: Iterable[int]=None, first_day: int=0, last_day: int=None,
+                    metrics: Sequence[str]=METRICS + tuple(DERIVED), fill: str="nan",
+                    db: Database=None) -> StatisticsArrays:
+    """
+    Load statistics of many anime with a single query.
+    :param anime_ids: Mal ids to load; all anime with statistics if None.
+    :param first_day: First day (inclusive).
+    :param last_day: Last day (inclusive); the latest day in the database if None.
+    :param metrics: Stored metrics and/or keys of DERIVED.
+    :param fill: "nan" leaves missing days as NaN, "ffill" repeats the last known value.
+    :param db: Database to query. Connects to the default one if None.
+    :return: Dense arrays indexed by [anime, day] for every metric.
+    """
+    assert fill in FILL_METHODS, "Unknown fill method: {}".format(fill)
+    if db is None:
+        db = Database()
+    stored = [m for m in METRICS
+              if m in metrics or any(m in DERIVED.get(d, ()) for d in metrics)]
+    columns = [Statistics.anime, Statistics.day] + [getattr(Statistics, m) for m in stored]
+    query = select(*columns).where(Statistics.day >= first_day)
+    if last_day is not None:
+        query = query.where(Statistics.day <= last_day)
+    if anime_ids is not None:
+        anime_ids = sorted({int(id) for id in anime_ids})
+        query = query.where(Statistics.anime.in_(anime_ids))
+    with db.engine.connect() as conn:
+        if db.storage == "delta":
+            data = _expand_runs(encoding.read_runs(conn, first_day, last_day, anime_ids), stored)
+        else:
+            rows = conn.execute(query).all()
+            data = np.array(rows, dtype=float).reshape(len(rows), len(columns))
+    if anime_ids is None:
+        anime_ids = np.unique(data[:, 0]).astype(np.int64)
+    anime_ids = np.asarray(anime_ids, dtype=np.int64)
+    if last_day is None:
+        last_day = int(data[:, 1].max()) if len(data) else first_day - 1
+    days = np.arange(first_day, last_day + 1)
+    rows_index = np.searchsorted(anime_ids, data[:, 0].astype(np.int64))
+    days_index = data[:, 1].astype(np.int64) - first_day
+    arrays = dict()
+    for i, metric in enumerate(stored, 2):
+        values = np.full((len(anime_ids), len(days)), np.nan)
+        values[rows_index, days_index] = data[:, i]
+        if fill == "ffill":
+            values = _forward_fill(values)
+        arrays[metric] = values
+    for name, parts in DERIVED.items():
+        if name in metrics:
+            arrays[name] = sum(arrays[part] for part in parts)
+    return StatisticsArrays(anime_ids, days, {m: arrays[m] for m in metrics})
+
+
+def load_season(year: int, quarter: int, ignored: Optional[bool]=None,
+                **kwargs) -> StatisticsArrays:
+    """
+    Load statistics of all anime of a season. See load_statistics for kwargs.
+    """
+    return load_statistics(season_anime_ids(year, quarter, ignored, kwargs.get("db")), **kwargs)
+
+
+def _expand_runs(runs: Iterable[encoding.Run], metrics: Sequence[str]) -> np.ndarray:
+    """
+    :return: Rows of (anime, day, *metrics) for every day of the runs.
+    """
+    index = [METRICS.index(metric) for metric in metrics]
+    runs = [(run.anime, run.day, run.until - run.day + 1) + tuple(run.values[i] for i in index)
+            for run in runs]
+    runs = np.array(runs, dtype=float).reshape(len(runs), len(metrics) + 3)
+    lengths = runs[:, 2].astype(np.int64)
+    data = np.repeat(np.delete(runs, 2, axis=1), lengths, axis=0)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    data[:, 1] += np.arange(len(data)) - starts
+    return data
+
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    """
+    Replace NaN along the day axis by the last preceding value.
+    Leading NaN stay NaN.
+    """
+    mask = np.isnan(values)
+    index = np.where(mask, 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = values[np.arange(values.shape[0])[:, None], index]
+    return filled
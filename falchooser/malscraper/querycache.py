@@ -0,0 +1,137 @@
+"""
+Read-through cache for frequent analysis queries.
+
+Results are kept in a size bounded LRU. Every write through
+Database.upsert or helpers.db_insert increases the data version in the
+data_version table; the cache compares it before answering and drops
+all entries when it changed. Repeated reads are served from memory
+but never return data older than the last write.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Optional, Sequence
+
+from sqlalchemy import inspect
+from sqlalchemy.exc import DBAPIError
+
+from .dbaccess import Database, DataVersion, METRICS, read_data_version
+from .queries import StatisticsArrays, DERIVED, latest_day, load_statistics, season_anime_ids
+
+
+class QueryCache:
+    """
+    LRU cache of query results, invalidated by the data version.
+    Cached arrays are read-only because they are shared between callers.
+    """
+    def __init__(self, db: Database=None, max_entries: int=256, check_interval: float=0.0):
+        """
+        Constructor
+        :param db: Database to query. Connects to the default one if None.
+        :param max_entries: Maximum number of cached results.
+        :param check_interval: Seconds the data version is trusted without
+                               asking the database again. 0 checks on every read.
+        """
+        self.db = db if db is not None else Database()
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def _check_version(self) -> None:
+        now = time.monotonic()
+        if self._version is not None and now - self._checked < self.check_interval:
+            return
+        with self.db.engine.connect() as conn:
+            try:
+                version = read_data_version(conn)
+            except DBAPIError:
+                # Databases created before the data_version table get it on the first write.
+                conn.rollback()
+                if inspect(conn).has_table(DataVersion.__tablename__):
+                    raise
+                version = 0
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._checked = now
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        :param key: Key of the result.
+        :param compute: Function computing the result on a miss.
+        :return: Cached or computed result.
+        """
+        self._check_version()
+        with self._lock:
+            version = self._version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            # A write during compute makes the result unreliable; do not keep it.
+            if self._version == version:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def latest_day(self) -> Optional[int]:
+        """
+        See queries.latest_day.
+        """
+        return self.get(("latest_day",), lambda: latest_day(self.db))
+
+    def statistics(self, anime_ids: Iterable[int]=None, first_day: int=0, last_day: int=None,
+                   metrics: Sequence[str]=METRICS + tuple(DERIVED),
+                   fill: str="nan") -> StatisticsArrays:
+        """
+        See queries.load_statistics.
+        """
+        if anime_ids is not None:
+            anime_ids = tuple(sorted({int(id) for id in anime_ids}))
+        metrics = tuple(metrics)
+        key = ("statistics", anime_ids, first_day, last_day, metrics, fill)
+        return self.get(key, lambda: _read_only(
+            load_statistics(anime_ids, first_day, last_day, metrics, fill, self.db)))
+
+    def series(self, anime_id: int, **kwargs) -> StatisticsArrays:
+        """
+        Statistics of a single anime. See queries.load_statistics for kwargs.
+        """
+        return self.statistics((anime_id,), **kwargs)
+
+    def season(self, year: int, quarter: int, ignored: Optional[bool]=None,
+               **kwargs) -> StatisticsArrays:
+        """
+        Statistics of all anime of a season. See queries.load_statistics for kwargs.
+        """
+        return self.statistics(season_anime_ids(year, quarter, ignored, self.db), **kwargs)
+
+
+def _read_only(arrays: StatisticsArrays) -> StatisticsArrays:
+    for values in (arrays.anime_ids, arrays.days) + tuple(arrays.metrics.values()):
+        values.flags.writeable = False
+    return arrays
@@ -7,25 +7,31 @@ Created on Mar 31, 2017
 :licence: GPLv3, see LICENSE for more details.
 """
 
-from configparser import ConfigParser
-import os
-from typing import Sequence, Tuple, Mapping, Union
-from time import sleep
+from typing import Sequence, Tuple, Mapping, Union, Iterator
 import re
 from enum import Enum
 
 import requests
 from lxml import etree
+from lxml.cssselect import CSSSelector
 import lxml.html
 
+from .cache import cached_get
+from .connection import safe_requests_get  # Still importable from here.
+from .throttle import map_concurrently
+from .titleindex import TitleIndex
+from .instrumentation import RECORDER
+from .config import CONFIG, ConfigError
+# Moved to the titles module; still importable from here.
+from .titles import get_titles_path, read_titles, get_titles_file, read_titles_file, \
+    iter_teamlist, read_teamlist, RE_ANIME_ID
 
-CONFIG = ConfigParser()
-CONFIG.read(os.path.join(os.path.expanduser("~"), ".falchooser.ini"))
-try:
-    USERNAME = CONFIG["DEFAULT"]["Username"]
-    PASSWORD = CONFIG["DEFAULT"]["Password"]
-except KeyError as e:
-    raise e
+
+def __getattr__(name: str) -> str:
+    # USERNAME and PASSWORD used to be read at import time.
+    if name in ("USERNAME", "PASSWORD"):
+        return CONFIG.require(name.lower())
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 class ReType(Enum):
@@ -35,70 +41,163 @@ class ReType(Enum):
     USERS = re.compile(r"""\d+(,\d+)*(?= users)""")
 
 
-def safe_requests_get(*args, **kwargs) -> requests.Request:
-    """
-    Make a safe request with error handling and retries.
-    :param *args: These are passed to the requests.get function.
-    :return: A request object with status code 200.
-    """
-    tried = 0
-    while True:
-        r = requests.get(*args, **kwargs)
-        if r.status_code == 200:
-            break
-        elif tried >= 3:
-            raise requests.HTTPError("{} - {}".format(r.status_code, r.text))
-        else:
-            print("{} - {}".format(r.status_code, r.text), "Trying again.")
-            tried += 1
-            sleep(1)  # Wait  for retry
-    return r
+RE_NA = re.compile(r"""N/A""")
+
+# Label of a statistics row and which entries are extracted from it.
+STATS_FIELDS = {
+    "Score:": (("score", ReType.DOT), ("users", ReType.USERS)),
+    "Ranked:": (("ranked", ReType.HASH),),
+    "Popularity:": (("popularity", ReType.HASH),),
+    "Members:": (("members", ReType.COMMA),),
+    "Favorites:": (("favorites", ReType.COMMA),),
+    "Watching:": (("watching", ReType.COMMA),),
+    "Completed:": (("completed", ReType.COMMA),),
+    "On-Hold:": (("onhold", ReType.COMMA),),
+    "Dropped:": (("dropped", ReType.COMMA),),
+    "Plan to Watch:": (("plantowatch", ReType.COMMA),),
+}
+STATS_KEYS = tuple(key for fields in STATS_FIELDS.values() for key, _ in fields)
+
+_select_lborder = CSSSelector("div.js-scrollfix-bottom", translator="html")
+_select_cbody = CSSSelector("div.js-scrollfix-bottom-rel", translator="html")
+_select_rows = CSSSelector("div.spaceit_pad", translator="html")
+
 
-def get_titles_path() -> str:
+def parse_stats_page(content: bytes) -> Mapping[str, Union[int, float, None]]:
     """
-    :return: Absulute path of titles textfiles.
+    Parse the statistics from the html of an anime's /stats page.
+    Only the part of the page between the left border and the
+    summary stats gets parsed; the full page is used as fallback.
+    :param content: Raw html of the page.
+    :return: Dictionary of different statistics.
     """
-    path = os.path.dirname(os.path.realpath(__file__))
-    path = os.path.split(path)[0]
-    return os.path.join(path, "titles")
+    stats = _parse_stats_root(lxml.html.document_fromstring(_slice_stats_block(content)))
+    if len(stats) != len(STATS_KEYS):
+        stats = _parse_stats_root(lxml.html.document_fromstring(content))
+    return stats
 
 
-def read_titles(year: int, quarter: int,
-                ignored: bool=False, urls: bool=False) -> Sequence[str]:
+def parse_title_page(content: bytes) -> str:
     """
-    Read textfile with anime titles and return them.
-    :param year: Year of broadcast.
-    :param quarter: Quarter of broadcast (winter, spring, summer, fall).
-    :param ignored: Read the titles from the 'ignored' file.
-    :param urls: Do not read titles but anime urls.
-    :return: Sequence of anime titles.
+    Parse the title from the html of an anime's main page.
+    :param content: Raw html of the page.
+    :return: Title of the anime.
     """
-    ignore = "-ignore" if ignored else ""
-    url = "-urls" if urls else ""
-    path = get_titles_path()
-    path = os.path.join(path, "{}-{}{}{}.txt".format(year, quarter, ignore, url))
-    with open(path) as fd:
-        return [line.strip() for line in fd if not line.isspace()]
+    root = lxml.html.fromstring(content)
+    title = root.cssselect("h1.h1")[0]
+    return title[0].text
+
+
+def _slice_stats_block(content: bytes) -> bytes:
+    start = content.find(b"js-scrollfix-bottom")
+    end = content.rfind(b"Plan to Watch:")
+    if start < 0 or end < start:
+        return content
+    start = content.rfind(b"<div", 0, start)
+    end = content.find(b"</div>", end)
+    if start < 0 or end < 0:
+        return content
+    return content[start:end + len(b"</div>")]
+
+
+def _parse_stats_root(root: lxml.html.HtmlElement) -> Mapping[str, Union[int, float, None]]:
+    stats = dict()
+    lborders = _select_lborder(root)
+    cbodies = _select_cbody(root)
+    if not lborders or not cbodies:
+        return stats
+    # Get statistics from left border and from central body.
+    divs = [child for child in lborders[0] if child.tag == "div"]
+    divs.extend(_select_rows(cbodies[0]))
+    for div in divs:
+        if len(div) == 0:
+            continue
+        fields = STATS_FIELDS.get(div[0].text)
+        if fields:
+            value = _text_without_sup(div)
+            for key, re_type in fields:
+                stats[key] = _match_and_convert(value, re_type)
+    return stats
+
+
+def _text_without_sup(div_element: lxml.html.HtmlElement) -> str:
+    # Skip sup elements (and their tail) because they fuck the parsing up.
+    parts = [div_element.text or ""]
+    for child in div_element:
+        if child.tag == "sup":
+            continue
+        if isinstance(child.tag, str):
+            parts.append(child.text_content())
+        if child.tail:
+            parts.append(child.tail)
+    return "".join(parts)
+
+
+def _match_and_convert(value: str, re_type: ReType) -> Union[int, float, None]:
+    # Check if the entry is "N/A" and return None if yes.
+    if re_type is not ReType.USERS and RE_NA.search(value):
+        return None
+    value = re_type.value.search(value).group()
+    if re_type is ReType.DOT:
+        return float(value)
+    return int(value.replace(",", ""))
 
 
 class Mal:
     """
     Class for getting some anime's statistics from Mal.
+    Titles are resolved with a persistent TitleIndex first, which
+    write_urls fills with the anime of the database; only unknown
+    titles are searched on Mal.
     """
     URL = "https://myanimelist.net"
 
+    def __init__(self, index: TitleIndex=None):
+        """
+        Constructor
+        :param index: Title index to use. Loads the default one if None.
+        """
+        self._index = index
+        self._filled = False
+
+    @property
+    def index(self) -> TitleIndex:
+        if self._index is None:
+            self._index = TitleIndex()
+        return self._index
+
+    def fill_index(self, db=None) -> None:
+        """
+        Add the anime of the database to the title index, once per instance.
+        Without a reachable database titles are only searched.
+        :param db: dbaccess.Database; connects to the default one if None.
+        """
+        if self._filled:
+            return
+        from sqlalchemy.exc import SQLAlchemyError
+        try:
+            self.index.update_from_db(db)
+        except (ConfigError, ImportError, SQLAlchemyError) as e:
+            print("Title index not updated from database: {}".format(e))
+        self._filled = True
+
     def search(self, title: str) -> Sequence[Tuple[int, str]]:
         """
-        Search for an anime.
+        Search for an anime. Titles and synonyms of all results are
+        added to the title index.
         :param title: Title of the anime to search for.
         :return: A sequence of ordered search results with (id, title) tuples.
         """
-        r = safe_requests_get(self.URL + "/api/anime/search.xml",
-                              params={"q":title}, auth=(USERNAME, PASSWORD))
+        r = cached_get(self.URL + "/api/anime/search.xml", "search",
+                       params={"q":title}, auth=(CONFIG.username, CONFIG.password))
         root = etree.fromstring(r.content)
-        entries = (child for child in root if child.tag == "entry")
-        results = ((int(child.find("id").text), child.find("title").text)
-                   for child in entries)
+        results = []
+        for child in root:
+            if child.tag != "entry":
+                continue
+            id = int(child.find("id").text)
+            results.append((id, child.find("title").text))
+            self.index.add(id, _entry_titles(child))
         return tuple(results)
 
     def get_url(self, id: int) -> str:
@@ -107,30 +206,45 @@ class Mal:
         :param id: Mal id of a specific anime.
         :return: Absolute URL of an anime.
         """
+        url = self.index.url(id)
+        if url:
+            return url
         simple_url = self.URL + "/anime/" + str(id)
-        r = safe_requests_get(simple_url)
+        r = cached_get(simple_url, "page")
         if r.status_code == 200:
             root = lxml.html.fromstring(r.content)
         else:
             raise requests.HTTPError("{} - {}".format(r.status_code, r.text))
         hnav = root.cssselect("a.horiznav_active")[0]
         url = hnav.attrib["href"]
+        self.index.add(id, url=url)
         return url
 
     def write_urls(self, year: int, quarter: int,
-                   ignored: bool=False) -> None:
+                   ignored: bool=False, workers: int=1, db=None, from_db: bool=True) -> None:
         """
         Write urls of given animes to a file in titles path.
         Output file format is year-quarter-urls.txt.
         :param year: Specifies year of input file.
         :param quarter: Specifies year of input file.
         :param ignored: Get urls of ignored animes.
+        :param workers: Maximum number of concurrent searches.
+        :param db: dbaccess.Database filling the title index; the default one if None.
+        :param from_db: Fill the title index from the database first.
         """
+        # Loaded before the workers start, so they all share one index.
+        index = self.index
+        if from_db:
+            self.fill_index(db)
         titles = read_titles(year, quarter, ignored)
-        path = get_titles_path()
-        ignore = "-ignore" if ignored else ""
-        path = os.path.join(path, "{}-{}{}-urls.txt".format(year, quarter, ignore))
-        urls = map(self._search_and_build_url, titles)
+        path = get_titles_file(year, quarter, ignored, True)
+        try:
+            urls, failed = map_concurrently(self._search_and_build_url, titles, workers)
+        finally:
+            index.save()
+        if failed:
+            raise RuntimeError("Could not resolve titles: {}".format(
+                ", ".join("{} ({!r})".format(title, e) for title, e in failed.items())))
         with open(path, "x") as fd:
             for url in urls:
                 fd.write(url + "\n")
@@ -141,6 +255,9 @@ class Mal:
         :param title: Search for this title.
         :return: Returns an url string or an empty string if nothing is found.
         """
+        result = self.index.lookup(title)
+        if result is not None:
+            return self.get_url(result)
         print("Searching for Title \"{}\".".format(title))
         results = self.search(title)
         result = tuple(result[0] for result in results if result[1] == title)
@@ -150,29 +267,47 @@ class Mal:
             return ""
         else:
             result = results[0][0]
+        # Remember the query itself, the next run needs no search.
+        self.index.add(result, (title,))
         return self.get_url(result)
 
 
+def _entry_titles(entry: etree._Element) -> Iterator[str]:
+    """
+    :param entry: <entry> element of a search result.
+    :return: Title, english title and synonyms of this entry.
+    """
+    for tag in ("title", "english"):
+        element = entry.find(tag)
+        if element is not None and element.text:
+            yield element.text
+    synonyms = entry.find("synonyms")
+    if synonyms is not None and synonyms.text:
+        yield from (synonym.strip() for synonym in synonyms.text.split(";"))
+
+
 class MalEntry:
     """
     Class for parsing the statistics of an anime on Mal.
     """
-    re_id = re.compile(r"""(?<=anime/)\d+(?=/)""")
-    re_na = re.compile(r"""N/A""")
+    re_id = RE_ANIME_ID
 
-    def __init__(self, url: str, id: int=None):
+    def __init__(self, url: str, id: int=None, title: str=None,
+                 stats: Mapping[str, Union[int, float, None]]=None):
         """
         Constructor
         :param url: Absolute url of Mal entry.
         :param id: Id of entry or None.
+        :param title: Already parsed title or None.
+        :param stats: Already parsed statistics or None.
         """
         self.url = url
         if id:
             self.id = id
         else:
             self.id = int(self.re_id.search(url).group())
-        self.stats = dict()
-        self._title = None
+        self.stats = dict(stats) if stats else dict()
+        self._title = title
 
     def get_title(self) -> str:
         if not self._title:
@@ -180,10 +315,10 @@ class MalEntry:
         return self._title
 
     def _parse_title(self) -> str:
-        r = safe_requests_get(self.url)
-        root = lxml.html.fromstring(r.content)
-        title = root.cssselect("h1.h1")[0]
-        return title[0].text
+        with RECORDER.timer("fetch", self.id):
+            r = cached_get(self.url, "page")
+        with RECORDER.timer("parse", self.id):
+            return parse_title_page(r.content)
 
     def get_stats(self) -> Mapping[str, Union[int, str]]:
         """
@@ -199,88 +334,7 @@ class MalEntry:
         """
         Make a request to parse some statistics.
         """
-        r = safe_requests_get(self.url + "/stats")
-        root = lxml.html.fromstring(r.content)
-        # Get statistics from left border.
-        lborder = root.cssselect("div.js-scrollfix-bottom")[0]
-        divs = [child for child in lborder if child.tag == "div"]
-        # Get statistics from central body.
-        cbody = root.cssselect("div.js-scrollfix-bottom-rel")[0]
-        rows = cbody.cssselect("div.spaceit_pad")
-        divs.extend(rows)
-        for div in divs:
-            mapping = self._parse_mapping(div)
-            if mapping:
-                self.stats.update(mapping)
-
-    def _parse_mapping(self, div_element: lxml.html.HtmlElement):
-        children = div_element.getchildren()
-        if len(children) > 0:
-            key = children[0].text
-        else:
-            return None
-        mapping = dict()
-        if key == "Score:":
-            mapping["score"] = self._match_and_convert(div_element, ReType.DOT)
-            mapping["users"] = self._match_and_convert(div_element, ReType.USERS)
-        elif key == "Ranked:":
-            mapping["ranked"] = self._match_and_convert(div_element, ReType.HASH)
-        elif key == "Popularity:":
-            mapping["popularity"] = self._match_and_convert(div_element, ReType.HASH)
-        elif key == "Members:":
-            mapping["members"] = self._match_and_convert(div_element, ReType.COMMA)
-        elif key == "Favorites:":
-            mapping["favorites"] = self._match_and_convert(div_element, ReType.COMMA)
-        elif key == "Watching:":
-            mapping["watching"] = self._match_and_convert(div_element, ReType.COMMA)
-        elif key == "Completed:":
-            mapping["completed"] = self._match_and_convert(div_element, ReType.COMMA)
-        elif key == "On-Hold:":
-            mapping["onhold"] = self._match_and_convert(div_element, ReType.COMMA)
-        elif key == "Dropped:":
-            mapping["dropped"] = self._match_and_convert(div_element, ReType.COMMA)
-        elif key == "Plan to Watch:":
-            mapping["plantowatch"] = self._match_and_convert(div_element, ReType.COMMA)
-        else:
-            return None
-        return mapping
-
-    def _match_and_convert(self, div_element: lxml.html.HtmlElement,
-                           re_type: ReType) -> int:
-        # Remove sup elements because they fuck the parsing up.
-        sups = div_element.findall("sup")
-        for sup in sups:
-            div_element.remove(sup)
-        value = div_element.text_content()
-        # Check if the entry is "N/A" and return None if yes.
-        if re_type.name != "USERS" and self.re_na.search(value):
-            return None
-        value = re_type.value.search(value).group()
-        if re_type.name == "DOT":
-            return float(value)
-        elif re_type.name == "COMMA" or "USERS":
-            value = value.replace(",","")
-        return int(value)
-
-
-def read_teamlist(filepath: str) -> Mapping[str, Sequence[str]]:
-    """
-    Read and parse teamlist file.
-    :param filepath: Path to teamlist-seasonYY.txt
-    :return: Dictionary mapping usernames to a tuple of anime titles. 
-    """
-    with open(filepath, "r") as fd:
-        assert fd.readline()[:9] == "Team List"
-        return_dict = dict()
-        for line in fd:
-            if not line.isspace():
-                username = line.strip()
-                title_list = []
-                assert re.match(r"""---+""", next(fd)) 
-                for i in range(5):
-                    title_list.append(next(fd).strip())
-                assert next(fd).isspace()
-                for i in range(2):
-                    title_list.append(next(fd).strip())
-                return_dict[username] = tuple(title_list)
-    return return_dict
+        with RECORDER.timer("fetch", self.id):
+            r = cached_get(self.url + "/stats", "stats")
+        with RECORDER.timer("parse", self.id):
+            self.stats.update(parse_stats_page(r.content))
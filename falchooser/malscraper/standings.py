@@ -0,0 +1,152 @@
+"""
+League standings computed from the teams in user_anime_team.
+
+Teams are loaded as sparse users x anime matrix and the points of
+every anime as dense anime x day array, so the score of every user on
+every day is a single sparse matrix product. New days are appended
+without recomputing old ones. Needs numpy and scipy.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+from typing import Mapping, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select
+
+from .dbaccess import Database, User, user_anime_team
+from .optimizer import POINT_WEIGHTS
+from .queries import load_statistics, latest_day
+
+
+class Standings:
+    """
+    Scores of all users over a range of days.
+    scores has shape (len(user_ids), len(days)).
+    """
+    def __init__(self, user_ids: np.ndarray, names: Sequence[str], anime_ids: np.ndarray,
+                 teams: sparse.csr_matrix, days: np.ndarray, points: np.ndarray,
+                 weights: Mapping[str, float]=POINT_WEIGHTS):
+        """
+        Constructor
+        :param user_ids: Sorted user ids.
+        :param names: Usernames in order of user_ids.
+        :param anime_ids: Sorted ids of all anime in any team.
+        :param teams: Sparse matrix of shape (users, anime), 1 if the anime is in the user's team.
+        :param days: Consecutive days.
+        :param points: Points of every anime on every day, shape (anime, days).
+        :param weights: Points per unit of each metric.
+        """
+        self.user_ids = user_ids
+        self.names = list(names)
+        self.anime_ids = anime_ids
+        self.teams = teams
+        self.days = days
+        self.points = points
+        self.weights = dict(weights)
+        self.scores = np.asarray(teams @ points)
+
+    def __repr__(self):
+        return "<Standings(users={}, anime={}, days={})>".format(
+            len(self.user_ids), len(self.anime_ids), len(self.days))
+
+    @classmethod
+    def load(cls, first_day: int=0, last_day: int=None,
+             weights: Mapping[str, float]=POINT_WEIGHTS, db: Database=None) -> "Standings":
+        """
+        Load teams and statistics from the database.
+        :param first_day: First day (inclusive).
+        :param last_day: Last day (inclusive); the latest day in the database if None.
+        :param weights: Points per unit of each metric.
+        :param db: Database to query. Connects to the default one if None.
+        """
+        if db is None:
+            db = Database()
+        users = User.__table__
+        with db.engine.connect() as conn:
+            user_rows = conn.execute(select(users.c.id, users.c.name).order_by(users.c.id)).all()
+            members = conn.execute(select(user_anime_team.c.users, user_anime_team.c.anime)).all()
+        user_ids = np.array([id for id, _ in user_rows], dtype=np.int64)
+        members = np.array(members, dtype=np.int64).reshape(len(members), 2)
+        anime_ids = np.unique(members[:, 1])
+        teams = sparse.csr_matrix(
+            (np.ones(len(members)), (np.searchsorted(user_ids, members[:, 0]),
+                                     np.searchsorted(anime_ids, members[:, 1]))),
+            shape=(len(user_ids), len(anime_ids)))
+        if last_day is None:
+            last_day = latest_day(db)
+            last_day = first_day - 1 if last_day is None else last_day
+        stats = load_statistics(anime_ids, first_day, last_day, tuple(weights), "ffill", db)
+        # Anime score nothing before their first statistics.
+        points = np.nan_to_num(_points(stats.metrics, weights))
+        return cls(user_ids, [name for _, name in user_rows], anime_ids, teams,
+                   stats.days, points, weights)
+
+    def add_day(self, db: Database=None) -> np.ndarray:
+        """
+        Load the statistics of the day after the last one and append its scores.
+        Anime without statistics on this day keep their previous points.
+        :param db: Database to query. Connects to the default one if None.
+        :return: Scores of all users on the new day.
+        """
+        day = int(self.days[-1]) + 1 if len(self.days) else 0
+        stats = load_statistics(self.anime_ids, day, day, tuple(self.weights), "nan", db)
+        column = _points(stats.metrics, self.weights)[:, 0]
+        if self.points.shape[1]:
+            column = np.where(np.isnan(column), self.points[:, -1], column)
+        else:
+            column = np.nan_to_num(column)
+        scores = self.teams @ column
+        self.days = np.append(self.days, day)
+        self.points = np.concatenate([self.points, column[:, None]], axis=1)
+        self.scores = np.concatenate([self.scores, scores[:, None]], axis=1)
+        return scores
+
+    def day_index(self, day: int=None) -> int:
+        """
+        :param day: A day of the standings; the last one if None.
+        :return: Column of this day.
+        """
+        if day is None:
+            return len(self.days) - 1
+        i = int(day - self.days[0]) if len(self.days) else -1
+        if not 0 <= i < len(self.days):
+            raise KeyError(day)
+        return i
+
+    def ranks(self, day: int=None) -> np.ndarray:
+        """
+        :param day: A day of the standings; the last one if None.
+        :return: Rank of every user (1 is best, ties share the better rank).
+        """
+        scores = self.scores[:, self.day_index(day)]
+        order = np.argsort(-scores, kind="stable")
+        sorted_scores = scores[order]
+        first = np.concatenate([[True], sorted_scores[1:] != sorted_scores[:-1]])
+        ranks = np.empty(len(scores), dtype=np.int64)
+        ranks[order] = np.maximum.accumulate(np.where(first, np.arange(1, len(scores) + 1), 0))
+        return ranks
+
+    def top(self, n: int=10, day: int=None) -> Sequence[Tuple[int, str, float]]:
+        """
+        :param n: Number of users.
+        :param day: A day of the standings; the last one if None.
+        :return: (rank, username, score) of the n best users.
+        """
+        i = self.day_index(day)
+        ranks = self.ranks(day)
+        best = np.argsort(ranks, kind="stable")[:n]
+        return [(int(ranks[u]), self.names[u], float(self.scores[u, i])) for u in best]
+
+
+def _points(metrics: Mapping[str, np.ndarray], weights: Mapping[str, float]) -> np.ndarray:
+    """
+    :return: Weighted sum of the metrics; NaN only where all of them are NaN.
+    """
+    points = sum(weight * np.nan_to_num(metrics[name]) for name, weight in weights.items())
+    missing = np.logical_and.reduce([np.isnan(metrics[name]) for name in weights])
+    return np.where(missing, np.nan, points) if np.any(missing) else points
@@ -0,0 +1,213 @@
+"""
+Memory-mapped columnar snapshot of the statistics table.
+
+Every metric is one flat binary file of fixed-width values with shape
+(days, anime): a new day is appended to the end of each file and a day
+of all anime is one contiguous row. meta.json holds the anime ids (the
+columns) and the first day. Reading maps the files with mmap, so opening
+years of history costs no database round trip and no copy.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import json
+import os
+from typing import Iterable, Sequence
+
+import numpy as np
+from sqlalchemy import select
+
+from .dbaccess import Database, Statistics, StatisticsEncoded, METRICS
+from .queries import StatisticsArrays, DERIVED, load_statistics, latest_day, _forward_fill
+
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "falchooser", "statistics")
+
+# Counts fit into 32 bit; MISSING marks days without statistics.
+DTYPES = {metric: np.dtype("<i4") for metric in METRICS}
+DTYPES["score"] = np.dtype("<f4")
+MISSING = -1
+
+
+class ColumnStore:
+    """
+    Statistics of all anime as memory-mapped (days, anime) arrays.
+    """
+    META = "meta.json"
+
+    def __init__(self, directory: str=DEFAULT_DIRECTORY):
+        """
+        Constructor
+        :param directory: Directory of the store; created by the first sync.
+        """
+        self.directory = directory
+        self.anime_ids = np.zeros(0, dtype=np.int64)
+        self.first_day = 0
+        self.n_days = 0
+        self._maps = dict()
+        path = os.path.join(directory, self.META)
+        if os.path.exists(path):
+            with open(path) as fd:
+                meta = json.load(fd)
+            self.anime_ids = np.array(meta["anime_ids"], dtype=np.int64)
+            self.first_day = meta["first_day"]
+            self.n_days = meta["n_days"]
+
+    def __repr__(self):
+        return "<ColumnStore(anime={}, days={}..{})>".format(
+            len(self.anime_ids), self.first_day, self.last_day)
+
+    @property
+    def last_day(self) -> int:
+        return self.first_day + self.n_days - 1
+
+    @property
+    def days(self) -> np.ndarray:
+        return np.arange(self.first_day, self.first_day + self.n_days)
+
+    def _path(self, metric: str) -> str:
+        return os.path.join(self.directory, metric + ".bin")
+
+    def raw(self, metric: str) -> np.ndarray:
+        """
+        Zero-copy, read-only view of a stored metric.
+        :param metric: Name of a stored metric.
+        :return: Array of shape (days, anime); MISSING (NaN for score) where no statistics exist.
+        """
+        shape = (self.n_days, len(self.anime_ids))
+        cached = self._maps.get(metric)
+        if cached is not None and cached.shape == shape:
+            return cached
+        if shape[0] * shape[1] == 0:
+            return np.zeros(shape, dtype=DTYPES[metric])
+        array = np.memmap(self._path(metric), dtype=DTYPES[metric], mode="r", shape=shape)
+        self._maps[metric] = array
+        return array
+
+    def load(self, anime_ids: Iterable[int]=None, first_day: int=None, last_day: int=None,
+             metrics: Sequence[str]=METRICS + tuple(DERIVED), fill: str="nan") -> StatisticsArrays:
+        """
+        Read statistics like queries.load_statistics, but from the store.
+        Only the requested anime and days are copied out of the mapped files.
+        :param anime_ids: Mal ids to load; all anime in the store if None.
+        :param first_day: First day (inclusive); the first stored day if None.
+        :param last_day: Last day (inclusive); the last stored day if None.
+        :param metrics: Stored metrics and/or keys of DERIVED.
+        :param fill: "nan" leaves missing days as NaN, "ffill" repeats the last known value.
+        :return: Dense arrays indexed by [anime, day] for every metric.
+        """
+        first_day = self.first_day if first_day is None else first_day
+        last_day = self.last_day if last_day is None else last_day
+        days = np.arange(first_day, last_day + 1)
+        rows = days - self.first_day
+        stored_rows = (rows >= 0) & (rows < self.n_days)
+        if anime_ids is None:
+            anime_ids = self.anime_ids
+        anime_ids = np.unique(np.asarray(list(anime_ids), dtype=np.int64))
+        columns = np.searchsorted(self.anime_ids, anime_ids)
+        known = columns < len(self.anime_ids)
+        known[known] = self.anime_ids[columns[known]] == anime_ids[known]
+        stored = [m for m in METRICS
+                  if m in metrics or any(m in DERIVED.get(d, ()) for d in metrics)]
+        arrays = dict()
+        for metric in stored:
+            values = np.full((len(anime_ids), len(days)), np.nan)
+            raw = self.raw(metric)
+            block = raw[np.ix_(rows[stored_rows], columns[known])].T.astype(float)
+            if metric != "score":
+                block[block == MISSING] = np.nan
+            values[np.ix_(known, stored_rows)] = block
+            if fill == "ffill":
+                values = _forward_fill(values)
+            arrays[metric] = values
+        for name, parts in DERIVED.items():
+            if name in metrics:
+                arrays[name] = sum(arrays[part] for part in parts)
+        return StatisticsArrays(anime_ids, days, {m: arrays[m] for m in metrics})
+
+    def sync(self, db: Database=None, overlap: int=1) -> int:
+        """
+        Bring the store up to date with the database. New days are appended;
+        the last overlap stored days are rewritten because a scrape may
+        still have been running. New anime add columns, which rewrites
+        the files once.
+        :param db: Database to read from. Connects to the default one if None.
+        :param overlap: Number of already stored days to read again.
+        :return: Number of days written.
+        """
+        if db is None:
+            db = Database()
+        last_day = latest_day(db)
+        if last_day is None:
+            return 0
+        table = StatisticsEncoded if db.storage == "delta" else Statistics
+        with db.engine.connect() as conn:
+            db_ids = np.array(conn.execute(select(table.anime).distinct()).scalars().all(),
+                              dtype=np.int64)
+            first_day = conn.execute(select(table.day).order_by(table.day)).first()[0]
+        os.makedirs(self.directory, exist_ok=True)
+        anime_ids = np.union1d(self.anime_ids, db_ids)
+        if self.n_days == 0 or len(anime_ids) > len(self.anime_ids):
+            self._rewrite(anime_ids, min(first_day, self.first_day) if self.n_days else first_day)
+        start = max(self.first_day, self.last_day + 1 - overlap)
+        if start > last_day:
+            return 0
+        stats = load_statistics(self.anime_ids, start, last_day, METRICS, "nan", db)
+        self._write(start, stats)
+        return last_day - start + 1
+
+    def _rewrite(self, anime_ids: np.ndarray, first_day: int) -> None:
+        """
+        Rewrite all files with new columns (and an earlier first day).
+        """
+        old = {metric: np.array(self.raw(metric)) for metric in METRICS}
+        columns = np.searchsorted(anime_ids, self.anime_ids)
+        offset = self.first_day - first_day if self.n_days else 0
+        n_days = self.n_days + offset
+        self._maps.clear()
+        for metric, dtype in DTYPES.items():
+            fill = np.nan if metric == "score" else MISSING
+            values = np.full((n_days, len(anime_ids)), fill, dtype=dtype)
+            values[offset:, columns] = old[metric]
+            _replace(self._path(metric), values.tobytes())
+        self.anime_ids = anime_ids
+        self.first_day = first_day
+        self.n_days = n_days
+        self._write_meta()
+
+    def _write(self, start: int, stats: StatisticsArrays) -> None:
+        """
+        Write stats of days start.. (in store columns); overwrite stored
+        days and append the others.
+        """
+        row = start - self.first_day
+        for metric, dtype in DTYPES.items():
+            values = stats[metric].T
+            if metric != "score":
+                values = np.where(np.isnan(values), MISSING, values)
+            data = values.astype(dtype).tobytes()
+            with open(self._path(metric), "r+b") as fd:
+                fd.seek(row * len(self.anime_ids) * dtype.itemsize)
+                fd.write(data)
+                fd.truncate()
+        self.n_days = row + len(stats.days)
+        self._maps.clear()
+        self._write_meta()
+
+    def _write_meta(self) -> None:
+        meta = {"anime_ids": self.anime_ids.tolist(), "first_day": self.first_day,
+                "n_days": self.n_days, "dtypes": {m: d.str for m, d in DTYPES.items()}}
+        _replace(os.path.join(self.directory, self.META), json.dumps(meta).encode("utf-8"))
+
+
+def _replace(path: str, data: bytes) -> None:
+    """
+    Atomically replace a file's content.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fd:
+        fd.write(data)
+    os.replace(tmp, path)
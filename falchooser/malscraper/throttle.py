@@ -0,0 +1,140 @@
+"""
+Rate limiting and bounded concurrency for requests to Mal.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Mapping, Sequence, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 4
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket. Tokens are refilled continuously
+    with a fixed rate up to a maximum of burst tokens.
+    """
+    def __init__(self, rate: float, burst: int=1):
+        """
+        Constructor
+        :param rate: Number of tokens added per second.
+        :param burst: Maximum number of tokens in the bucket.
+        """
+        assert rate > 0, "Rate must be positive (current: {}).".format(rate)
+        assert burst >= 1, "Burst must be at least 1 (current: {}).".format(burst)
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self) -> float:
+        """
+        Take one token, blocking until it is available.
+        :return: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class HostRateLimiter:
+    """
+    Holds one token bucket per host so that every host
+    is limited independently.
+    """
+    def __init__(self, rate: float=DEFAULT_RATE, burst: int=DEFAULT_BURST):
+        """
+        Constructor
+        :param rate: Default requests per second for each host.
+        :param burst: Default number of requests allowed at once.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._buckets = dict()
+        self._overrides = dict()
+        self._lock = threading.Lock()
+
+    def set_limit(self, host: str, rate: float, burst: int=1) -> None:
+        """
+        Use a specific rate limit for a single host.
+        :param host: Hostname, e.g. myanimelist.net
+        :param rate: Requests per second.
+        :param burst: Number of requests allowed at once.
+        """
+        with self._lock:
+            self._overrides[host] = (rate, burst)
+            self._buckets[host] = TokenBucket(rate, burst)
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            if host not in self._buckets:
+                rate, burst = self._overrides.get(host, (self.rate, self.burst))
+                self._buckets[host] = TokenBucket(rate, burst)
+            return self._buckets[host]
+
+    def wait(self, url: str) -> float:
+        """
+        Block until a request to the url's host is allowed.
+        :param url: Absolute url which is going to be requested.
+        :return: Seconds spent waiting.
+        """
+        return self.bucket(urlsplit(url).hostname or "").acquire()
+
+
+LIMITER = HostRateLimiter()
+
+
+def map_concurrently(func: Callable[[T], R], items: Iterable[T],
+                     workers: int=1) -> Tuple[Sequence[R], Mapping[T, Exception]]:
+    """
+    Apply func to every item using a bounded thread pool.
+    An exception for one item does not abort the others.
+    :param func: Function to call for each item.
+    :param items: Inputs for func. Need to be hashable.
+    :param workers: Maximum number of concurrent calls. 1 means serial.
+    :return: Results in order of the successful items and a dictionary
+             mapping each failed item to its exception.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    failed = dict()
+
+    def call(i: int) -> None:
+        try:
+            results[i] = func(items[i])
+        except Exception as e:
+            failed[i] = e
+
+    if workers <= 1:
+        for i in range(len(items)):
+            call(i)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(call, range(len(items))))
+    succeeded = [result for i, result in enumerate(results) if i not in failed]
+    return succeeded, {items[i]: e for i, e in sorted(failed.items())}
@@ -0,0 +1,124 @@
+"""
+Persistent index mapping anime titles to Mal ids and urls.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Iterable, Optional
+
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "falchooser", "titles.json")
+
+re_separators = re.compile(r"""[\W_]+""")
+
+
+def normalize_title(title: str) -> str:
+    """
+    Normalize a title for lookups: Unicode compatibility form,
+    case folded and with punctuation and whitespace collapsed.
+    :param title: Anime title.
+    :return: Normalized title.
+    """
+    title = unicodedata.normalize("NFKC", title).casefold()
+    return re_separators.sub(" ", title).strip()
+
+
+class TitleIndex:
+    """
+    Maps normalized titles and aliases to Mal ids and ids to canonical urls.
+    Stored as JSON file; call save to persist changes.
+    """
+    def __init__(self, path: Optional[str]=DEFAULT_PATH):
+        """
+        Constructor
+        :param path: JSON file of the index. None keeps it in memory only.
+        """
+        self.path = path
+        self._ids = dict()
+        self._urls = dict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path and os.path.exists(path):
+            with open(path) as fd:
+                data = json.load(fd)
+            self._ids = data.get("titles", dict())
+            self._urls = {int(id): url for id, url in data.get("urls", dict()).items()}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def lookup(self, title: str) -> Optional[int]:
+        """
+        :param title: Title or alias of an anime.
+        :return: Mal id or None if the title is unknown.
+        """
+        with self._lock:
+            return self._ids.get(normalize_title(title))
+
+    def url(self, id: int) -> Optional[str]:
+        """
+        :param id: Mal id of an anime.
+        :return: Canonical url or None if it is unknown.
+        """
+        with self._lock:
+            return self._urls.get(id)
+
+    def add(self, id: int, titles: Iterable[str]=(), url: str=None,
+            overwrite: bool=False) -> None:
+        """
+        Add titles and/or the url of an anime.
+        :param id: Mal id of the anime.
+        :param titles: Titles and aliases of the anime.
+        :param url: Canonical url of the anime.
+        :param overwrite: Replace titles which already point to another anime.
+        """
+        with self._lock:
+            for title in titles:
+                if not title:
+                    continue
+                key = normalize_title(title)
+                if key and (overwrite or key not in self._ids):
+                    self._ids[key] = id
+                    self._dirty = True
+            if url and self._urls.get(id) != url:
+                self._urls[id] = url
+                self._dirty = True
+
+    def update_from_db(self, db=None) -> None:
+        """
+        Add title, id and url of every anime in the database.
+        :param db: dbaccess.Database; connects to the default one if None.
+        """
+        from sqlalchemy import select
+        from .dbaccess import Database, Anime
+        if db is None:
+            db = Database()
+        with db.engine.connect() as conn:
+            for id, title, url in conn.execute(select(Anime.id, Anime.title, Anime.url)):
+                self.add(id, (title,), url, overwrite=True)
+
+    def save(self) -> None:
+        """
+        Write the index to its file if it changed.
+        """
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as fd:
+                json.dump({"titles": self._ids,
+                           "urls": {str(id): url for id, url in self._urls.items()}},
+                          fd, ensure_ascii=False, indent=0, sort_keys=True)
+            os.replace(tmp, self.path)
+            self._dirty = False
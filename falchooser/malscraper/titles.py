@@ -0,0 +1,102 @@
+"""
+Reading the titles, url and teamlist text files.
+
+Only needs the standard library, so reading a season's titles does not
+import requests, lxml or SQLAlchemy.
+
+Created on Oct 17, 2026
+
+:copyright: (c) 2017 by Thomas Leyh.
+:licence: GPLv3, see LICENSE for more details.
+"""
+
+import os
+import re
+from typing import Iterator, Mapping, Sequence, Tuple
+
+
+RE_ANIME_ID = re.compile(r"""(?<=anime/)\d+(?=/)""")
+
+
+def anime_id(url: str) -> int:
+    """
+    :param url: Url of a Mal entry.
+    :return: Mal id of the anime.
+    """
+    return int(RE_ANIME_ID.search(url).group())
+
+
+def get_titles_path() -> str:
+    """
+    :return: Absulute path of titles textfiles.
+    """
+    path = os.path.dirname(os.path.realpath(__file__))
+    path = os.path.split(path)[0]
+    return os.path.join(path, "titles")
+
+
+def read_titles(year: int, quarter: int,
+                ignored: bool=False, urls: bool=False) -> Sequence[str]:
+    """
+    Read textfile with anime titles and return them.
+    :param year: Year of broadcast.
+    :param quarter: Quarter of broadcast (winter, spring, summer, fall).
+    :param ignored: Read the titles from the 'ignored' file.
+    :param urls: Do not read titles but anime urls.
+    :return: Sequence of anime titles.
+    """
+    return read_titles_file(get_titles_file(year, quarter, ignored, urls))
+
+
+def get_titles_file(year: int, quarter: int,
+                    ignored: bool=False, urls: bool=False) -> str:
+    """
+    :param year: Year of broadcast.
+    :param quarter: Quarter of broadcast (winter, spring, summer, fall).
+    :param ignored: Path of the 'ignored' file.
+    :param urls: Path of the file with anime urls.
+    :return: Absolute path of a titles textfile.
+    """
+    ignore = "-ignore" if ignored else ""
+    url = "-urls" if urls else ""
+    return os.path.join(get_titles_path(), "{}-{}{}{}.txt".format(year, quarter, ignore, url))
+
+
+def read_titles_file(path: str) -> Sequence[str]:
+    """
+    Read a textfile with one anime title or url per line.
+    :param path: Path of the textfile.
+    :return: Sequence of non-empty lines.
+    """
+    with open(path) as fd:
+        return [line.strip() for line in fd if not line.isspace()]
+
+
+def iter_teamlist(filepath: str) -> Iterator[Tuple[str, Sequence[str]]]:
+    """
+    Read and parse teamlist file one user at a time.
+    :param filepath: Path to teamlist-seasonYY.txt
+    :return: Iterator of (username, tuple of anime titles) pairs.
+    """
+    with open(filepath, "r") as fd:
+        assert fd.readline()[:9] == "Team List"
+        for line in fd:
+            if not line.isspace():
+                username = line.strip()
+                title_list = []
+                assert re.match(r"""---+""", next(fd))
+                for i in range(5):
+                    title_list.append(next(fd).strip())
+                assert next(fd).isspace()
+                for i in range(2):
+                    title_list.append(next(fd).strip())
+                yield username, tuple(title_list)
+
+
+def read_teamlist(filepath: str) -> Mapping[str, Sequence[str]]:
+    """
+    Read and parse teamlist file.
+    :param filepath: Path to teamlist-seasonYY.txt
+    :return: Dictionary mapping usernames to a tuple of anime titles.
+    """
+    return dict(iter_teamlist(filepath))
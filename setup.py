@@ -10,12 +10,22 @@ setup(
     licence="GPLv3",
     packages=find_packages(exclude=["tests.*"]),
     install_requires=["lxml", "psycopg2", "SQLAlchemy", "requests", "cssselect"],
+    extras_require={
+        "analysis": ["numpy", "pandas", "scipy"],
+        "export": ["pyarrow"],
+        "archive": ["zstandard"],
+    },
     package_data={
         "falchooser":["titles/*.txt"],
     },
     entry_points={
         "console_scripts": [
-            "anime2db=falchooser.malscraper:cmd_stats_insert",
+            "anime2db=falchooser.malscraper.cli:cmd_stats_insert",
+            "anime2db-daemon=falchooser.malscraper.cli:cmd_daemon",
+            "anime2parquet=falchooser.malscraper.cli:cmd_export",
+            "anime2db-migrate=falchooser.malscraper.cli:cmd_migrate",
+            "anime2db-compact=falchooser.malscraper.cli:cmd_compact",
+            "anime2db-backfill=falchooser.malscraper.cli:cmd_backfill",
         ],
     },
 )
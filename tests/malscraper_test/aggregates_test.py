@@ -0,0 +1,48 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+
+from falchooser.malscraper.helpers import db_insert
+from falchooser.malscraper import aggregates
+from .support import make_statistics as _make_statistics, make_database
+
+
+def make_statistics(anime: int, day: int):
+    return _make_statistics(anime, day, anime * 100 + day * day, score=7.0 + day / 10)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_database((1, 2))
+
+    def test_deltas_follow_inserts(self):
+        for day in range(9):
+            db_insert([make_statistics(1, day), make_statistics(2, day)], True, self.db)
+        deltas = aggregates.read_deltas("watching", anime_ids=[2], db=self.db)
+        self.assertEqual(len(deltas), 9)
+        self.assertEqual(deltas[0], (2, 0, None, None))
+        self.assertEqual(deltas[3], (2, 3, 9 - 4, None))
+        self.assertEqual(deltas[8], (2, 8, 64 - 49, 64 - 1))
+
+    def test_out_of_order_day_updates_later_deltas(self):
+        db_insert([make_statistics(1, 0), make_statistics(1, 2)], True, self.db)
+        self.assertEqual(aggregates.read_deltas("watching", 2, 2, db=self.db), [(1, 2, None, None)])
+        db_insert([make_statistics(1, 1)], True, self.db)
+        self.assertEqual(aggregates.read_deltas("watching", 2, 2, db=self.db), [(1, 2, 3, None)])
+
+    def test_rebuild_matches_incremental(self):
+        # One batch per anime; every batch only updates the deltas of its own anime.
+        for day in range(10):
+            db_insert([make_statistics(1, day)], True, self.db)
+            db_insert([make_statistics(2, day)], True, self.db)
+        incremental = aggregates.read_deltas("score", db=self.db)
+        aggregates.rebuild_deltas(self.db)
+        self.assertEqual(aggregates.read_deltas("score", db=self.db), incremental)
+        self.assertEqual(len(incremental), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
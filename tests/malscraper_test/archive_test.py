@@ -0,0 +1,194 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import os
+import tempfile
+
+from sqlalchemy import select
+
+from falchooser.malscraper import archive, backfill as backfill_module, cache
+from falchooser.malscraper.archive import PageArchive, INDEX_FILE, read_record
+from falchooser.malscraper.backfill import backfill
+from falchooser.malscraper.connection import CLIENT
+from falchooser.malscraper.dbaccess import Database, Anime, Statistics, METRICS
+from falchooser.malscraper.days import collection_day
+from falchooser.malscraper.scraper import parse_stats_page
+from falchooser.malscraper.throttle import LIMITER
+from benchmarks.malserver import MalStandIn, read_fixture
+
+
+PAGES = {33089: read_fixture("33089-stats.html"),
+         34561: read_fixture("34561-stats.html"),
+         35062: read_fixture("35062-stats.html")}
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = os.path.join(self.tmp.name, "archive")
+        self.archive = PageArchive(self.directory)
+
+    def fill(self, days=range(3)):
+        for day in days:
+            for anime, page in PAGES.items():
+                self.archive.add(anime, day, "stats", page, accessed=1500000000.0 + day * 86400)
+
+    def test_add_and_get(self):
+        self.assertIsNone(self.archive.get(33089, 0))
+        self.assertTrue(self.archive.add(33089, 0, "stats", PAGES[33089]))
+        self.assertTrue(self.archive.add(33089, 0, "page", b"<html>main</html>"))
+        self.assertEqual(self.archive.get(33089, 0), PAGES[33089])
+        self.assertEqual(self.archive.get(33089, 0, "page"), b"<html>main</html>")
+        self.assertIn((33089, 0, "stats"), self.archive)
+        self.assertEqual(len(self.archive), 2)
+
+    def test_same_page_written_once(self):
+        self.assertTrue(self.archive.add(33089, 0, "stats", PAGES[33089]))
+        size = os.path.getsize(os.path.join(self.directory, INDEX_FILE))
+        self.assertFalse(self.archive.add(33089, 0, "stats", PAGES[33089]))
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, INDEX_FILE)), size)
+        # A changed page replaces the old one.
+        self.assertTrue(self.archive.add(33089, 0, "stats", PAGES[34561]))
+        self.assertEqual(self.archive.get(33089, 0), PAGES[34561])
+        self.assertEqual(len(self.archive), 1)
+
+    def test_compressed(self):
+        self.fill()
+        size = sum(os.path.getsize(os.path.join(self.directory, name))
+                   for name in os.listdir(self.directory) if name.startswith("segment-"))
+        self.assertLess(size, sum(len(page) for page in PAGES.values()))
+
+    def test_gzip(self):
+        self.archive = PageArchive(self.directory, codec="gz")
+        self.fill()
+        self.assertTrue(all(name.endswith(".gz") for name in os.listdir(self.directory)
+                            if name.startswith("segment-")))
+        # Reading does not depend on the codec of the archive object.
+        self.assertEqual(PageArchive(self.directory, codec="zst").get(35062, 2), PAGES[35062])
+
+    def test_segments(self):
+        original = archive.SEGMENT_SIZE
+        self.addCleanup(setattr, archive, "SEGMENT_SIZE", original)
+        archive.SEGMENT_SIZE = 1
+        self.fill()
+        segments = [name for name in os.listdir(self.directory) if name.startswith("segment-")]
+        self.assertEqual(len(segments), 9)
+        for day in range(3):
+            for anime, page in PAGES.items():
+                self.assertEqual(self.archive.get(anime, day), page)
+
+    def test_records(self):
+        self.fill()
+        self.archive.add(33089, 1, "page", b"main")
+        records = list(self.archive.records("stats", 1, 1))
+        self.assertEqual(sorted(record.anime for record in records), sorted(PAGES))
+        self.assertTrue(all(record.day == 1 for record in records))
+        self.assertEqual(len(list(self.archive.records())), 10)
+        positions = [(record.segment, record.offset) for record in self.archive.records()]
+        self.assertEqual(positions, sorted(positions))
+        self.assertEqual(read_record(self.directory, records[0]), PAGES[records[0].anime])
+        self.assertEqual(archive.accessed_time(records[0]).timestamp(), 1500000000.0 + 86400)
+
+    def test_reopen(self):
+        self.fill(range(1))
+        other = PageArchive(self.directory)
+        self.assertEqual(len(other), 3)
+        # Records written by another writer are picked up.
+        self.archive.add(33089, 5, "stats", PAGES[33089])
+        self.assertEqual(other.get(33089, 5), PAGES[33089])
+
+    def test_incomplete_index_record(self):
+        self.fill(range(1))
+        with open(os.path.join(self.directory, INDEX_FILE), "ab") as index:
+            index.write(b"\x01\x02\x03")
+        other = PageArchive(self.directory)
+        self.assertEqual(len(other), 3)
+        other.add(33089, 1, "stats", PAGES[33089])
+        self.assertEqual(PageArchive(self.directory).get(33089, 1), PAGES[33089])
+        self.assertEqual(len(PageArchive(self.directory)), 4)
+
+    def test_corrupt_page(self):
+        self.archive.add(33089, 0, "stats", PAGES[33089])
+        record = next(self.archive.records())
+        self.archive.add(34561, 0, "stats", PAGES[34561])
+        with self.assertRaises(ValueError):
+            read_record(self.directory, record._replace(crc=record.crc + 1))
+
+    def test_archive_fetched_pages(self):
+        self.addCleanup(cache.set_cache, cache.CACHE)
+        cache.set_cache(None)
+        self.addCleanup(archive.set_archive, None)
+        archive.set_archive(self.archive)
+        LIMITER.set_limit("127.0.0.1", 1000, 100)
+        with MalStandIn() as stand_in:
+            self.addCleanup(CLIENT.close)
+            r = cache.cached_get("{}/anime/33089/x/stats".format(stand_in.url), "stats")
+            cache.cached_get("{}/anime/33089".format(stand_in.url), "page")
+            cache.cached_get("{}/api/anime/search.xml?q=x".format(stand_in.url), "search")
+        day = collection_day()
+        self.assertEqual(self.archive.get(33089, day), r.content)
+        self.assertIsNotNone(self.archive.get(33089, day, "page"))
+        self.assertEqual(len(self.archive), 2)
+
+    def test_cached_pages_not_archived(self):
+        self.addCleanup(cache.set_cache, cache.CACHE)
+        cache.set_cache(cache.ResponseCache(os.path.join(self.tmp.name, "cache")))
+        self.addCleanup(archive.set_archive, None)
+        LIMITER.set_limit("127.0.0.1", 1000, 100)
+        with MalStandIn() as stand_in:
+            self.addCleanup(CLIENT.close)
+            url = "{}/anime/33089/x/stats".format(stand_in.url)
+            cache.cached_get(url, "stats")
+            archive.set_archive(self.archive)
+            r = cache.cached_get(url, "stats")
+        self.assertTrue(r.from_cache)
+        self.assertEqual(len(self.archive), 0)
+
+    def backfill_db(self):
+        db = Database("sqlite://")
+        db.create_tables()
+        db.upsert([Anime(id=anime, title="Anime {}".format(anime),
+                         url="https://myanimelist.net/anime/{}/x".format(anime))
+                   for anime in (33089, 34561)])
+        return db
+
+    def stored(self, db):
+        with db.engine.connect() as conn:
+            return {(row.anime, row.day): {metric: getattr(row, metric) for metric in METRICS}
+                    for row in conn.execute(select(Statistics))}
+
+    def test_backfill(self):
+        self.fill()
+        self.archive.add(34561, 1, "stats", b"<html>not a stats page</html>")
+        for processes in (0, 2):
+            db = self.backfill_db()
+            count, failed = backfill(self.archive, db, processes=processes, batch_size=2)
+            self.assertEqual(count, 5)
+            self.assertEqual([(record.anime, record.day) for record, _ in failed], [(34561, 1)])
+            # Anime 35062 is not in the database.
+            expected = {(anime, day): parse_stats_page(PAGES[anime])
+                        for anime in (33089, 34561) for day in range(3) if (anime, day) != (34561, 1)}
+            self.assertEqual(self.stored(db), expected)
+
+    def test_backfill_days(self):
+        self.fill()
+        db = self.backfill_db()
+        count, failed = backfill(self.archive, db, first_day=1, last_day=1, processes=0)
+        self.assertEqual((count, failed), (2, []))
+        self.assertEqual(sorted(self.stored(db)), [(33089, 1), (34561, 1)])
+
+    def test_backfill_tasks(self):
+        self.fill(range(2))
+        tasks = list(backfill_module._tasks(self.archive.records(), 4))
+        self.assertEqual([len(task) for task in tasks], [4, 2])
+        # A task does not span segments.
+        original = archive.SEGMENT_SIZE
+        self.addCleanup(setattr, archive, "SEGMENT_SIZE", original)
+        archive.SEGMENT_SIZE = 1
+        self.fill(range(2, 4))
+        tasks = list(backfill_module._tasks(self.archive.records(first_day=2), 4))
+        self.assertEqual([len(task) for task in tasks], [1] * 6)
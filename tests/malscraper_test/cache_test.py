@@ -0,0 +1,110 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import os
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from falchooser.malscraper.cache import ResponseCache, DAY
+from falchooser.malscraper.connection import CLIENT
+from falchooser.malscraper.throttle import LIMITER
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    full = 0
+    not_modified = 0
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            Handler.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        Handler.full += 1
+        body = self.path.encode("utf-8") * 100
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Test(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:{}".format(cls.server.server_port)
+        LIMITER.set_limit("127.0.0.1", 1000, 100)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        CLIENT.close()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        Handler.full = Handler.not_modified = 0
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_fresh_entry_is_served_from_disk(self):
+        cache = ResponseCache(self.tmpdir.name)
+        first = cache.get(self.url + "/anime/1", "page")
+        second = cache.get(self.url + "/anime/1", "page")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(Handler.full, 1)
+        self.assertEqual(cache.hits, 1)
+
+    def test_stale_entry_is_revalidated(self):
+        cache = ResponseCache(self.tmpdir.name, ttls={"stats": 0})
+        first = cache.get(self.url + "/anime/1/stats", "stats")
+        second = cache.get(self.url + "/anime/1/stats", "stats")
+        self.assertEqual(first.content, second.content)
+        self.assertEqual((Handler.full, Handler.not_modified), (1, 1))
+        self.assertEqual(cache.revalidated, 1)
+
+    def test_stats_expire_at_midnight(self):
+        cache = ResponseCache(self.tmpdir.name, ttls={"stats": 2 * DAY, "page": 2 * DAY})
+        for url, kind in ((self.url + "/anime/1/stats", "stats"), (self.url + "/anime/1", "page")):
+            cache.get(url, kind)
+            # Pretend it was stored in the last second of yesterday.
+            key = cache._key(url, None)
+            meta = cache._read_meta(key)
+            meta["stored"] = time.time() // DAY * DAY - 1
+            cache._write_meta(key, meta)
+            cache.get(url, kind)
+        self.assertEqual((cache.hits, cache.revalidated), (1, 1))
+        self.assertEqual(Handler.not_modified, 1)
+
+    def test_params_are_part_of_key(self):
+        cache = ResponseCache(self.tmpdir.name)
+        cache.get(self.url + "/search", "search", params={"q": "a"})
+        cache.get(self.url + "/search", "search", params={"q": "b"})
+        self.assertEqual(Handler.full, 2)
+
+    def test_cache_size_is_bounded(self):
+        cache = ResponseCache(self.tmpdir.name, max_bytes=5000)
+        for i in range(20):
+            cache.get(self.url + "/anime/{}".format(i), "page")
+        size = sum(os.path.getsize(os.path.join(self.tmpdir.name, name))
+                   for name in os.listdir(self.tmpdir.name) if name.endswith(".body"))
+        self.assertLessEqual(size, 5000)
+        self.assertGreater(size, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import os
+import tempfile
+
+from benchmarks.bench_import import SCENARIOS, FORBIDDEN, run_scenario
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        home = tempfile.TemporaryDirectory()
+        self.addCleanup(home.cleanup)
+        self.env = {name: value for name, value in os.environ.items()
+                    if not name.startswith("FALCHOOSER_")}
+        self.env["HOME"] = home.name
+
+    def test_lazy_imports(self):
+        for name in ("package", "read_titles", "cli --help"):
+            with self.subTest(name):
+                self.assertEqual(run_scenario(SCENARIOS[name], self.env), [])
+
+    def test_analysis_without_scraper(self):
+        modules = run_scenario(SCENARIOS["forecast"], self.env)
+        self.assertIn("sqlalchemy", FORBIDDEN["forecast"])
+        for module in FORBIDDEN["forecast"]:
+            self.assertNotIn(module, modules)
+
+    def test_import_without_config(self):
+        code = ("from falchooser.malscraper import scraper, dbaccess, helpers\n"
+                "from falchooser.malscraper.config import ConfigError\n"
+                "try:\n    scraper.USERNAME\nexcept ConfigError:\n    pass\n"
+                "else:\n    raise AssertionError\n")
+        self.assertIn("sqlalchemy", run_scenario(code, self.env))
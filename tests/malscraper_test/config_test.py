@@ -0,0 +1,57 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import os
+import tempfile
+from unittest import mock
+
+from falchooser.malscraper.config import Config, ConfigError
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "falchooser.ini")
+        with open(self.path, "w") as fd:
+            fd.write("[DEFAULT]\nUsername = file-user\nDBEngine = sqlite://\n")
+        patcher = mock.patch.dict(os.environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ("FALCHOOSER_USERNAME", "FALCHOOSER_PASSWORD", "FALCHOOSER_DBENGINE"):
+            os.environ.pop(name, None)
+
+    def test_precedence(self):
+        config = Config(self.path)
+        self.assertEqual(config.username, "file-user")
+        os.environ["FALCHOOSER_USERNAME"] = "env-user"
+        self.assertEqual(config.username, "env-user")
+        config.override(username="override-user")
+        self.assertEqual(config.username, "override-user")
+        config.override(username=None)
+        self.assertEqual(config.username, "env-user")
+
+    def test_missing(self):
+        config = Config(self.path)
+        self.assertIsNone(config.get("password"))
+        with self.assertRaises(ConfigError) as cm:
+            config.password
+        self.assertIsInstance(cm.exception, KeyError)
+        self.assertIn("FALCHOOSER_PASSWORD", str(cm.exception))
+        with self.assertRaises(TypeError):
+            config.override(port="80")
+
+    def test_lazy_file(self):
+        config = Config(os.path.join(os.path.dirname(self.path), "missing.ini"))
+        config.override(dbengine="sqlite://")
+        self.assertEqual(config.dbengine, "sqlite://")
+        self.assertIsNone(config._file)
+        with self.assertRaises(ConfigError):
+            config.username
+        os.rename(self.path, config.path)
+        self.assertRaises(ConfigError, lambda: config.username)
+        config.reload()
+        self.assertEqual(config.username, "file-user")
@@ -0,0 +1,98 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import threading
+from unittest import mock
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from falchooser.malscraper.connection import HttpClient, STATS, parse_retry_after
+from falchooser.malscraper.throttle import LIMITER
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    failures = 0
+    retry_after = "0"
+
+    def do_GET(self):
+        if self.path == "/flaky" and Handler.failures > 0:
+            Handler.failures -= 1
+            self.send_response(503)
+            self.send_header("Retry-After", Handler.retry_after)
+            body = b""
+        elif self.path == "/missing":
+            self.send_response(404)
+            body = b"not found"
+        else:
+            self.send_response(200)
+            body = b"ok"
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Test(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:{}".format(cls.server.server_port)
+        LIMITER.set_limit("127.0.0.1", 1000, 100)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        STATS.reset()
+        self.client = HttpClient(timeout=5, backoff=0.01)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_connection_is_reused(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get(self.url + "/").content, b"ok")
+        stats = STATS.snapshot()
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["connections"], 1)
+        self.assertEqual(stats["reused"], 4)
+
+    def test_retry_after_is_respected(self):
+        Handler.failures = 2
+        r = self.client.get(self.url + "/flaky")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(STATS.snapshot()["retries"], 2)
+
+    def test_retry_after_is_not_capped(self):
+        self.addCleanup(setattr, Handler, "retry_after", "0")
+        Handler.retry_after = "120"
+        Handler.failures = 1
+        self.client.configure(max_backoff=1.0)
+        with mock.patch("falchooser.malscraper.connection.sleep") as sleep:
+            self.assertEqual(self.client.get(self.url + "/flaky").status_code, 200)
+        sleep.assert_called_once_with(120.0)
+
+    def test_client_errors_are_not_retried(self):
+        with self.assertRaises(requests.HTTPError):
+            self.client.get(self.url + "/missing")
+        self.assertEqual(STATS.snapshot()["retries"], 0)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
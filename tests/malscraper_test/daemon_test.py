@@ -0,0 +1,60 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import datetime
+
+from falchooser.malscraper import cache
+from falchooser.malscraper.connection import CLIENT
+from falchooser.malscraper.daemon import ScrapeDaemon
+from falchooser.malscraper.dbaccess import Database, Anime, Statistics
+from falchooser.malscraper.days import collection_day
+from falchooser.malscraper.throttle import LIMITER
+from benchmarks.malserver import MalStandIn
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(cache.set_cache, cache.CACHE)
+        cache.set_cache(None)
+        LIMITER.set_limit("127.0.0.1", 1000, 100)
+        self.mal = MalStandIn()
+        self.mal.start()
+        self.addCleanup(self.mal.stop)
+        self.addCleanup(CLIENT.close)
+        self.db = Database("sqlite://")
+        self.db.create_tables()
+        self.db.upsert([Anime(id=i, title="Anime {}".format(i),
+                              url="{}/anime/{}/x".format(self.mal.url, i)) for i in (1, 2, 3)])
+
+    def test_run_once_only_fetches_missing(self):
+        daemon = ScrapeDaemon(self.db, workers=2, batch_size=2)
+        self.assertEqual(daemon.run_once(), 3)
+        self.assertEqual(self.mal.requests["stats"], 3)
+        self.assertEqual(daemon.run_once(), 0)
+        self.assertEqual(self.mal.requests["stats"], 3)
+
+    def test_missing_days(self):
+        today = collection_day()
+        accessed = datetime.datetime.now(datetime.timezone.utc)
+        self.db.upsert([Statistics(anime=1, day=day, accessed=accessed)
+                        for day in (today - 3, today - 1)])
+        daemon = ScrapeDaemon(self.db)
+        self.assertEqual(daemon.missing(today), [1, 2, 3])
+        self.assertEqual(daemon.missing(today - 1), [2, 3])
+        self.assertEqual(daemon.gaps(today), {1: 2})
+        self.assertEqual(daemon.gaps(today - 1, [1, 2]), {1: 1})
+        self.assertEqual(daemon.gaps(today - 3), {})
+
+    def test_seconds_until_next_run(self):
+        daemon = ScrapeDaemon(self.db, at=datetime.time(6, 0))
+        now = datetime.datetime(2017, 4, 2, 5, 0, tzinfo=datetime.timezone.utc)
+        self.assertEqual(daemon.seconds_until_next_run(now), 3600)
+        now = datetime.datetime(2017, 4, 2, 7, 0, tzinfo=datetime.timezone.utc)
+        self.assertEqual(daemon.seconds_until_next_run(now), 23 * 3600)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+
+from falchooser.malscraper.dbaccess import Anime, Statistics, _upsert_generic
+from .support import make_statistics, make_database
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_database(range(1, 4))
+
+    def watching(self):
+        session = self.db.get_session()
+        result = dict(session.query(Statistics.anime, Statistics.watching))
+        session.close()
+        return result
+
+    def test_upsert_inserts_rows(self):
+        count = self.db.upsert([make_statistics(i, 0, 10 * i) for i in range(1, 4)])
+        self.assertEqual(count, 3)
+        self.assertEqual(self.watching(), {1: 10, 2: 20, 3: 30})
+
+    def test_upsert_is_idempotent(self):
+        self.db.upsert([make_statistics(i, 0, 10 * i) for i in range(1, 4)])
+        self.db.upsert([make_statistics(i, 0, 11 * i) for i in range(1, 4)])
+        self.assertEqual(self.watching(), {1: 11, 2: 22, 3: 33})
+
+    def test_generic_backend_path(self):
+        rows = [{"id": 3, "title": "Renamed", "url": "https://myanimelist.net/anime/3/x"},
+                {"id": 4, "title": "New", "url": "https://myanimelist.net/anime/4/x"}]
+        with self.db.engine.begin() as conn:
+            self.assertEqual(_upsert_generic(conn, Anime.__table__, rows, True), 2)
+        session = self.db.get_session()
+        self.assertEqual(session.query(Anime.title).filter(Anime.id == 3).scalar(), "Renamed")
+        self.assertEqual(session.query(Anime).count(), 4)
+        session.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
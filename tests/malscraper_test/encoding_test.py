@@ -0,0 +1,175 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import datetime
+import random
+
+import numpy as np
+from sqlalchemy import select, func
+
+from falchooser.malscraper.dbaccess import Database, Anime, Statistics, StatisticsEncoded, \
+    METRICS
+from falchooser.malscraper.helpers import db_insert
+from falchooser.malscraper.daemon import ScrapeDaemon
+from falchooser.malscraper import aggregates, encoding, queries
+
+
+ACCESSED = datetime.datetime(2017, 4, 2, 1, 30)
+DAY = datetime.timedelta(days=1)
+
+
+def make_series(anime: int, days: int, seed: int):
+    """
+    Statistics which often stay the same, sometimes miss a day and
+    have unknown ranks for a while.
+    """
+    rng = random.Random(seed)
+    values = [7.5, 10, 100, 200, 1000, 5, 300, 0, 1, 2, 400]
+    series = []
+    for day in range(days):
+        if rng.random() < 0.3:
+            values[0] = round(values[0] + rng.choice((-0.01, 0.01)), 2)
+            values[4] += rng.randint(1, 50)
+            values[6] += rng.randint(-5, 5)
+        ranked = None if 20 <= day < 25 else values[2]
+        if rng.random() < 0.9:
+            series.append(Statistics(anime=anime, day=day, **dict(
+                zip(METRICS, values[:2] + [ranked] + values[3:])),
+                accessed=ACCESSED + day * DAY))
+    return series
+
+
+def copy(row: Statistics, **changes) -> Statistics:
+    values = {column.key: getattr(row, column.key) for column in row.__mapper__.columns}
+    values.update(changes)
+    return Statistics(**values)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.full = Database("sqlite://", storage="full")
+        self.delta = Database("sqlite://", storage="delta")
+        self.series = [make_series(anime, 80, anime) for anime in (1, 2, 3)]
+        for db in (self.full, self.delta):
+            db.create_tables()
+            db.upsert([Anime(id=i, title="Anime {}".format(i),
+                             url="https://myanimelist.net/anime/{}/x".format(i)) for i in (1, 2, 3)])
+
+    def insert_daily(self, db: Database, series=None):
+        series = series if series is not None else self.series
+        rows = sorted((row for rows in series for row in rows), key=lambda row: row.day)
+        for day in range(80):
+            db_insert([copy(row) for row in rows if row.day == day], True, db)
+
+    def assert_same(self):
+        self.assertEqual(queries.latest_day(self.delta), queries.latest_day(self.full))
+        for first_day, last_day in ((0, None), (30, 60), (79, 79)):
+            full = queries.load_statistics(first_day=first_day, last_day=last_day, db=self.full)
+            delta = queries.load_statistics(first_day=first_day, last_day=last_day, db=self.delta)
+            np.testing.assert_array_equal(delta.anime_ids, full.anime_ids)
+            np.testing.assert_array_equal(delta.days, full.days)
+            for metric in full.metrics:
+                np.testing.assert_array_equal(delta[metric], full[metric], metric)
+        with self.full.engine.connect() as conn:
+            rows = conn.execute(select(Statistics.anime, Statistics.day, *[
+                getattr(Statistics, m) for m in METRICS + ("accessed",)]).order_by(
+                Statistics.anime, Statistics.day)).all()
+        with self.delta.engine.connect() as conn:
+            decoded = list(encoding.read_statistics(conn, METRICS + ("accessed",)))
+        self.assertEqual(decoded, [tuple(row) for row in rows])
+
+    def count(self, db: Database, table) -> int:
+        with db.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(table)).scalar()
+
+    def test_same_values_fewer_rows(self):
+        for db in (self.full, self.delta):
+            self.insert_daily(db)
+        self.assert_same()
+        self.assertLess(self.count(self.delta, StatisticsEncoded),
+                        self.count(self.full, Statistics) * 0.6)
+        for metric in ("watching", "score", "ranked"):
+            self.assertEqual(aggregates.read_deltas(metric, db=self.delta),
+                             aggregates.read_deltas(metric, db=self.full))
+        for day in (40, 79, 80):
+            self.assertEqual(ScrapeDaemon(self.delta).missing(day, [1, 2, 3]),
+                             ScrapeDaemon(self.full).missing(day, [1, 2, 3]))
+        gaps = ScrapeDaemon(self.full).gaps(79, [1, 2, 3])
+        self.assertTrue(gaps)
+        self.assertEqual(ScrapeDaemon(self.delta).gaps(79, [1, 2, 3]), gaps)
+        self.assertEqual(ScrapeDaemon(self.delta).gaps(50, [1, 2, 3]),
+                         ScrapeDaemon(self.full).gaps(50, [1, 2, 3]))
+
+    def test_rewrites_and_compaction(self):
+        for db in (self.full, self.delta):
+            self.insert_daily(db)
+            # Rewrite a day, fill a gap long ago and change the latest day.
+            db.upsert([copy(self.series[0][40], members=1),
+                       copy(self.series[1][3], day=100, accessed=ACCESSED + 100 * DAY),
+                       copy(self.series[2][-1], watching=0)])
+            db.upsert([copy(self.series[0][5], day=day, accessed=ACCESSED + day * DAY)
+                       for day in range(0, 80, 9)])
+        self.assert_same()
+        before, after = encoding.compact(self.delta)
+        self.assertLessEqual(after, before)
+        self.assertEqual(self.count(self.delta, StatisticsEncoded), after)
+        self.assert_same()
+        dense = self.keyframes()
+        encoding.compact(self.delta, before_day=60)
+        sparse = self.keyframes()
+        # First day and reappearing ranks (day 25) of each anime.
+        self.assertEqual(len([day for _, day in sparse if day < 60]), 6)
+        self.assertGreater(len([day for _, day in dense if day < 60]), 6)
+        with self.delta.engine.connect() as conn:
+            distance = conn.execute(select(func.max(
+                StatisticsEncoded.day - StatisticsEncoded.keyframe)).where(
+                StatisticsEncoded.day >= 60)).scalar()
+        self.assertLess(distance, encoding.KEYFRAME_INTERVAL)
+        self.assert_same()
+
+    def keyframes(self):
+        with self.delta.engine.connect() as conn:
+            return conn.execute(select(StatisticsEncoded.anime, StatisticsEncoded.day).where(
+                StatisticsEncoded.day == StatisticsEncoded.keyframe).order_by(
+                StatisticsEncoded.anime, StatisticsEncoded.day)).all()
+
+    def test_keyframes(self):
+        # Nothing changes for 100 days: one row per keyframe interval.
+        rows = [Statistics(anime=1, day=day, accessed=ACCESSED + day * DAY,
+                           **dict.fromkeys(METRICS, 1))
+                for day in range(100)]
+        self.delta.upsert(rows[:50])
+        self.delta.upsert(rows[50:])
+        with self.delta.engine.connect() as conn:
+            stored = conn.execute(select(StatisticsEncoded.day, StatisticsEncoded.until,
+                                         StatisticsEncoded.keyframe)).all()
+            self.assertEqual(len(list(encoding.read_statistics(conn, first_day=60))), 40)
+        interval = encoding.KEYFRAME_INTERVAL
+        self.assertEqual([tuple(row) for row in stored],
+                         [(day, min(day + interval, 100) - 1, day)
+                          for day in range(0, 100, interval)])
+
+    def test_accessed_without_loss(self):
+        # Pages are fetched at a different time of day now and then.
+        rng = random.Random(0)
+        series = [[copy(row, accessed=row.accessed + datetime.timedelta(
+                        minutes=rng.choice((0, 0, 0, 7, -3))))
+                   for row in rows] for rows in self.series]
+        for db in (self.full, self.delta):
+            self.insert_daily(db, series)
+        self.assert_same()
+        encoding.compact(self.delta, before_day=60)
+        self.assert_same()
+        # Days accessed one day apart with unchanged values still share a run.
+        self.assertLess(self.count(self.delta, StatisticsEncoded),
+                        self.count(self.full, Statistics))
+
+    def test_import_statistics(self):
+        self.insert_daily(self.full)
+        self.delta = Database("sqlite://", storage="delta")
+        self.delta.engine = self.full.engine
+        self.assertEqual(encoding.import_statistics(self.delta), self.count(self.full, Statistics))
+        self.assert_same()
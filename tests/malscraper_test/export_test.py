@@ -0,0 +1,77 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import os
+import tempfile
+
+import pyarrow.dataset as ds
+
+from falchooser.malscraper.dbaccess import Season, season_id
+from falchooser.malscraper.export import export_parquet, open_dataset, day_season
+from .support import make_growing, make_anime, make_database
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.db = make_database((5, 7))
+        self.db.upsert([make_growing(5, day, 100 + day) for day in (0, 1, 90)] +
+                       [make_growing(7, 1, 200)])
+
+    def test_day_season(self):
+        self.assertEqual(day_season(0), "2017-2")
+        self.assertEqual(day_season(90), "2017-3")
+
+    def test_export(self):
+        self.assertEqual(export_parquet(self.directory, self.db), [0, 1, 90])
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "season=2017-3", "day=90",
+                                                    "part-0.parquet")))
+        table = open_dataset(self.directory).to_table(
+            columns=["anime", "title", "watching"], filter=ds.field("day") == 1).to_pydict()
+        self.assertEqual(table, {"anime": [5, 7], "title": ["Anime 5", "Anime 7"],
+                                 "watching": [101, 200]})
+
+    def test_season_of_anime(self):
+        self.db.upsert([Season(id=season_id(2017, 2), year=2017, quarter=2)])
+        export_parquet(self.directory, self.db)
+        # Anime 5 continues into the next season but stays in its own.
+        self.db.upsert([make_anime(5, season_id=season_id(2017, 2))])
+        self.assertEqual(export_parquet(self.directory, self.db, full=True), [0, 1, 90])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "season=2017-3", "day=90")))
+        table = open_dataset(self.directory).to_table(
+            filter=ds.field("season") == "2017-2").to_pydict()
+        self.assertEqual(list(zip(table["day"], table["anime"])), [(0, 5), (1, 5), (1, 7), (90, 5)])
+        self.assertEqual(open_dataset(self.directory).count_rows(), 4)
+
+    def test_delta_storage(self):
+        db = make_database(storage="delta")
+        db.upsert([Season(id=season_id(2017, 2), year=2017, quarter=2)])
+        db.upsert([make_anime(5, season_id=season_id(2017, 2)), make_anime(7)])
+        db.upsert([make_growing(5, day, 100 + day) for day in (0, 1, 90)] +
+                  [make_growing(7, 1, 200)])
+        self.assertEqual(export_parquet(self.directory, db), [0, 1, 90])
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["_export_state.json", "season=2017-2"])
+        table = open_dataset(self.directory).to_table(columns=["day", "anime", "watching"])
+        self.assertEqual(table.sort_by([("day", "ascending"), ("anime", "ascending")]).to_pydict(),
+                         {"day": [0, 1, 1, 90], "anime": [5, 5, 7, 5],
+                          "watching": [100, 101, 200, 190]})
+
+    def test_incremental(self):
+        export_parquet(self.directory, self.db)
+        self.db.upsert([make_growing(7, 90, 290), make_growing(7, 91, 291)])
+        self.assertEqual(export_parquet(self.directory, self.db), [90, 91])
+        self.assertEqual(export_parquet(self.directory, self.db, overlap=0), [])
+        table = open_dataset(self.directory).to_table(
+            filter=ds.field("season") == "2017-3").to_pydict()
+        self.assertEqual(list(zip(table["day"], table["anime"])), [(90, 5), (90, 7), (91, 7)])
+        self.assertEqual(open_dataset(self.directory).count_rows(), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+
+import numpy as np
+
+from falchooser.malscraper.forecast import Forecaster, season_end
+from falchooser.malscraper.queries import StatisticsArrays
+
+
+def make_arrays(anime_ids, days, rng):
+    t = np.arange(len(days), dtype=float)
+    members = np.array([[1000 * a + 500 * np.log1p(x) for x in t] for a in anime_ids])
+    members += rng.normal(0, 5, size=members.shape)
+    score = np.full(members.shape, 7.5) + rng.normal(0, 0.01, size=members.shape)
+    return StatisticsArrays(np.asarray(anime_ids), np.asarray(days),
+                            {"members": members, "score": score})
+
+
+def subset(arrays, days):
+    index = np.isin(arrays.days, days)
+    return StatisticsArrays(arrays.anime_ids, arrays.days[index],
+                            {name: values[:, index] for name, values in arrays.metrics.items()})
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        self.models = {"members": "log", "score": "constant"}
+
+    def test_season_end(self):
+        self.assertEqual(season_end(2017, 2), 89)
+        self.assertEqual(season_end(2017, 4), 273)
+
+    def test_batch_fit(self):
+        arrays = make_arrays([1, 2, 3], range(30), self.rng)
+        forecaster = Forecaster(self.models)
+        forecaster.update(arrays)
+        forecast = forecaster.predict(89, level=0.95)
+        truth = np.array([1000 * a + 500 * np.log1p(89) for a in (1, 2, 3)])
+        np.testing.assert_allclose(forecast.mean["members"], truth, rtol=0.01)
+        self.assertTrue(np.all(forecast.lower["members"] < truth))
+        self.assertTrue(np.all(forecast.upper["members"] > truth))
+        np.testing.assert_allclose(forecast.mean["score"], 7.5, atol=0.01)
+
+    def test_incremental_equals_batch(self):
+        arrays = make_arrays([1, 2], range(10), self.rng)
+        batch = Forecaster(self.models)
+        batch.update(arrays)
+        incremental = Forecaster(self.models)
+        incremental.update(subset(arrays, range(5)))
+        for day in range(5, 10):
+            incremental.update(subset(arrays, [day]))
+        for a, b in zip(batch.predict(40), incremental.predict(40)):
+            if isinstance(a, dict):
+                for metric in a:
+                    np.testing.assert_allclose(a[metric], b[metric])
+        with self.assertRaises(AssertionError):
+            incremental.update(subset(arrays, [9]))
+
+    def test_new_anime(self):
+        forecaster = Forecaster(self.models)
+        forecaster.update(make_arrays([5], range(10), self.rng))
+        late = make_arrays([2, 5], range(10, 11), self.rng)
+        late.metrics["members"][:] = [[2000], [np.nan]]
+        forecaster.update(late)
+        np.testing.assert_array_equal(forecaster.anime_ids, [2, 5])
+        forecast = forecaster.predict(20)
+        # One day is not enough for a band, but gives a level.
+        self.assertAlmostEqual(forecast.mean["members"][0], 2000, places=3)
+        self.assertTrue(np.isnan(forecast.lower["members"][0]))
+        self.assertFalse(np.isnan(forecast.lower["members"][1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import os
+import tempfile
+from unittest import mock
+
+from falchooser.malscraper import cache
+from falchooser.malscraper.connection import CLIENT
+from falchooser.malscraper.dbaccess import Database, Anime, Season, Statistics, User, \
+    user_anime_team
+from falchooser.malscraper.helpers import insert_teamlist, chunked, scrape, db_insert, \
+    create_stats_object, insert_statistics_batch, read_url_files, insert_anime
+from falchooser.malscraper.throttle import LIMITER
+from benchmarks.malserver import MalStandIn
+
+
+TEAMLIST = """Team List for Spring 2017
+{users}
+"""
+
+TEAM = """{name}
+----------
+Alice to Zouroku
+Re:Creators
+Sakura Quest
+Tsuki ga Kirei
+Uchouten Kazoku 2
+
+Atom: The Beginning
+{bench}
+"""
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Database("sqlite://")
+        self.db.create_tables()
+        titles = ["Alice to Zouroku", "Re:Creators", "Sakura Quest", "Tsuki ga Kirei",
+                  "Uchouten Kazoku 2", "Atom: The Beginning", "Sagrada Reset"]
+        self.db.upsert([Anime(id=i, title=title, url="https://myanimelist.net/anime/{}/x".format(i))
+                        for i, title in enumerate(titles, 1)])
+        users = "\n".join(TEAM.format(name="user{}".format(i),
+                                      bench="Sagrada Reset" if i % 2 else "Unknown Title")
+                          for i in range(7))
+        fd, self.path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, "w") as f:
+            f.write(TEAMLIST.format(users=users))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def count(self, table):
+        with self.db.engine.connect() as conn:
+            return len(conn.execute(table.select()).all())
+
+    def test_chunked(self):
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_insert_teamlist_reports_unresolved_titles(self):
+        unresolved = insert_teamlist(self.path, self.db, chunk_size=3)
+        self.assertEqual(sorted(unresolved), ["user0", "user2", "user4", "user6"])
+        self.assertEqual(unresolved["user0"], ["Unknown Title"])
+        self.assertEqual(self.count(User.__table__), 7)
+        self.assertEqual(self.count(user_anime_team), 3 * 7 + 4 * 6)
+
+    def test_insert_teamlist_twice(self):
+        insert_teamlist(self.path, self.db, chunk_size=2)
+        insert_teamlist(self.path, self.db, chunk_size=5)
+        self.assertEqual(self.count(User.__table__), 7)
+        self.assertEqual(self.count(user_anime_team), 3 * 7 + 4 * 6)
+
+    def test_scrape_statistics_from_stand_in(self):
+        self.addCleanup(cache.set_cache, cache.CACHE)
+        self.addCleanup(CLIENT.configure, backoff=CLIENT.backoff)
+        cache.set_cache(None)
+        LIMITER.set_limit("127.0.0.1", 1000, 100)
+        CLIENT.configure(backoff=0.001)
+        with MalStandIn(rate_429=0.2, seed=1) as mal:
+            urls = ["{}/anime/{}/x".format(mal.url, id) for id in (1, 2, 3)]
+            serial = scrape(urls, create_stats_object, 1)
+            concurrent = scrape(urls, create_stats_object, 3)
+            self.assertGreater(mal.requests["429"], 0)
+        self.assertEqual([(s.anime, s.watching) for s in serial],
+                         [(1, 51873), (2, 0), (3, 28124)])
+        self.assertEqual([(s.anime, s.watching) for s in serial],
+                         [(s.anime, s.watching) for s in concurrent])
+        db_insert(concurrent, True, self.db)
+        session = self.db.get_session()
+        self.assertEqual(session.query(Statistics).count(), 3)
+        session.close()
+
+    def write_url_file(self, urls):
+        fd, path = tempfile.mkstemp(suffix="-urls.txt")
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(urls) + "\n")
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_read_url_files_deduplicates(self):
+        first = self.write_url_file(["https://myanimelist.net/anime/1/a",
+                                     "https://myanimelist.net/anime/2/b"])
+        second = self.write_url_file(["https://myanimelist.net/anime/2/b",
+                                      "https://myanimelist.net/anime/3/c"])
+        self.assertEqual(read_url_files([first, second]),
+                         ["https://myanimelist.net/anime/{}/{}".format(i, c)
+                          for i, c in ((1, "a"), (2, "b"), (3, "c"))])
+
+    def test_insert_statistics_batch_scrapes_each_anime_once(self):
+        self.addCleanup(cache.set_cache, cache.CACHE)
+        cache.set_cache(None)
+        LIMITER.set_limit("127.0.0.1", 1000, 100)
+        with MalStandIn() as mal:
+            first = self.write_url_file(["{}/anime/{}/x".format(mal.url, i) for i in (1, 2, 3)])
+            second = self.write_url_file(["{}/anime/{}/x".format(mal.url, i) for i in (3, 4)])
+            self.assertEqual(insert_statistics_batch([first, second], True, 2, self.db), 4)
+            self.assertEqual(mal.requests["stats"], 4)
+
+    def test_insert_anime_needs_confirmation(self):
+        self.addCleanup(cache.set_cache, cache.CACHE)
+        cache.set_cache(None)
+        LIMITER.set_limit("127.0.0.1", 1000, 100)
+        with MalStandIn() as mal:
+            urls = ["{}/anime/{}/x".format(mal.url, i) for i in (8, 9)]
+            with mock.patch("falchooser.malscraper.helpers.read_titles", return_value=urls), \
+                    mock.patch("builtins.input", return_value="n"), mock.patch("builtins.print"):
+                insert_anime(2017, 2, db=self.db)
+            self.assertEqual(self.count(Season.__table__), 0)
+            self.assertEqual(self.count(Anime.__table__), 7)
+            with mock.patch("falchooser.malscraper.helpers.read_titles", return_value=urls):
+                insert_anime(2017, 2, y=True, db=self.db)
+        self.assertEqual(self.count(Season.__table__), 1)
+        self.assertEqual(self.count(Anime.__table__), 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import json
+import os
+import pstats
+import tempfile
+
+from falchooser.malscraper import cache
+from falchooser.malscraper.connection import CLIENT
+from falchooser.malscraper.dbaccess import Database
+from falchooser.malscraper.helpers import scrape, db_insert, create_stats_object
+from falchooser.malscraper.instrumentation import Recorder, RECORDER, profiled
+from falchooser.malscraper.throttle import LIMITER
+from benchmarks.malserver import MalStandIn
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_recorder(self):
+        recorder = Recorder()
+        recorder.count("http_bytes", 100)
+        recorder.count("http_bytes", 50)
+        recorder.add_time("parse", 0.5, anime=7)
+        with self.assertRaises(ValueError), recorder.timer("parse", anime=7):
+            raise ValueError()
+        snapshot = recorder.snapshot()
+        self.assertEqual(snapshot["counters"], {"http_bytes": 150})
+        self.assertEqual(snapshot["phases"]["parse"]["calls"], 2)
+        self.assertGreaterEqual(snapshot["anime"]["7"]["parse"], 0.5)
+        text = recorder.to_prometheus()
+        self.assertIn('falchooser_phase_calls_total{phase="parse"} 2.0\n', text)
+        self.assertIn("# TYPE falchooser_http_bytes_total counter\nfalchooser_http_bytes_total 150.0\n",
+                      text)
+        path = os.path.join(self.directory, "metrics.json")
+        recorder.write(path)
+        with open(path) as fd:
+            self.assertEqual(json.load(fd)["counters"], {"http_bytes": 150})
+        with open(os.path.join(self.directory, "metrics.prom")) as fd:
+            self.assertEqual(fd.read().count("# TYPE"), 5)
+
+    def test_profiled(self):
+        path = os.path.join(self.directory, "run.prof")
+        self.assertEqual(profiled(sorted, path, [3, 1, 2]), [1, 2, 3])
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+        self.assertEqual(profiled(sorted, None, [2, 1]), [1, 2])
+
+    def test_scrape_is_instrumented(self):
+        self.addCleanup(cache.set_cache, cache.CACHE)
+        cache.set_cache(None)
+        self.addCleanup(CLIENT.close)
+        LIMITER.set_limit("127.0.0.1", 1000, 100)
+        db = Database("sqlite://")
+        db.create_tables()
+        RECORDER.reset()
+        with MalStandIn() as mal:
+            rows = scrape(["{}/anime/{}/x".format(mal.url, id) for id in (1, 2)], create_stats_object)
+        db_insert(rows, True, db)
+        snapshot = RECORDER.snapshot()
+        for phase in ("http", "fetch", "parse", "scrape", "db"):
+            self.assertIn(phase, snapshot["phases"])
+        self.assertEqual(snapshot["counters"]["rows_written"], 2)
+        self.assertEqual(snapshot["counters"]["http_requests"], 2)
+        self.assertGreater(snapshot["counters"]["http_bytes"], 10000)
+        self.assertEqual(sorted(snapshot["anime"]), ["1", "2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+
+from sqlalchemy import inspect, text
+
+from falchooser.malscraper.dbaccess import Database
+from falchooser.malscraper.days import season_days
+from falchooser.malscraper import migrations, queries
+
+
+# Schema before seasons and the day index.
+OLD_SCHEMA = (
+    "CREATE TABLE anime (id INTEGER PRIMARY KEY, title VARCHAR(1024) NOT NULL, "
+    "url VARCHAR(2048) NOT NULL UNIQUE)",
+    "CREATE TABLE statistics (anime INTEGER REFERENCES anime(id), day INTEGER, score FLOAT, "
+    "users INTEGER, ranked INTEGER, popularity INTEGER, members INTEGER, favorites INTEGER, "
+    "watching INTEGER, completed INTEGER, onhold INTEGER, dropped INTEGER, "
+    "plantowatch INTEGER, accessed DATETIME NOT NULL, PRIMARY KEY (anime, day))",
+)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Database("sqlite://")
+        with self.db.engine.begin() as conn:
+            for statement in OLD_SCHEMA:
+                conn.execute(text(statement))
+            # Listed in 2017-2-urls.txt, 2017-2-ignore-urls.txt and nowhere.
+            for id in (34350, 34055, 1):
+                conn.execute(text("INSERT INTO anime VALUES (:id, 'x', :url)"),
+                             {"id": id, "url": "https://myanimelist.net/anime/{}/x".format(id)})
+
+    def test_migrate(self):
+        migrations.migrate(self.db)
+        inspector = inspect(self.db.engine)
+        self.assertIn("season_id", {column["name"] for column in inspector.get_columns("anime")})
+        self.assertIn("ix_statistics_day_anime",
+                      {index["name"] for index in inspector.get_indexes("statistics")})
+        self.assertIn("season", inspector.get_table_names())
+        self.assertEqual(queries.season_anime_ids(2017, 2, db=self.db), [34055, 34350])
+        self.assertEqual(queries.season_anime_ids(2017, 2, False, self.db), [34350])
+        # Running it again changes nothing.
+        migrations.migrate(self.db)
+        self.assertEqual(queries.season_anime_ids(2017, 2, True, self.db), [34055])
+        with self.db.engine.connect() as conn:
+            plan = " ".join(str(row) for row in conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT max(day) FROM statistics")))
+        self.assertIn("ix_statistics_day_anime", plan)
+
+    def test_season_fallback(self):
+        # Seasons unknown to the database are read from the titles folder.
+        db = Database("sqlite://")
+        db.create_tables()
+        self.assertEqual(queries.season_anime_ids(2017, 2, False, db),
+                         queries.season_anime_ids(2017, 2, False))
+
+    def test_partition_ranges(self):
+        ranges = migrations.partition_ranges(0, 100)
+        self.assertEqual([name for name, _, _ in ranges], ["2017_2", "2017_3"])
+        self.assertEqual(ranges[0][1:], season_days(2017, 2))
+        self.assertEqual(ranges[1][1], ranges[0][2])
+        self.assertEqual(migrations.partition_ranges(10, 200, "days", 92),
+                         [("d0", 0, 92), ("d92", 92, 184), ("d184", 184, 276)])
+        self.assertEqual(migrations.partition_statements([("d0", 0, 92)])[0],
+                         "CREATE TABLE statistics_d0 PARTITION OF statistics "
+                         "FOR VALUES FROM (0) TO (92)")
+
+    def test_partition_needs_postgresql(self):
+        migrations.migrate(self.db)
+        with self.db.engine.begin() as conn:
+            self.assertRaises(ValueError, migrations.partition_statistics, conn)
+            self.assertEqual(migrations.ensure_partitions(conn), [])
@@ -0,0 +1,114 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import itertools
+
+import numpy as np
+
+from falchooser.malscraper.optimizer import TeamOptimizer, choose_team, score_teams, \
+    project_points, sample_points
+from falchooser.malscraper.queries import StatisticsArrays
+
+
+def brute_force(points, k, quantile=None, required=(), groups=None, limits=None):
+    n = points.shape[1]
+    teams = []
+    for active in itertools.combinations(range(n), 5):
+        rest = [i for i in range(n) if i not in active]
+        for bench in itertools.combinations(rest, 2):
+            team = set(active + bench)
+            if not set(required) <= team:
+                continue
+            if limits and any(sum(1 for i in team if groups.get(i) == group) > limit
+                              for group, limit in limits.items()):
+                continue
+            score = score_teams(points, np.array([active]), np.array([bench]), quantile=quantile)[0]
+            teams.append(score)
+    return sorted(teams, reverse=True)[:k]
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(1)
+        self.points = self.rng.normal(100, 30, size=(40, 10))
+        self.ids = list(range(10))
+
+    def test_best_teams_match_brute_force(self):
+        for quantile in (None, 0.2):
+            teams = choose_team(self.ids, self.points, k=5, quantile=quantile)
+            np.testing.assert_allclose([team.score for team in teams],
+                                       brute_force(self.points, 5, quantile))
+            self.assertEqual(len({(team.active, team.bench) for team in teams}), 5)
+
+    def test_constraints(self):
+        groups = {i: i % 3 for i in self.ids}
+        limits = {0: 1, 1: 2}
+        teams = choose_team(self.ids, self.points, k=3, required=[9], excluded=[0],
+                            groups=groups, limits=limits)
+        for team in teams:
+            members = team.active + team.bench
+            self.assertIn(9, members)
+            self.assertNotIn(0, members)
+            self.assertLessEqual(sum(1 for i in members if groups[i] == 0), 1)
+            self.assertLessEqual(sum(1 for i in members if groups[i] == 1), 2)
+        points = self.points.copy()
+        points[:, 0] = -1e6  # Never worth choosing, like an excluded anime.
+        np.testing.assert_allclose([team.score for team in teams],
+                                   brute_force(points, 3, required=[9], groups=groups,
+                                               limits=limits))
+
+    def test_required_ranks_last(self):
+        points = np.arange(20, 0, -1.0)
+        team, = choose_team(list(range(20)), points, required=[19])
+        self.assertIn(19, team.active + team.bench)
+        self.assertEqual(team.bench, (5, 19))
+        rng = np.random.default_rng(2)
+        for _ in range(20):
+            points = rng.normal(100, 30, size=(5, 10))
+            required = rng.choice(10, size=2, replace=False).tolist()
+            groups = {i: i % 3 for i in self.ids}
+            limits = {0: 2}
+            teams = choose_team(self.ids, points, k=3, required=required, groups=groups,
+                                limits=limits)
+            for team in teams:
+                self.assertTrue(set(required) <= set(team.active + team.bench))
+            np.testing.assert_allclose([team.score for team in teams],
+                                       brute_force(points, 3, required=required, groups=groups,
+                                                   limits=limits))
+
+    def test_equal_points(self):
+        teams = choose_team(list(range(60)), np.full(60, 10.0), k=3)
+        self.assertEqual(len(teams), 3)
+        for team in teams:
+            self.assertAlmostEqual(team.score, 50 + 0.1 * 20)
+
+    def test_single_expectation(self):
+        points = np.arange(10, dtype=float)
+        team, = TeamOptimizer(self.ids, points).best()
+        self.assertEqual(team.active, (9, 8, 7, 6, 5))
+        self.assertEqual(team.bench, (4, 3))
+        self.assertAlmostEqual(team.score, 35 + 0.1 * 7)
+
+    def test_large_season(self):
+        points = self.rng.gamma(2, 1000, size=80)[None, :] * self.rng.lognormal(0, 0.3, size=(500, 80))
+        teams = choose_team(list(range(80)), points, k=10, quantile=0.1)
+        self.assertEqual(len(teams), 10)
+        self.assertTrue(all(a.score >= b.score for a, b in zip(teams, teams[1:])))
+
+    def test_projections(self):
+        days = np.arange(5)
+        values = np.array([[10., 12, 14, 16, 18], [5, 5, 5, np.nan, 5]])
+        arrays = StatisticsArrays(np.array([1, 2]), days, {"watching_completed": values})
+        weights = {"watching_completed": 1.0}
+        np.testing.assert_allclose(project_points(arrays, horizon=2, window=4, weights=weights),
+                                   [22, 5])
+        scenarios = sample_points(arrays, n=20, horizon=3, window=2, weights=weights, seed=0)
+        self.assertEqual(scenarios.shape, (20, 2))
+        np.testing.assert_allclose(scenarios[:, 0], 24)
+
+
+if __name__ == "__main__":
+    unittest.main()
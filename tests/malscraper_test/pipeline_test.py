@@ -0,0 +1,93 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+
+from falchooser.malscraper import cache
+from falchooser.malscraper.connection import CLIENT
+from falchooser.malscraper.helpers import create_stats_object, create_anime_object
+from falchooser.malscraper.instrumentation import RECORDER
+from falchooser.malscraper.pipeline import stream
+from falchooser.malscraper.throttle import LIMITER
+from benchmarks.malserver import MalStandIn
+
+
+class Test(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.stand_in = MalStandIn()
+        cls.stand_in.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stand_in.stop()
+        CLIENT.close()
+
+    def setUp(self):
+        self.addCleanup(cache.set_cache, cache.CACHE)
+        cache.set_cache(None)
+        self.addCleanup(CLIENT.configure, max_retries=CLIENT.max_retries)
+        CLIENT.configure(max_retries=0)
+        LIMITER.set_limit("127.0.0.1", 1000, 100)
+        self.batches = []
+
+    def urls(self, ids):
+        return ["{}/anime/{}/x".format(self.stand_in.url, id) for id in ids]
+
+    def write(self, rows):
+        self.batches.append(rows)
+        return len(rows)
+
+    def test_stream_statistics(self):
+        for processes in (0, 2):
+            self.batches = []
+            RECORDER.reset()
+            result = stream(self.urls(range(1, 8)), "stats", create_stats_object, self.write,
+                            workers=3, processes=processes, batch_size=3)
+            self.assertEqual(result.written, 7)
+            self.assertEqual(result.failed, dict())
+            self.assertEqual([len(batch) for batch in self.batches], [3, 3, 1])
+            rows = sorted((row for batch in self.batches for row in batch), key=lambda r: r.anime)
+            self.assertEqual([(row.anime, row.watching) for row in rows[:3]],
+                             [(1, 51873), (2, 0), (3, 28124)])
+            # Parsing is timed per anime in the process pool, too.
+            snapshot = RECORDER.snapshot()
+            self.assertEqual(snapshot["phases"]["parse"]["calls"], 7)
+            self.assertTrue(all("parse" in phases for phases in snapshot["anime"].values()))
+
+    def test_stream_anime(self):
+        result = stream(self.urls([5]), "page", create_anime_object, self.write)
+        self.assertEqual(result.written, 1)
+        self.assertEqual(self.batches[0][0].title, "Kemono Friends")
+
+    def test_failures_are_isolated(self):
+        urls = self.urls(range(1, 5)) + ["{}/not/an/anime/9/".format(self.stand_in.url)]
+
+        def write(rows):
+            if any(row.anime == 2 for row in rows):
+                raise RuntimeError("database is gone")
+            return self.write(rows)
+
+        result = stream(urls, "stats", create_stats_object, write, batch_size=2)
+        self.assertEqual(result.written, 2)
+        self.assertEqual(sorted(result.failed), sorted([urls[0], urls[1], urls[4]]))
+
+    def test_backpressure(self):
+        requests_at_first_write = []
+
+        def write(rows):
+            requests_at_first_write.append(self.stand_in.requests["stats"])
+            return len(rows)
+
+        before = self.stand_in.requests["stats"]
+        stream(self.urls(range(1, 41)), "stats", create_stats_object, write,
+               batch_size=2, queue_size=2)
+        # The first batch is committed long before everything is fetched.
+        self.assertLess(requests_at_first_write[0] - before, 20)
+        self.assertEqual(len(requests_at_first_write), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
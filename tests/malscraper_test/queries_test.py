@@ -0,0 +1,55 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+
+import numpy as np
+
+from falchooser.malscraper import queries
+from .support import make_growing, make_database
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_database((5, 7, 9))
+        rows = [make_growing(5, day, 100 + day) for day in range(5)]
+        rows += [make_growing(7, day, 200 + day, score=None) for day in (0, 1, 3)]
+        rows += [make_growing(9, day, 300 + day) for day in (2, 3, 4)]
+        self.db.upsert(rows)
+
+    def test_latest_day(self):
+        self.assertEqual(queries.latest_day(self.db), 4)
+
+    def test_load_statistics_dense(self):
+        stats = queries.load_statistics(db=self.db)
+        np.testing.assert_array_equal(stats.anime_ids, [5, 7, 9])
+        np.testing.assert_array_equal(stats.days, np.arange(5))
+        np.testing.assert_array_equal(stats["watching"][0], [100, 101, 102, 103, 104])
+        np.testing.assert_array_equal(stats["watching"][1], [200, 201, np.nan, 203, np.nan])
+        self.assertTrue(np.isnan(stats["score"][1]).all())
+        np.testing.assert_array_equal(stats["watching_completed"][2, 2:], [302 + 2, 303 + 3, 304 + 4])
+        np.testing.assert_array_equal(stats["dropped_onhold"][0], [3] * 5)
+
+    def test_load_statistics_range_and_ffill(self):
+        stats = queries.load_statistics([7, 9], first_day=1, last_day=4, metrics=("watching",),
+                                        fill="ffill", db=self.db)
+        self.assertEqual(stats["watching"].shape, (2, 4))
+        np.testing.assert_array_equal(stats["watching"][stats.row(7)], [201, 201, 203, 203])
+        np.testing.assert_array_equal(stats["watching"][stats.row(9)], [np.nan, 302, 303, 304])
+        self.assertNotIn("score", stats)
+
+    def test_to_frame(self):
+        frame = queries.load_statistics(metrics=("members",), db=self.db).to_frame()
+        self.assertEqual(frame.loc[(9, 3), "members"], 1003)
+        self.assertEqual(len(frame), 15)
+
+    def test_season_anime_ids(self):
+        ids = queries.season_anime_ids(2017, 2)
+        self.assertEqual(len(ids), 17 + 27)
+        self.assertIn(34561, ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
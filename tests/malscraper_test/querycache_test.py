@@ -0,0 +1,71 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+
+from sqlalchemy import inspect
+
+from falchooser.malscraper.dbaccess import DataVersion, read_data_version
+from falchooser.malscraper.helpers import db_insert
+from falchooser.malscraper.querycache import QueryCache
+from .support import make_anime, make_statistics, make_database
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_database((1, 2))
+        self.db.upsert([make_statistics(1, day, 100 + day) for day in range(3)])
+        self.cache = QueryCache(self.db, max_entries=2)
+
+    def test_version_is_bumped_by_writes(self):
+        with self.db.engine.connect() as conn:
+            before = read_data_version(conn)
+        db_insert([make_statistics(2, 0, 5)], True, self.db)
+        with self.db.engine.connect() as conn:
+            self.assertEqual(read_data_version(conn), before + 2)
+
+    def test_hits_and_invalidation(self):
+        self.assertEqual(self.cache.latest_day(), 2)
+        self.assertEqual(self.cache.latest_day(), 2)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        series = self.cache.series(1, metrics=("watching",))
+        self.assertIs(self.cache.series(1, metrics=("watching",)), series)
+        self.assertEqual(series["watching"].tolist(), [[100, 101, 102]])
+        with self.assertRaises(ValueError):
+            series["watching"][0, 0] = 0
+        db_insert([make_statistics(1, 3, 103)], True, self.db)
+        self.assertEqual(self.cache.latest_day(), 3)
+        self.assertEqual(self.cache.series(1, metrics=("watching",))["watching"].tolist(),
+                         [[100, 101, 102, 103]])
+
+    def test_lru_bound(self):
+        for anime in (1, 2, 1, 2):
+            self.cache.series(anime, metrics=("watching",))
+        self.cache.latest_day()
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.hits, 2)
+        self.cache.series(1, metrics=("watching",))
+        self.assertEqual(self.cache.misses, 4)
+
+    def test_check_interval(self):
+        cache = QueryCache(self.db, check_interval=3600)
+        self.assertEqual(cache.latest_day(), 2)
+        self.db.upsert([make_statistics(1, 3, 103)])
+        self.assertEqual(cache.latest_day(), 2)
+        cache.clear()
+        self.assertEqual(cache.latest_day(), 3)
+
+    def test_without_version_table(self):
+        db = make_database()
+        DataVersion.__table__.drop(db.engine)
+        cache = QueryCache(db)
+        self.assertIsNone(cache.latest_day())
+        self.assertFalse(inspect(db.engine).has_table(DataVersion.__tablename__))
+        db.upsert([make_anime(1), make_statistics(1, 0)])
+        self.assertEqual(cache.latest_day(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,11 +3,21 @@ Created on Mar 31, 2017
 """
 
 import unittest
+import os
 from numbers import Number
+import lxml.html
 import falchooser.malscraper.scraper as scraper
 from falchooser.malscraper.scraper import MalEntry
 
 
+FIXTURES = os.path.join(os.path.dirname(os.path.realpath(__file__)), "fixtures")
+
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), "rb") as fd:
+        return fd.read()
+
+
 class Test(unittest.TestCase):
 
 
@@ -42,6 +52,28 @@ class Test(unittest.TestCase):
             self.assertIsInstance(value, Number)
             self.assertLess(value, 2000000)
 
+    def test_parse_stats_page(self):
+        stats = scraper.parse_stats_page(read_fixture("33089-stats.html"))
+        self.assertEqual(stats, {"score": 8.04, "users": 37291, "ranked": 316,
+                                 "popularity": 1089, "members": 101351, "favorites": 1528,
+                                 "watching": 28124, "completed": 19912, "onhold": 2041,
+                                 "dropped": 3520, "plantowatch": 47754})
+
+    def test_parse_stats_page_not_yet_aired(self):
+        stats = scraper.parse_stats_page(read_fixture("35062-stats.html"))
+        self.assertEqual(len(stats), 11)
+        self.assertIsNone(stats["score"])
+        self.assertIsNone(stats["ranked"])
+        self.assertEqual(stats["users"], 0)
+        self.assertEqual(stats["plantowatch"], 70412)
+
+    def test_sliced_parse_matches_full_parse(self):
+        for name in ("33089-stats.html", "34561-stats.html", "35062-stats.html"):
+            page = read_fixture(name)
+            full = scraper._parse_stats_root(lxml.html.document_fromstring(page))
+            self.assertEqual(scraper.parse_stats_page(page), full)
+        self.assertEqual(scraper._slice_stats_block(b"<html></html>"), b"<html></html>")
+
     def test_entry_constructor(self):
         malentry = scraper.MalEntry("https://myanimelist.net/anime/33089/Kemono_Friends")
         self.assertEqual(malentry.id, 33089)
@@ -0,0 +1,51 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+
+import numpy as np
+
+from falchooser.malscraper.dbaccess import User, user_anime_team
+from falchooser.malscraper.standings import Standings
+from .support import make_statistics, make_database
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.db = make_database((1, 2, 3))
+        # Points are watching + completed - dropped - onhold = watching - 3.
+        self.db.upsert([make_statistics(1, day, 103 + day) for day in range(3)] +
+                       [make_statistics(2, day, 13) for day in (0, 2)] +
+                       [make_statistics(3, 1, 1003)])
+        with self.db.engine.begin() as conn:
+            conn.execute(User.__table__.insert(), [{"id": i, "name": name}
+                                                   for i, name in ((1, "a"), (2, "b"), (3, "c"))])
+            conn.execute(user_anime_team.insert(), [{"users": 1, "anime": 1}, {"users": 1, "anime": 2},
+                                                    {"users": 2, "anime": 2}, {"users": 3, "anime": 3}])
+
+    def test_load(self):
+        standings = Standings.load(db=self.db)
+        np.testing.assert_array_equal(standings.days, [0, 1, 2])
+        np.testing.assert_array_equal(standings.scores, [[110, 111, 112],
+                                                         [10, 10, 10],
+                                                         [0, 1000, 1000]])
+        np.testing.assert_array_equal(standings.ranks(), [2, 3, 1])
+        self.assertEqual(standings.top(2, day=0), [(1, "a", 110.0), (2, "b", 10.0)])
+
+    def test_add_day(self):
+        standings = Standings.load(last_day=1, db=self.db)
+        self.db.upsert([make_statistics(1, 3, 203)])
+        np.testing.assert_array_equal(standings.add_day(self.db), [112, 10, 1000])
+        np.testing.assert_array_equal(standings.add_day(self.db), [210, 10, 1000])
+        np.testing.assert_array_equal(standings.scores, Standings.load(db=self.db).scores)
+
+    def test_ties(self):
+        standings = Standings.load(last_day=0, db=self.db)
+        standings.scores[:] = [[5], [7], [5]]
+        np.testing.assert_array_equal(standings.ranks(), [2, 1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import tempfile
+
+import numpy as np
+
+from falchooser.malscraper import queries
+from falchooser.malscraper.store import ColumnStore
+from .support import make_growing, make_database
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.db = make_database((5, 7, 9))
+        rows = [make_growing(5, day, 100 + day) for day in range(3)]
+        rows += [make_growing(7, day, 200 + day, score=None) for day in (0, 2)]
+        self.db.upsert(rows)
+
+    def assert_same_as_db(self, store, **kwargs):
+        expected = queries.load_statistics(db=self.db, **kwargs)
+        actual = store.load(**kwargs)
+        np.testing.assert_array_equal(actual.anime_ids, expected.anime_ids)
+        np.testing.assert_array_equal(actual.days, expected.days)
+        for metric in expected.metrics:
+            np.testing.assert_array_equal(actual[metric], expected[metric], err_msg=metric)
+
+    def test_sync_and_load(self):
+        store = ColumnStore(self.directory)
+        self.assertEqual(store.sync(self.db), 3)
+        self.assert_same_as_db(store)
+        self.assert_same_as_db(ColumnStore(self.directory), anime_ids=[7], first_day=1,
+                               metrics=("watching", "watching_completed"), fill="ffill")
+        self.assertEqual(store.raw("watching").shape, (3, 2))
+        self.assertIsInstance(ColumnStore(self.directory).raw("members"), np.memmap)
+
+    def test_incremental_sync(self):
+        store = ColumnStore(self.directory)
+        store.sync(self.db)
+        # Late rows of the last stored day, a new day and a new anime.
+        self.db.upsert([make_growing(7, 2, 999), make_growing(5, 3, 103),
+                        make_growing(9, 3, 300)])
+        self.assertEqual(store.sync(self.db), 2)
+        np.testing.assert_array_equal(store.anime_ids, [5, 7, 9])
+        self.assert_same_as_db(store)
+        self.assert_same_as_db(ColumnStore(self.directory))
+        self.assertEqual(store.sync(self.db, overlap=0), 0)
+
+    def test_empty(self):
+        db = make_database()
+        store = ColumnStore(self.directory)
+        self.assertEqual(store.sync(db), 0)
+        self.assertEqual(store.n_days, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
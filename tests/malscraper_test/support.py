@@ -0,0 +1,52 @@
+"""
+Test data shared by the database tests.
+
+Created on Oct 17, 2026
+"""
+
+import datetime
+from typing import Iterable
+
+from falchooser.malscraper.dbaccess import Database, Anime, Statistics
+
+
+ACCESSED = datetime.datetime(2017, 4, 2, tzinfo=datetime.timezone.utc)
+
+
+def make_statistics(anime: int, day: int, watching: int=100, **values) -> Statistics:
+    """
+    Statistics row with fixed values except for watching.
+    :param values: Override other columns, e.g. score=None.
+    """
+    row = dict(score=7.5, users=10, ranked=100, popularity=200, members=1000, favorites=5,
+               watching=watching, completed=0, onhold=1, dropped=2, plantowatch=300,
+               accessed=ACCESSED)
+    row.update(values)
+    return Statistics(anime=anime, day=day, **row)
+
+
+def make_growing(anime: int, day: int, watching: int=100, **values) -> Statistics:
+    """
+    Like make_statistics, but members and completed grow by one every day.
+    """
+    return make_statistics(anime, day, watching, members=1000 + day, completed=day, **values)
+
+
+def make_anime(anime: int, **values) -> Anime:
+    row = dict(title="Anime {}".format(anime),
+               url="https://myanimelist.net/anime/{}/x".format(anime))
+    row.update(values)
+    return Anime(id=anime, **row)
+
+
+def make_database(anime_ids: Iterable[int]=(), **kwargs) -> Database:
+    """
+    :param anime_ids: Insert anime with these ids.
+    :param kwargs: These are passed to Database.
+    :return: A new in-memory SQLite database with all tables.
+    """
+    db = Database("sqlite://", **kwargs)
+    db.create_tables()
+    if anime_ids:
+        db.upsert([make_anime(anime) for anime in anime_ids])
+    return db
@@ -0,0 +1,49 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import time
+from falchooser.malscraper.throttle import TokenBucket, HostRateLimiter, map_concurrently
+
+
+class Test(unittest.TestCase):
+
+    def test_token_bucket_allows_burst(self):
+        bucket = TokenBucket(rate=1000, burst=3)
+        waited = sum(bucket.acquire() for _ in range(3))
+        self.assertEqual(waited, 0.0)
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_limiter_buckets_per_host(self):
+        limiter = HostRateLimiter(rate=1, burst=1)
+        limiter.set_limit("example.org", 10, 2)
+        self.assertIsNot(limiter.bucket("myanimelist.net"), limiter.bucket("example.org"))
+        self.assertEqual(limiter.bucket("example.org").burst, 2)
+        self.assertEqual(limiter.wait("https://myanimelist.net/anime/1"), 0.0)
+
+    def test_map_concurrently_matches_serial(self):
+        items = list(range(20))
+        serial, _ = map_concurrently(lambda x: x * x, items, 1)
+        concurrent, _ = map_concurrently(lambda x: x * x, items, 8)
+        self.assertEqual(serial, concurrent)
+
+    def test_map_concurrently_isolates_failures(self):
+        def func(x):
+            if x % 5 == 0:
+                raise ValueError(x)
+            return x
+        results, failed = map_concurrently(func, range(12), 4)
+        self.assertEqual(results, [1, 2, 3, 4, 6, 7, 8, 9, 11])
+        self.assertEqual(sorted(failed), [0, 5, 10])
+        self.assertIsInstance(failed[5], ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
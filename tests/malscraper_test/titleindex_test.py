@@ -0,0 +1,103 @@
+"""
+Created on Oct 17, 2026
+"""
+
+import unittest
+import os
+import tempfile
+from unittest import mock
+
+from falchooser.malscraper import cache
+from falchooser.malscraper.connection import CLIENT
+from falchooser.malscraper.dbaccess import Database, Anime
+from falchooser.malscraper.scraper import Mal
+from falchooser.malscraper.throttle import LIMITER
+from falchooser.malscraper.titleindex import TitleIndex, normalize_title
+from benchmarks.malserver import MalStandIn
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "titles.json")
+
+    def test_normalize_title(self):
+        self.assertEqual(normalize_title("  Re:Creators "), "re creators")
+        self.assertEqual(normalize_title("FULL METAL PANIC!"), "full metal panic")
+        self.assertEqual(normalize_title("Ｆｕｍｏｆｆｕ"), "fumoffu")
+
+    def test_persistence(self):
+        index = TitleIndex(self.path)
+        index.add(71, ["Full Metal Panic!", "FMP"], "https://myanimelist.net/anime/71/x")
+        index.add(72, ["fmp"])
+        index.save()
+        index = TitleIndex(self.path)
+        self.assertEqual(index.lookup("full metal panic"), 71)
+        self.assertEqual(index.lookup("FMP"), 71)
+        self.assertEqual(index.url(71), "https://myanimelist.net/anime/71/x")
+        self.assertIsNone(index.lookup("Fumoffu"))
+
+    def test_update_from_db(self):
+        db = Database("sqlite://")
+        db.create_tables()
+        db.upsert([Anime(id=1, title="Re:Creators", url="https://myanimelist.net/anime/1/x")])
+        index = TitleIndex(None)
+        index.update_from_db(db)
+        self.assertEqual(index.lookup("re creators"), 1)
+        self.assertEqual(index.url(1), "https://myanimelist.net/anime/1/x")
+
+    def test_write_urls_uses_database(self):
+        db = Database("sqlite://")
+        db.create_tables()
+        db.upsert([Anime(id=1, title="Re:Creators", url="https://myanimelist.net/anime/1/x")])
+        urls = os.path.join(os.path.dirname(self.path), "urls.txt")
+        mal = Mal(TitleIndex(self.path))
+        with mock.patch("falchooser.malscraper.scraper.read_titles", return_value=["Re:Creators"]), \
+                mock.patch("falchooser.malscraper.scraper.get_titles_file", return_value=urls), \
+                mock.patch.object(Mal, "search", side_effect=AssertionError("searched")):
+            mal.write_urls(2017, 2, db=db)
+        with open(urls) as fd:
+            self.assertEqual(fd.read(), "https://myanimelist.net/anime/1/x\n")
+
+    def test_write_urls_loads_index_once(self):
+        index = TitleIndex(self.path)
+        titles = ["Anime {}".format(anime) for anime in range(8)]
+        for anime, title in enumerate(titles):
+            index.add(anime, [title], "https://myanimelist.net/anime/{}/x".format(anime))
+        index.save()
+        urls = os.path.join(os.path.dirname(self.path), "urls.txt")
+        with mock.patch("falchooser.malscraper.scraper.TitleIndex",
+                        side_effect=lambda: TitleIndex(self.path)) as loaded, \
+                mock.patch("falchooser.malscraper.scraper.read_titles", return_value=titles), \
+                mock.patch("falchooser.malscraper.scraper.get_titles_file", return_value=urls):
+            Mal().write_urls(2017, 2, workers=4, from_db=False)
+        self.assertEqual(loaded.call_count, 1)
+        with open(urls) as fd:
+            self.assertEqual(len(fd.read().splitlines()), len(titles))
+
+    def test_network_only_on_miss(self):
+        self.addCleanup(cache.set_cache, cache.CACHE)
+        cache.set_cache(None)
+        self.addCleanup(CLIENT.close)
+        LIMITER.set_limit("127.0.0.1", 1000, 100)
+        self.addCleanup(setattr, Mal, "URL", Mal.URL)
+        with MalStandIn() as stand_in:
+            Mal.URL = stand_in.url
+            mal = Mal(TitleIndex(self.path))
+            url = mal._search_and_build_url("Full Metal Panic!")
+            self.assertEqual(url, stand_in.url + "/anime/71/Anime_71")
+            self.assertEqual(stand_in.requests["search"], 1)
+            self.assertEqual(stand_in.requests["page"], 1)
+            mal.index.save()
+            # Aliases of all search results are known afterwards.
+            mal = Mal(TitleIndex(self.path))
+            self.assertEqual(mal._search_and_build_url("FMP"), url)
+            self.assertEqual(mal.index.lookup("Fumoffu"), 72)
+            self.assertEqual(stand_in.requests["search"], 1)
+            self.assertEqual(stand_in.requests["page"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()